@@ -4,14 +4,31 @@ Main entry point for porycon converter.
 
 import argparse
 import sys
+import time
 from pathlib import Path
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from multiprocessing import cpu_count, set_start_method
-from .converter import MapConverter
+from .converter import MapConverter, TILESET_MODES
 from .world_builder import WorldBuilder
-from .utils import find_map_files, find_layout_files, load_json, save_json
+from .utils import find_map_files, find_layout_files, JSON_STYLES, configure_json_output
 from .tileset_builder import TilesetBuilder
-from .map_worker import convert_single_map
+from .map_worker import ConverterContext, convert_map_batch, init_worker
+from .scheduler import build_conversion_batches
+from .tile_remap import compile_tile_mappings
+from .layer_encoding import LAYER_ENCODINGS, available_layer_encodings
+from .pkmap import verify_pkmap_tree
+from .output_writer import OutputStats, flush_writes, take_output_stats
+from .output_manifest import OutputManifest
+from .png_output import (
+    PNG_MODES,
+    PNG_PROFILES,
+    PngEncodeStats,
+    configure_png_output,
+    describe_png_profile,
+    take_png_stats
+)
+from .tileset_index import get_tileset_index
+from .tileset_manifest import TilesetManifest
 from .logging_config import setup_logging, get_logger
 from .popup_extractor import extract_popups
 from .section_extractor import extract_sections
@@ -56,6 +73,67 @@ def main():
         action="store_true",
         help="Show debug information (implies verbose)"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Reconvert every map, ignoring the incremental build cache in <output>/.porycon"
+    )
+    parser.add_argument(
+        "--layer-encoding",
+        choices=LAYER_ENCODINGS,
+        default="array",
+        help="Tile layer data format: plain JSON array (default), base64, or base64 compressed "
+             "with zlib, gzip or zstd (zstd requires the zstandard package)"
+    )
+    parser.add_argument(
+        "--tileset-mode",
+        choices=TILESET_MODES,
+        default="map",
+        help="Tileset layout: one tileset per map (default), or one shared atlas per "
+             "primary/secondary tileset pair referenced by every map that uses it"
+    )
+    parser.add_argument(
+        "--png-mode",
+        choices=PNG_MODES,
+        default="rgba",
+        help="Tileset image format: 32-bit RGBA (default), or palette-indexed where every "
+             "color fits in one 256-entry palette (exact, much smaller files)"
+    )
+    parser.add_argument(
+        "--png-profile",
+        choices=PNG_PROFILES,
+        default="default",
+        help="PNG encode profile: Pillow defaults, dev (fast, larger files) or release "
+             "(maximum compression, plus oxipng when it is on PATH)"
+    )
+    parser.add_argument(
+        "--palette-sidecar",
+        action="store_true",
+        help="With --png-mode indexed, write <image>.palette.json next to every indexed PNG"
+    )
+    parser.add_argument(
+        "--verify-dedup",
+        action="store_true",
+        help="Compare pixels whenever two tileset images share a digest, so only identical "
+             "images share a GID (slower, keeps all pixels in memory)"
+    )
+    parser.add_argument(
+        "--json-style",
+        choices=JSON_STYLES,
+        default="pretty",
+        help="JSON output style: indented (default) or compact with sorted keys for release builds "
+             "(uses orjson when installed)"
+    )
+    parser.add_argument(
+        "--pkmap",
+        action="store_true",
+        help="Also write each map as a binary .pkmap file next to its Tiled JSON"
+    )
+    parser.add_argument(
+        "--verify-pkmap",
+        action="store_true",
+        help="After conversion, check every .pkmap file against its Tiled JSON"
+    )
     parser.add_argument(
         "--extract-popups",
         action="store_true",
@@ -107,6 +185,10 @@ def main():
     )
 
     args = parser.parse_args()
+    if args.layer_encoding not in available_layer_encodings():
+        parser.error(f"--layer-encoding {args.layer_encoding} is not available (install the zstandard package)")
+    configure_json_output(args.json_style)
+    configure_png_output(args.png_mode, args.palette_sidecar, args.png_profile)
     
     # Setup logging
     logger = setup_logging(args.verbose, args.debug)
@@ -128,6 +210,7 @@ def main():
         logger.info("Extracting map popup graphics...")
         bg_count, outline_count = extract_popups(str(input_dir), str(output_dir))
         logger.info(f"Popup extraction complete: {bg_count} backgrounds, {outline_count} outlines")
+        logger.info(f"Outputs: {take_output_stats().summary()}")
         logger.info("Outline tile sheets converted with palette transparency")
         return
     
@@ -136,6 +219,7 @@ def main():
         logger.info("Extracting map section definitions...")
         section_count, theme_count = extract_sections(str(input_dir), str(output_dir))
         logger.info(f"Section extraction complete: {section_count} sections, {theme_count} themes")
+        logger.info(f"Outputs: {take_output_stats().summary()}")
         return
     
     # Handle text window extraction if requested
@@ -143,6 +227,7 @@ def main():
         logger.info("Extracting text window graphics...")
         count = extract_text_windows(str(input_dir), str(output_dir))
         logger.info(f"Text window extraction complete: {count} text windows extracted")
+        logger.info(f"Outputs: {take_output_stats().summary()}")
         logger.info("Text window sprites converted with transparency")
         return
 
@@ -190,6 +275,7 @@ def main():
         logger.info(f"  Converted: {stats['converted']}")
         logger.info(f"  Failed: {stats['failed']}")
         logger.info(f"  Skipped: {stats['skipped']}")
+        logger.info(f"  Definitions: {take_output_stats().summary()}")
 
         if stats['failed'] > 0 and not args.soundfont:
             logger.warning("Some conversions failed. Install timidity or fluidsynth for MIDI conversion:")
@@ -198,6 +284,10 @@ def main():
             logger.warning("  Or specify --soundfont for FluidSynth")
         return
 
+    # Wall-clock time per phase, reported at the end
+    timings = {}
+    phase_start = time.perf_counter()
+    
     logger.info("Finding maps...")
     maps = find_map_files(str(input_dir))
     logger.info(f"Found {len(maps)} maps")
@@ -206,98 +296,112 @@ def main():
     layouts = find_layout_files(str(input_dir))
     logger.info(f"Found {len(layouts)} layouts")
     
-    # Create converter
-    converter = MapConverter(str(input_dir), str(output_dir))
-    world_builder = WorldBuilder(str(output_dir))
-    
     # Build warp lookup table before conversion
     logger.info("Building warp lookup table...")
     warp_lookup = MapConverter.build_warp_lookup(maps)
     logger.info(f"  Found {len(warp_lookup)} warp destinations")
     
+    # Scan data/tilesets once; the index is pickled into every worker
+    tileset_index = get_tileset_index(input_dir)
+    
+    # Tile counts and hashes of every tileset, reused from the last run where unchanged
+    tileset_manifest = TilesetManifest(tileset_index, None if args.no_cache else output_dir)
+    tileset_manifest.refresh()
+    tileset_manifest.save()
+    
+    # The same context is rebuilt once in every pool process by init_worker;
+    # this process uses its own copy for tileset building and remapping
+    context_args = (
+        str(input_dir),
+        str(output_dir),
+        layouts,
+        warp_lookup,
+        args.region if args.region else None,
+        not args.no_cache,
+        tileset_index,
+        tileset_manifest,
+        args.layer_encoding,
+        args.json_style,
+        args.pkmap,
+        args.tileset_mode,
+        args.png_mode,
+        args.palette_sidecar,
+        args.png_profile,
+        args.verify_dedup
+    )
+    context = ConverterContext(*context_args)
+    converter = context.converter
+    world_builder = WorldBuilder(str(output_dir))
+    
+    timings["Discovery"] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
+    
     # Convert each map (parallelized)
     logger.info(f"Starting conversion of {len(maps)} maps...")
     
     # Prepare tasks for parallel execution
+    # Run-wide data (layouts, warp lookup) lives in the worker context, so tasks stay small.
+    # Maps are batched by tileset pair so each worker's tileset caches stay warm.
     max_workers = max(1, cpu_count() - 1)  # Use all but one CPU core
-    conversion_tasks = []
-    
-    for map_id, map_info in maps.items():
-        region_override = args.region if args.region else None
-        conversion_tasks.append((
-            map_id,
-            map_info,
-            input_dir,
-            output_dir,
-            layouts,  # Pass layouts dict
-            region_override,
-            warp_lookup  # Pass warp lookup
-        ))
+    conversion_batches = build_conversion_batches(maps, layouts, max_workers)
+    logger.info(f"  Scheduled as {len(conversion_batches)} tileset-pair batches on {max_workers} workers")
     
     # Execute conversions in parallel
     converted = 0
+    cached = 0
     skipped_layout = 0
     skipped_other = 0
+    failed_maps = 0  # Maps that errored; their previous outputs must not be removed as stale
     world_builder_data = []  # Collect data for world builder
-    # Collect used_tiles from all workers - initialized as empty dicts
-    # Results are merged sequentially after workers complete (no race condition)
-    all_used_tiles = {}  # Collect used_tiles from all workers
-    all_used_tiles_with_palettes = {}  # Collect used_tiles_with_palettes from all workers
+    png_stats = PngEncodeStats()  # PNGs written by all workers
+    output_stats = OutputStats()  # Files written or found unchanged by all workers
     
     # Use spawn method for ProcessPoolExecutor to ensure functions can be pickled
     # when running as a module (python -m porycon)
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=context_args) as executor:
+        # Submit all batches
         # Use fully qualified function reference to ensure it can be unpickled
-        future_to_map = {
-            executor.submit(convert_single_map, task): task[0] 
-            for task in conversion_tasks
+        future_to_batch = {
+            executor.submit(convert_map_batch, batch): batch
+            for batch in conversion_batches
         }
         
         # Process results as they complete
         # NOTE: as_completed() processes results sequentially in this thread,
         # so dictionary updates are safe (no race condition)
-        for future in as_completed(future_to_map):
-            map_id = future_to_map[future]
+        for future in as_completed(future_to_batch):
+            batch = future_to_batch[future]
             try:
-                status, result_map_id, error_msg, world_data, tiled_map, used_tiles_dict, used_tiles_with_palettes_dict = future.result()
-                
-                if status == "success":
+                batch_results = future.result()
+            except Exception as e:
+                skipped_other += len(batch)
+                failed_maps += len(batch)
+                if skipped_other <= 3:
+                    logger.error(f"  Error processing batch starting at {batch[0][0]}: {e}")
+                continue
+            
+            for result in batch_results:
+                if result.png_stats:
+                    png_stats.add(result.png_stats)
+                if result.output_stats:
+                    output_stats.add(result.output_stats)
+                if result.status in ("success", "cached"):
                     converted += 1
-                    if world_data:
-                        world_builder_data.append(world_data)
-                    # Merge used_tiles from this worker (sequential - safe)
-                    if used_tiles_dict:
-                        for tileset_name, tile_ids in used_tiles_dict.items():
-                            if tileset_name not in all_used_tiles:
-                                all_used_tiles[tileset_name] = set()
-                            # Update is safe because we're processing sequentially
-                            all_used_tiles[tileset_name].update(tile_ids)
-                    # Merge used_tiles_with_palettes from this worker (sequential - safe)
-                    if used_tiles_with_palettes_dict:
-                        for tileset_name, tile_palette_pairs in used_tiles_with_palettes_dict.items():
-                            if tileset_name not in all_used_tiles_with_palettes:
-                                all_used_tiles_with_palettes[tileset_name] = set()
-                            # Update is safe because we're processing sequentially
-                            all_used_tiles_with_palettes[tileset_name].update(tile_palette_pairs)
-                elif status == "skipped_layout":
+                    if result.status == "cached":
+                        cached += 1
+                    if result.world_data:
+                        world_builder_data.append(result.world_data)
+                elif result.status == "skipped_layout":
                     skipped_layout += 1
                 else:
                     skipped_other += 1
-                    if skipped_other <= 3 and error_msg:
-                        logger.warning(f"  Failed to convert {result_map_id}: {error_msg}")
-            except Exception as e:
-                skipped_other += 1
-                if skipped_other <= 3:
-                    logger.error(f"  Error processing {map_id}: {e}")
-    
-    # Merge collected used_tiles into main converter
-    for tileset_name, tile_ids in all_used_tiles.items():
-        converter.tileset_builder.add_tiles(tileset_name, list(tile_ids))
+                    if result.status in ("failed", "error"):
+                        failed_maps += 1
+                    if skipped_other <= 3 and result.error:
+                        logger.warning(f"  Failed to convert {result.map_id}: {result.error}")
     
-    # Merge collected used_tiles_with_palettes into main converter
-    for tileset_name, tile_palette_pairs in all_used_tiles_with_palettes.items():
-        converter.tileset_builder.add_tiles_with_palettes(tileset_name, list(tile_palette_pairs))
+    timings["Map conversion"] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
     
     # Add all maps to world builder
     for world_data in world_builder_data:
@@ -307,11 +411,12 @@ def main():
             world_data["region"],
             world_data["connections"],
             world_data["width"],
-            world_data["height"],
-            world_data["map_data"]
+            world_data["height"]
         )
     
     logger.info(f"Converted {converted} maps")
+    if cached > 0:
+        logger.info(f"  {cached} maps unchanged since the last run (reused from build cache)")
     if skipped_layout > 0:
         logger.warning(f"Skipped {skipped_layout} maps (layout not found)")
     if skipped_other > 0:
@@ -323,10 +428,10 @@ def main():
         first_map_id = list(maps.keys())[0]
         first_map_info = maps[first_map_id]
         logger.debug(f"Map ID: {first_map_id}")
-        logger.debug(f"Map info: {first_map_info}")
+        logger.debug(f"Map file: {first_map_info['map_file']}")
         
         try:
-            map_data = load_json(first_map_info["map_file"])
+            map_data = first_map_info["map_data"]
             layout_id = first_map_info["layout_id"]
             logger.debug(f"Layout ID from map: {layout_id}")
             logger.debug(f"Layout ID in layouts: {layout_id in layouts}")
@@ -452,13 +557,9 @@ def main():
                     tile_mappings[tileset_name] = mapping
                     tileset_tilecounts[tileset_name] = tileset_json.get("tilecount", 1)
                     # Get source_total_tiles for firstgid calculations (use full source size, not built size)
-                    source_total = None
-                    for prop in tileset_json.get("properties", []):
-                        if prop.get("name") == "_source_total_tiles":
-                            source_total = prop.get("value")
-                            break
-                    if source_total is None:
-                        # Fallback: use tilecount if source_total not available
+                    source_total = tileset_manifest.tile_count(tileset_name)
+                    if not source_total:
+                        # Fallback: use tilecount if the source image is missing
                         source_total = tileset_json.get("tilecount", 1)
                     tileset_source_sizes[tileset_name] = source_total
                     logger.info(f"  Built {tileset_name} ({tileset_json.get('tilecount', 1)} unique tiles, source: {source_total} tiles)")
@@ -466,111 +567,59 @@ def main():
                     logger.error(f"  Error building {tileset_name}: {e}", exc_info=True)
     else:
         logger.info("  (Skipping consolidated tileset building - using per-map tilesets)")
-    
-    # Update firstgid values in all maps based on actual tileset tilecounts
-    logger.info("Updating firstgid values in maps...")
-    updated_maps = 0
-    maps_dir = output_dir / "Definitions" / "Maps" / "Regions"
-    if maps_dir.exists():
-        for region_dir in maps_dir.iterdir():
-            if region_dir.is_dir():
-                for map_file in region_dir.glob("*.json"):
-                    try:
-                        map_data = load_json(str(map_file))
-                        tilesets = map_data.get("tilesets", [])
-                        if not tilesets:
-                            continue
-                        
-                        # Update firstgid based on source tileset sizes (not built tilecounts)
-                        # This ensures firstgid matches pokeemerald's structure (General: 1-512, Secondary: 513+)
-                        current_firstgid = 1
-                        updated = False
-                        
-                        for tileset in tilesets:
-                            source = tileset.get("source", "")
-                            tileset_name_from_path = Path(source).stem.lower()
-                            
-                            # Find matching tileset in source_sizes (case-insensitive)
-                            matching_tileset = None
-                            for ts_name in tileset_source_sizes.keys():
-                                if ts_name.lower() == tileset_name_from_path:
-                                    matching_tileset = ts_name
-                                    break
-                            
-                            if matching_tileset:
-                                source_size = tileset_source_sizes[matching_tileset]
-                                if tileset.get("firstgid") != current_firstgid:
-                                    tileset["firstgid"] = current_firstgid
-                                    updated = True
-                                current_firstgid += source_size  # Use source size for firstgid calculation
-                            else:
-                                # If tileset not found, keep existing firstgid and estimate
-                                existing_firstgid = tileset.get("firstgid", current_firstgid)
-                                if existing_firstgid >= current_firstgid:
-                                    current_firstgid = existing_firstgid + 1  # Estimate
-                        
-                        if updated:
-                            save_json(map_data, str(map_file))
-                            updated_maps += 1
-                    except Exception as e:
-                        if updated_maps == 0:  # Only log first error
-                            logger.error(f"  Error updating {map_file.name}: {e}")
-    
-    if updated_maps > 0:
-        logger.info(f"  Updated firstgid in {updated_maps} maps")
-    
-    # Remap tile IDs in all converted maps (parallelized)
-    if tile_mappings:
-        logger.info("Remapping tile IDs in maps...")
+    flush_writes()
+    
+    # Update firstgid values and remap tile IDs of all maps in one pass per map.
+    # Per-map tilesets are final when a map is first written, so this only
+    # runs when consolidated tilesets were built.
+    if tileset_source_sizes or tile_mappings:
+        logger.info("Updating firstgid values and remapping tile IDs in maps...")
+        updated_maps = 0
         remapped_count = 0
-        failed_count = 0
         
-        # Find all map files
+        # Find all Tiled maps (map definition DTOs hold no tile data)
         map_files = []
-        maps_dir = output_dir / "Definitions" / "Maps" / "Regions"
+        maps_dir = output_dir / "Tiled" / "Regions"
         if maps_dir.exists():
             for region_dir in maps_dir.iterdir():
                 if region_dir.is_dir():
                     map_files.extend(region_dir.glob("*.json"))
         
         if map_files:
-            def remap_single_map(args_tuple):
-                """Remap a single map - designed for parallel execution."""
-                map_file, tile_mappings_dict = args_tuple
-                try:
-                    from .converter import MapConverter
-                    # Create a minimal converter just for remapping
-                    # We don't need input_dir/output_dir for remapping, but the method requires it
-                    temp_converter = MapConverter(".", ".")
-                    return temp_converter.remap_map_tiles(map_file, tile_mappings_dict)
-                except Exception as e:
-                    return False
+            # Compile each tileset's mapping into a dense lookup table once for all maps
+            remap_tables = compile_tile_mappings(tile_mappings)
             
-            # Use ThreadPoolExecutor for I/O-bound remapping (file read/write)
-            max_remap_workers = min(8, len(map_files), cpu_count() * 2)
-            with ThreadPoolExecutor(max_workers=max_remap_workers) as executor:
-                future_to_file = {
-                    executor.submit(remap_single_map, (map_file, tile_mappings)): map_file
-                    for map_file in map_files
-                }
-                
-                for future in as_completed(future_to_file):
-                    map_file = future_to_file[future]
-                    try:
-                        if future.result():
-                            remapped_count += 1
-                        else:
-                            failed_count += 1
-                    except Exception as e:
-                        failed_count += 1
-                        if failed_count <= 3:
-                            logger.error(f"  Error remapping {map_file.name}: {e}")
+            def post_process_single_map(map_file):
+                """Post-process a single map - designed for parallel execution."""
+                # post_process_map keeps no per-map state, so all threads share the context's converter
+                return context.converter.post_process_map(map_file, tileset_source_sizes, remap_tables)
             
+            # Use ThreadPoolExecutor for I/O-bound post-processing (file read/write)
+            max_post_workers = min(8, len(map_files), cpu_count() * 2)
+            with ThreadPoolExecutor(max_workers=max_post_workers) as executor:
+                for firstgid_updated, remapped in executor.map(post_process_single_map, map_files):
+                    updated_maps += firstgid_updated
+                    remapped_count += remapped
+        
+        if updated_maps > 0:
+            logger.info(f"  Updated firstgid in {updated_maps} maps")
+        if tile_mappings:
             logger.info(f"  Remapped {remapped_count} maps")
-            if failed_count > 0:
-                logger.warning(f"  Failed to remap {failed_count} maps")
     else:
-        logger.info("No tile mappings available, skipping remapping (using per-map tilesets).")
+        logger.info("No consolidated tilesets, skipping firstgid update and remapping (using per-map tilesets).")
+    
+    if args.verify_pkmap:
+        logger.info("Verifying .pkmap files against Tiled maps...")
+        pkmap_failures = verify_pkmap_tree(output_dir / "Tiled" / "Regions")
+        for pkmap_path, errors in list(pkmap_failures.items())[:10]:
+            logger.error(f"  {pkmap_path.name}: {'; '.join(errors[:3])}")
+        if pkmap_failures:
+            logger.error(f"  {len(pkmap_failures)} .pkmap files do not match their Tiled maps")
+        else:
+            logger.info("  All .pkmap files match")
+    
+    timings["Tilesets and post-processing"] = time.perf_counter() - phase_start
+    phase_start = time.perf_counter()
     
     # Build world files
     logger.info("Building world files...")
@@ -597,6 +646,25 @@ def main():
             logger.warning(f"  No maps found for region {region}")
     
     world_builder.save_all_worlds()
+    timings["World files"] = time.perf_counter() - phase_start
+    
+    # Compare this run's outputs with the last run's; remove outputs no longer produced
+    output_stats.add(take_output_stats())
+    output_manifest = OutputManifest(output_dir)
+    changed_outputs = output_manifest.relative_outputs(output_stats.changed)
+    unchanged_outputs = output_manifest.relative_outputs(output_stats.unchanged) - changed_outputs
+    removed_outputs = output_manifest.update(changed_outputs | unchanged_outputs, remove_stale=failed_maps == 0)
+    logger.info(f"Outputs: {len(changed_outputs)} changed, {len(unchanged_outputs)} unchanged, "
+                f"{len(removed_outputs)} removed")
+    if failed_maps:
+        logger.info(f"  Kept outputs of the last run that were not rewritten ({failed_maps} maps failed)")
+    
+    png_stats.add(take_png_stats())
+    logger.info("Timing summary:")
+    for phase, seconds in timings.items():
+        logger.info(f"  {phase}: {seconds:.2f}s")
+    logger.info(f"  PNG encoding [{describe_png_profile()}]: {png_stats.images} images, "
+                f"{png_stats.seconds:.2f}s across writer threads, {png_stats.bytes / 1024 / 1024:.2f} MiB")
     
     logger.info("Conversion complete!")
     logger.info(f"Output directory: {output_dir}")
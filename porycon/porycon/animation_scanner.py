@@ -10,7 +10,8 @@ from typing import Dict, List, Tuple, Optional
 from PIL import Image
 import json
 import re
-from .utils import camel_to_snake, TilesetPathResolver
+from .utils import camel_to_snake
+from .tileset_index import get_tileset_index
 from .logging_config import get_logger
 
 logger = get_logger('animation_scanner')
@@ -299,32 +300,19 @@ class AnimationScanner:
     
     def find_anim_folder(self, tileset_name: str, is_secondary: bool = False) -> Optional[Path]:
         """Find the anim folder for a tileset."""
-        resolver = TilesetPathResolver(self.input_dir)
-        result = resolver.find_tileset_path(tileset_name)
+        index = get_tileset_index(self.input_dir)
         
-        if result:
-            category, tileset_dir = result
+        entry = index.find(tileset_name)
+        if entry:
             # Check if category matches requested type
-            if (is_secondary and category == "secondary") or (not is_secondary and category == "primary"):
-                anim_path = tileset_dir / "anim"
-                if anim_path.exists() and anim_path.is_dir():
-                    return anim_path
+            if (is_secondary and entry.category == "secondary") or (not is_secondary and entry.category == "primary"):
+                if entry.anim_dir:
+                    return entry.anim_dir
         
-        # Fallback: try direct lookup if resolver didn't find it
-        name_variants = [
-            camel_to_snake(tileset_name),
-            tileset_name.lower(),
-            tileset_name.replace("_", "").lower(),
-        ]
-        
-        for tileset_lower in name_variants:
-            if is_secondary:
-                anim_path = self.input_dir / "data" / "tilesets" / "secondary" / tileset_lower / "anim"
-            else:
-                anim_path = self.input_dir / "data" / "tilesets" / "primary" / tileset_lower / "anim"
-            
-            if anim_path.exists() and anim_path.is_dir():
-                return anim_path
+        # Fallback: look the tileset up in the requested category only
+        entry = index.find(tileset_name, "secondary" if is_secondary else "primary")
+        if entry and entry.anim_dir:
+            return entry.anim_dir
         
         return None
     
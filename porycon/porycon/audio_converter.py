@@ -12,7 +12,6 @@ Handles GBA-style loop markers:
 
 import os
 import re
-import json
 import struct
 import subprocess
 import shutil
@@ -21,6 +20,7 @@ from typing import Dict, List, Any, Optional, Tuple, Set
 from dataclasses import dataclass, field
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from .utils import save_json
 from .logging_config import get_logger
 
 logger = get_logger('audio_converter')
@@ -705,8 +705,7 @@ class AudioDefinitionGenerator:
                 definition["loopEndSec"] = round(loop_info.loop_end_sec, 3)
 
             # Write individual definition file
-            with open(def_path, 'w', encoding='utf-8') as f:
-                json.dump(definition, f, indent=2)
+            save_json(definition, str(def_path))
 
             count += 1
 
@@ -0,0 +1,306 @@
+"""
+Incremental build cache for map conversion.
+
+Every converted map gets a small cache entry that records a content hash of
+all inputs feeding its conversion (map.json, map.bin, border.bin and the
+source files of both tilesets) together with the converter version and the
+outputs it produced. On the next run a map whose key still matches, and whose
+outputs are still on disk, is skipped instead of being reconverted.
+
+Rendered metatile pixels are cached separately, one .npy file per tileset
+pair, so maps that do need reconverting skip rendering for unchanged tilesets.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from . import __version__
+from .utils import TilesetPathResolver, get_tileset_name, save_json
+from .logging_config import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # Only the metatile render cache needs NumPy
+    np = None
+
+logger = get_logger('build_cache')
+
+# Directory (inside the output directory) holding all porycon build state
+CACHE_DIR_NAME = ".porycon"
+
+# Bump when the layout of cache entries changes
+CACHE_FORMAT_VERSION = 1
+
+# Bump when metatile rendering changes in a way that alters pixels
+RENDER_CACHE_VERSION = 1
+
+# Per-process memo of file digests: (path, mtime_ns, size) -> hex digest
+# Tileset files are shared by many maps, so each one is only hashed once per worker.
+_file_digest_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def hash_file(path: Path) -> str:
+    """
+    Return a content digest for a file, or "missing" if it does not exist.
+
+    Digests are memoized per process, keyed by path, modification time and size.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+
+    memo_key = (str(path), stat.st_mtime_ns, stat.st_size)
+    digest = _file_digest_cache.get(memo_key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        _file_digest_cache[memo_key] = digest
+    return digest
+
+
+def tileset_input_files(tileset_dir: Path) -> List[Path]:
+    """
+    List every source file of a tileset that affects conversion output.
+
+    Covers metatiles.bin, metatile_attributes.bin, tiles.png, the palettes
+    and all animation frames.
+    """
+    files = [
+        tileset_dir / "metatiles.bin",
+        tileset_dir / "metatile_attributes.bin",
+        tileset_dir / "tiles.png",
+    ]
+    palettes_dir = tileset_dir / "palettes"
+    if palettes_dir.is_dir():
+        files.extend(sorted(palettes_dir.glob("*.pal")))
+    anim_dir = tileset_dir / "anim"
+    if anim_dir.is_dir():
+        files.extend(sorted(anim_dir.rglob("*.png")))
+    return files
+
+
+class BuildCache:
+    """Persistent per-map cache of conversion inputs and outputs."""
+
+    def __init__(self, input_dir: Path, output_dir: Path, enabled: bool = True):
+        """
+        Initialize build cache.
+
+        Args:
+            input_dir: Path to pokeemerald root directory
+            output_dir: Output directory (cache lives in output_dir/.porycon)
+            enabled: If False, lookups always miss and nothing is stored
+        """
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.enabled = enabled
+        self.cache_dir = self.output_dir / CACHE_DIR_NAME / "maps"
+        self.path_resolver = TilesetPathResolver(self.input_dir)
+        self._tileset_digests: Dict[str, str] = {}
+
+    def _tileset_digest(self, tileset_id: str) -> str:
+        """Combined digest of all source files of a tileset (memoized)."""
+        if tileset_id in self._tileset_digests:
+            return self._tileset_digests[tileset_id]
+
+        tileset_name = get_tileset_name(tileset_id)
+        result = self.path_resolver.find_tileset_path(tileset_name)
+        if not result:
+            digest = "missing"
+        else:
+            _, tileset_dir = result
+            hasher = hashlib.blake2b(digest_size=16)
+            for path in tileset_input_files(tileset_dir):
+                hasher.update(str(path.relative_to(tileset_dir)).encode('utf-8'))
+                hasher.update(hash_file(path).encode('ascii'))
+            digest = hasher.hexdigest()
+
+        self._tileset_digests[tileset_id] = digest
+        return digest
+
+    def compute_map_key(
+        self,
+        map_json_digest: str,
+        layout: Dict[str, Any],
+        region: str,
+        warp_destinations: Iterable[Any],
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Compute the cache key for a single map.
+
+        Args:
+            map_json_digest: Digest of the map.json contents
+            layout: Layout dict from find_layout_files
+            region: Output region of the map
+            warp_destinations: Resolved destinations of the map's warps (they are
+                baked into the output, so edits to other maps' warps must invalidate it)
+            options: Any additional settings that change the output
+
+        Returns:
+            Hex digest identifying this exact set of inputs
+        """
+        key_data = {
+            "format": CACHE_FORMAT_VERSION,
+            "converter_version": __version__,
+            "map_json": map_json_digest,
+            "map_bin": hash_file(Path(layout["map_bin"])) if layout.get("map_bin") else "missing",
+            "border_bin": hash_file(Path(layout["border_bin"])) if layout.get("border_bin") else "missing",
+            "width": layout.get("width"),
+            "height": layout.get("height"),
+            "primary_tileset": [layout.get("primary_tileset", ""), self._tileset_digest(layout.get("primary_tileset", ""))],
+            "secondary_tileset": [layout.get("secondary_tileset", ""), self._tileset_digest(layout.get("secondary_tileset", ""))],
+            # Animation durations are parsed from tileset_anims.c
+            "tileset_anims": hash_file(self.input_dir / "src" / "tileset_anims.c"),
+            "region": region,
+            "warps": list(warp_destinations),
+            "options": options or {},
+        }
+        encoded = json.dumps(key_data, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def _entry_path(self, map_id: str) -> Path:
+        return self.cache_dir / f"{map_id}.json"
+
+    def lookup(self, map_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached conversion.
+
+        Returns:
+            The stored world data if the key matches and all recorded outputs
+            still exist, otherwise None
+        """
+        if not self.enabled:
+            return None
+
+        entry_path = self._entry_path(map_id)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("key") != key:
+            return None
+
+        for output in entry.get("outputs", []):
+            if not (self.output_dir / output).exists():
+                logger.debug(f"Cache entry for {map_id} is stale: {output} is missing")
+                return None
+
+        return entry.get("world_data")
+
+    def recorded_outputs(self, map_id: str) -> List[Path]:
+        """Outputs recorded for a map's last successful conversion (empty if it has no entry)."""
+        try:
+            with open(self._entry_path(map_id), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [self.output_dir / output for output in entry.get("outputs", [])]
+
+    def store(self, map_id: str, key: str, outputs: List[Path], world_data: Dict[str, Any]):
+        """Record a successful conversion."""
+        if not self.enabled:
+            return
+
+        entry = {
+            "key": key,
+            "outputs": sorted(Path(p).relative_to(self.output_dir).as_posix() for p in outputs),
+            "world_data": world_data,
+        }
+
+        # save_json writes atomically, so an interrupted run never leaves a truncated entry behind
+        try:
+            save_json(entry, str(self._entry_path(map_id)), indent=None)
+        except OSError as e:
+            logger.warning(f"Could not write build cache entry for {map_id}: {e}")
+
+
+class MetatileRenderCache:
+    """
+    Persistent cache of batch-rendered metatiles, one .npy file per tileset pair.
+    
+    Files are keyed by a content hash of both tilesets' tiles.png, metatiles.bin
+    and palettes, and are opened memory-mapped, so every pool worker reads the
+    same pages without copying them.
+    """
+
+    def __init__(self, input_dir: Path, output_dir: Path):
+        """
+        Initialize metatile render cache.
+
+        Args:
+            input_dir: Path to pokeemerald root directory
+            output_dir: Output directory (cache lives in output_dir/.porycon/metatiles)
+        """
+        self.input_dir = Path(input_dir)
+        self.cache_dir = Path(output_dir) / CACHE_DIR_NAME / "metatiles"
+        self.path_resolver = TilesetPathResolver(self.input_dir)
+
+    def _tileset_render_digest(self, tileset_name: str) -> str:
+        """Digest of the tileset files that affect rendered pixels."""
+        result = self.path_resolver.find_tileset_path(tileset_name) if tileset_name else None
+        if not result:
+            return "missing"
+        _, tileset_dir = result
+        hasher = hashlib.blake2b(digest_size=16)
+        files = [tileset_dir / "tiles.png", tileset_dir / "metatiles.bin"]
+        files.extend(tileset_dir / "palettes" / f"{i:02d}.pal" for i in range(16))
+        for path in files:
+            hasher.update(path.name.encode('utf-8'))
+            hasher.update(hash_file(path).encode('ascii'))
+        return hasher.hexdigest()
+
+    def _entry_path(self, primary_tileset: str, secondary_tileset: str) -> Path:
+        key_data = [
+            RENDER_CACHE_VERSION,
+            primary_tileset, self._tileset_render_digest(primary_tileset),
+            secondary_tileset, self._tileset_render_digest(secondary_tileset),
+        ]
+        key = hashlib.blake2b(json.dumps(key_data).encode('utf-8'), digest_size=16).hexdigest()
+        return self.cache_dir / f"{primary_tileset}__{secondary_tileset}-{key}.npy"
+
+    def load(self, primary_tileset: str, secondary_tileset: str):
+        """
+        Open the cached render of a tileset pair.
+
+        Returns:
+            Read-only memory-mapped (M, 2, 16, 16, 4) array, or None on a miss
+        """
+        if np is None:
+            return None
+        entry_path = self._entry_path(primary_tileset, secondary_tileset)
+        try:
+            return np.load(entry_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def store(self, primary_tileset: str, secondary_tileset: str, images) -> None:
+        """Write the render of a tileset pair, replacing older renders of the same pair."""
+        if np is None:
+            return
+        entry_path = self._entry_path(primary_tileset, secondary_tileset)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.tmp.npy")
+        try:
+            np.save(tmp_path, np.ascontiguousarray(images))
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning(f"Could not write metatile render cache for {primary_tileset}/{secondary_tileset}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+
+        # Drop renders of this pair made from older tileset contents
+        for stale in entry_path.parent.glob(f"{primary_tileset}__{secondary_tileset}-*.npy"):
+            if stale != entry_path and not stale.name.endswith(".tmp.npy"):
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
@@ -3,11 +3,15 @@ Main converter - converts pokeemerald maps to Tiled format.
 """
 
 import json
+import os
+import shutil
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple, Set
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Set
 from PIL import Image
 from .metatile import (
     extract_metatile_id,
+    get_metatile_tiles,
+    get_layer_type_value,
     MetatileLayerType,
     NUM_TILES_PER_METATILE
 )
@@ -19,32 +23,69 @@ from .constants import (
     METATILE_SIZE,
     FLIP_HORIZONTAL,
     FLIP_VERTICAL,
+    METATILE_ID_MASK,
     MOVEMENT_TYPE_TO_BEHAVIOR,
     DEFAULT_BEHAVIOR
 )
 from .logging_config import get_logger
 from .tileset_builder import TilesetBuilder
 from .metatile_renderer import MetatileRenderer
+from .build_cache import MetatileRenderCache
+from .tileset_manifest import get_tileset_manifest
 from .animation_scanner import AnimationScanner
 from .map_reader import MapReader
 from .metatile_processor import MetatileProcessor
+from .image_dedup import ImageDedupIndex
+from .tile_usage import TileUsageIndex
+from .tile_remap import RemapTables, TileRemapTable, remap_layer_data
+from .layer_encoding import encode_layer_data, decode_layer_data, layer_encoding_of, set_layer_data
+from .pkmap import pkmap_path_for, write_pkmap
+from .png_output import save_png
+from .output_writer import flush_writes, install_file
 from .id_transformer import IdTransformer
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; layers are then gathered with plain lists
+    np = None
+
 logger = get_logger('converter')
 
+# "map": one tileset per map (only the metatiles it uses);
+# "pair": one shared atlas per (primary, secondary) tileset pair, referenced by every map using it
+TILESET_MODES = ("map", "pair")
+
+SHARED_TILESET_DIR = "shared"  # Tilesets/{region}/shared/{pair_name}/
+
 
 class MapConverter:
     """Converts pokeemerald maps to Tiled format."""
     
-    def __init__(self, input_dir: str, output_dir: str):
+    def __init__(
+        self,
+        input_dir: str,
+        output_dir: str,
+        use_render_cache: bool = False,
+        layer_encoding: str = "array",
+        write_pkmap: bool = False,
+        tileset_mode: str = "map",
+        verify_image_dedup: bool = False
+    ):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.map_reader = MapReader(self.input_dir)
-        self.tileset_builder = TilesetBuilder(input_dir)
-        self.metatile_renderer = MetatileRenderer(input_dir)
-        self.metatile_processor = MetatileProcessor(self.metatile_renderer)
         self.animation_scanner = AnimationScanner(input_dir)
+        self.tileset_builder = TilesetBuilder(input_dir, self.animation_scanner)
+        render_cache = MetatileRenderCache(self.input_dir, self.output_dir) if use_render_cache else None
+        self.metatile_renderer = MetatileRenderer(input_dir, render_cache=render_cache)
+        self.metatile_processor = MetatileProcessor(self.metatile_renderer)
         self.tile_mappings: Dict[str, Dict[int, int]] = {}  # tileset_name -> old_id -> new_id
+        self.verify_image_dedup = verify_image_dedup  # Compare pixels on digest hits (see ImageDedupIndex)
+        self.layer_encoding = layer_encoding  # Tile layer data encoding (see layer_encoding.LAYER_ENCODINGS)
+        self.write_pkmap = write_pkmap  # Also write a binary .pkmap next to each Tiled map
+        self.tileset_mode = tileset_mode  # See TILESET_MODES
+        # (region, primary, secondary) -> the shared atlas this process built last (see _get_shared_tileset)
+        self._shared_tilesets: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
     
     @staticmethod
     def build_warp_lookup(maps: Dict[str, Dict[str, Any]]) -> Dict[Tuple[str, int], Tuple[int, int, int]]:
@@ -57,13 +98,14 @@ class MapConverter:
         Returns:
             Dict mapping (map_id, warp_index) -> (x, y, elevation)
         """
-        from .utils import load_json
-        
         warp_lookup: Dict[Tuple[str, int], Tuple[int, int, int]] = {}
         
         for map_id, map_info in maps.items():
             try:
-                map_data = load_json(map_info["map_file"])
+                # find_map_files already parsed every map.json
+                map_data = map_info.get("map_data")
+                if map_data is None:
+                    map_data = load_json(map_info["map_file"])
                 warp_events = map_data.get("warp_events", [])
                 
                 for warp_index, warp in enumerate(warp_events):
@@ -77,7 +119,7 @@ class MapConverter:
         
         return warp_lookup
         
-    def load_metatile_attributes(self, tileset_name: str) -> Dict[int, int]:
+    def load_metatile_attributes(self, tileset_name: str) -> Sequence[int]:
         """
         Load metatile attributes to get layer types.
         
@@ -85,7 +127,7 @@ class MapConverter:
         """
         return self.map_reader.read_metatile_attributes(tileset_name)
     
-    def load_metatiles_with_attributes(self, tileset_name: str) -> List[Tuple[int, int, int]]:
+    def load_metatiles_with_attributes(self, tileset_name: str) -> Sequence[Tuple[int, int, int]]:
         """
         Load metatiles with full tile attributes (tile_id, flip_flags, palette_index).
         
@@ -93,6 +135,116 @@ class MapConverter:
         """
         return self.map_reader.read_metatiles_with_attributes(tileset_name)
     
+    @staticmethod
+    def update_map_firstgids(map_data: Dict[str, Any], tileset_source_sizes: Dict[str, int]) -> bool:
+        """
+        Recompute the firstgid of every tileset in a Tiled map, in memory.
+        
+        firstgid follows the source tileset sizes (not built tilecounts), so it
+        matches pokeemerald's structure (General: 1-512, Secondary: 513+).
+        
+        Args:
+            map_data: Tiled map JSON
+            tileset_source_sizes: Dict mapping tileset_name -> source tile count
+        
+        Returns:
+            True if any firstgid changed
+        """
+        tilesets = map_data.get("tilesets", [])
+        if not tilesets:
+            return False
+        
+        # Case-insensitive lookup (first name wins, like the old linear search)
+        sizes_by_name: Dict[str, int] = {}
+        for ts_name, size in tileset_source_sizes.items():
+            sizes_by_name.setdefault(ts_name.lower(), size)
+        
+        current_firstgid = 1
+        updated = False
+        for tileset in tilesets:
+            source_size = sizes_by_name.get(Path(tileset.get("source", "")).stem.lower())
+            if source_size is not None:
+                if tileset.get("firstgid") != current_firstgid:
+                    tileset["firstgid"] = current_firstgid
+                    updated = True
+                current_firstgid += source_size  # Use source size for firstgid calculation
+            else:
+                # If tileset not found, keep existing firstgid and estimate
+                existing_firstgid = tileset.get("firstgid", current_firstgid)
+                if existing_firstgid >= current_firstgid:
+                    current_firstgid = existing_firstgid + 1  # Estimate
+        return updated
+    
+    def remap_map_data(self, map_data: Dict[str, Any], tile_mappings: Dict[str, Dict[Tuple[int, int], int]]) -> bool:
+        """
+        Remap tile IDs of a Tiled map in memory using the provided tile mappings.
+        
+        Args:
+            map_data: Tiled map JSON
+            tile_mappings: Dict mapping tileset_name -> {(old_tile_id, palette_index): new_tile_id}
+                (or a TileRemapTable compiled from it, see compile_tile_mappings)
+        
+        Returns:
+            True if the map references a mapped tileset and was remapped
+        """
+        # Get tileset information from the map
+        tilesets = map_data.get("tilesets", [])
+        if not tilesets:
+            return False
+        
+        # Resolve tileset names case-insensitively once, not per tile
+        mapping_keys_by_name: Dict[str, str] = {}
+        for mapping_key in tile_mappings.keys():
+            mapping_keys_by_name.setdefault(mapping_key.lower(), mapping_key)
+        
+        # Compiled table and firstgid of each mapped tileset, keyed by lowercase
+        # name (e.g. "../../Tilesets/hoenn/general.json" -> "general")
+        tables: RemapTables = {}
+        for tileset in tilesets:
+            tileset_name_from_path = Path(tileset.get("source", "")).stem.lower()
+            mapping_key = mapping_keys_by_name.get(tileset_name_from_path)
+            if mapping_key is not None:
+                mapping = tile_mappings[mapping_key]
+                if not isinstance(mapping, TileRemapTable):
+                    mapping = TileRemapTable(mapping)
+                tables[tileset_name_from_path] = (mapping, tileset.get("firstgid", 1))
+        
+        if not tables:
+            # No matching tilesets found - skip remapping for this map
+            return False
+        
+        # Remap all tile layers
+        for layer in map_data.get("layers", []):
+            if layer.get("type") != "tilelayer":
+                continue
+            
+            data = decode_layer_data(layer)
+            if not data:
+                continue
+            
+            # Get tileset and palette info for this layer (stored during conversion)
+            tileset_info_str = None
+            palette_info_str = None
+            for prop in layer.get("properties", []):
+                if prop.get("name") == "_tileset_info":
+                    tileset_info_str = prop.get("value")
+                elif prop.get("name") == "_palette_info":
+                    palette_info_str = prop.get("value")
+            
+            # Without stored info, infer the tileset from tile IDs and assume palette 0
+            layer_tilesets = json.loads(tileset_info_str) if tileset_info_str else []
+            layer_palettes = json.loads(palette_info_str) if palette_info_str else []
+            
+            # Store the result in the layer's own encoding
+            set_layer_data(layer, remap_layer_data(data, layer_tilesets, layer_palettes, tables),
+                           layer_encoding_of(layer))
+            
+            # Remove the _tileset_info and _palette_info properties after remapping
+            layer["properties"] = [p for p in layer.get("properties", [])
+                                   if p.get("name") not in ("_tileset_info", "_palette_info")]
+        
+        return True
+    
     def remap_map_tiles(self, map_path: Path, tile_mappings: Dict[str, Dict[Tuple[int, int], int]]) -> bool:
         """
         Remap tile IDs in a map file using the provided tile mappings.
@@ -104,148 +256,48 @@ class MapConverter:
         Returns:
             True if remapping was successful, False otherwise
         """
+        _, remapped = self.post_process_map(map_path, {}, tile_mappings)
+        return remapped
+    
+    def post_process_map(
+        self,
+        map_path: Path,
+        tileset_source_sizes: Dict[str, int],
+        tile_mappings: Dict[str, Dict[Tuple[int, int], int]]
+    ) -> Tuple[bool, bool]:
+        """
+        Update firstgids and remap tile IDs of a saved Tiled map in one pass.
+        
+        The map is read once, both steps run in memory (firstgid first, so the
+        remap uses the updated values) and it is written back once, only if
+        something changed (together with its .pkmap, if there is one).
+        
+        Args:
+            map_path: Path to the Tiled map JSON file
+            tileset_source_sizes: Dict mapping tileset_name -> source tile count
+            tile_mappings: Dict mapping tileset_name -> {(old_tile_id, palette_index): new_tile_id}
+        
+        Returns:
+            (firstgid_updated, remapped)
+        """
         try:
             map_data = load_json(str(map_path))
             if not map_data:
-                return False
+                return False, False
             
-            # Get tileset information from the map
-            tilesets = map_data.get("tilesets", [])
-            if not tilesets:
-                return False
-            
-            # Build a mapping of tileset names to their firstgid and mappings
-            # Need to match tileset names case-insensitively
-            tileset_info = {}
-            for tileset in tilesets:
-                source = tileset.get("source", "")
-                # Extract tileset name from source path (e.g., "../../Tilesets/hoenn/general.json" -> "general")
-                tileset_name_from_path = Path(source).stem.lower()
-                firstgid = tileset.get("firstgid", 1)
-                
-                # Try to find matching tileset in mappings (case-insensitive)
-                mapping = None
-                for mapping_key in tile_mappings.keys():
-                    if mapping_key.lower() == tileset_name_from_path:
-                        mapping = tile_mappings[mapping_key]
-                        tileset_info[mapping_key] = {
-                            "firstgid": firstgid,
-                            "mapping": mapping
-                        }
-                        break
-            
-            if not tileset_info:
-                # No matching tilesets found - this shouldn't happen if maps were converted correctly
-                # But don't fail silently, just skip remapping for this map
-                return False
-            
-            # Remap all tile layers
-            for layer in map_data.get("layers", []):
-                if layer.get("type") != "tilelayer":
-                    continue
-                
-                data = layer.get("data", [])
-                if not data:
-                    continue
-                
-                # Get tileset and palette info for this layer (stored during conversion)
-                tileset_info_str = None
-                palette_info_str = None
-                for prop in layer.get("properties", []):
-                    if prop.get("name") == "_tileset_info":
-                        tileset_info_str = prop.get("value")
-                    elif prop.get("name") == "_palette_info":
-                        palette_info_str = prop.get("value")
-                
-                if tileset_info_str:
-                    # Parse tileset info
-                    layer_tilesets = json.loads(tileset_info_str)
-                else:
-                    # Fallback: try to infer from tile IDs
-                    layer_tilesets = [None] * len(data)
-                
-                if palette_info_str:
-                    # Parse palette info
-                    layer_palettes = json.loads(palette_info_str)
-                else:
-                    # Fallback: assume palette 0
-                    layer_palettes = [0] * len(data)
-                
-                # Remap each tile ID using (tile_id, palette) key
-                for i in range(len(data)):
-                    old_tile_id = data[i]
-                    if old_tile_id == 0:
-                        # Empty tile, keep as 0
-                        continue
-                    
-                    # Get which tileset and palette this tile belongs to
-                    tileset_name = layer_tilesets[i] if i < len(layer_tilesets) else None
-                    palette_index = layer_palettes[i] if i < len(layer_palettes) else 0
-                    
-                    if tileset_name:
-                        # Match case-insensitively
-                        matching_tileset_key = None
-                        for ts_key in tileset_info.keys():
-                            if ts_key.lower() == tileset_name.lower():
-                                matching_tileset_key = ts_key
-                                break
-                        
-                        if matching_tileset_key and matching_tileset_key in tileset_info:
-                            # We know which tileset, use its mapping
-                            info = tileset_info[matching_tileset_key]
-                            mapping = info["mapping"]  # Now Dict[Tuple[int, int], int]
-                            firstgid = info["firstgid"]
-                            
-                            # Use (tile_id, palette) as key
-                            tile_key = (old_tile_id, palette_index)
-                            if tile_key in mapping:
-                                new_tile_id = mapping[tile_key]
-                                # Convert to GID: firstgid + new_tile_id - 1
-                                # (Tiled uses 1-based tile IDs, so GID = firstgid + tile_index)
-                                new_gid = firstgid + new_tile_id - 1
-                                data[i] = new_gid
-                            else:
-                                # Fallback: try without palette (for backward compatibility)
-                                if isinstance(mapping, dict) and old_tile_id in mapping:
-                                    # Old format mapping (just tile_id)
-                                    new_tile_id = mapping[old_tile_id]
-                                    new_gid = firstgid + new_tile_id - 1
-                                    data[i] = new_gid
-                    else:
-                        # Try to find which tileset by checking mappings
-                        for ts_name, info in tileset_info.items():
-                            mapping = info["mapping"]
-                            tile_key = (old_tile_id, palette_index)
-                            if tile_key in mapping:
-                                new_tile_id = mapping[tile_key]
-                                firstgid = info["firstgid"]
-                                new_gid = firstgid + new_tile_id - 1
-                                data[i] = new_gid
-                                break
-                            elif isinstance(mapping, dict) and old_tile_id in mapping:
-                                # Fallback: old format
-                                new_tile_id = mapping[old_tile_id]
-                                firstgid = info["firstgid"]
-                                new_gid = firstgid + new_tile_id - 1
-                                data[i] = new_gid
-                                break
-                
-                # Remove the _tileset_info and _palette_info properties after remapping
-                layer["properties"] = [p for p in layer.get("properties", []) 
-                                     if p.get("name") not in ("_tileset_info", "_palette_info")]
-            
-            # Save the remapped map
-            save_json(map_data, str(map_path))
-            return True
+            firstgid_updated = self.update_map_firstgids(map_data, tileset_source_sizes) if tileset_source_sizes else False
+            remapped = self.remap_map_data(map_data, tile_mappings) if tile_mappings else False
             
+            if firstgid_updated or remapped:
+                save_json(map_data, str(map_path))
+                # Keep the binary copy in step with the JSON
+                pkmap_path = pkmap_path_for(map_path)
+                if pkmap_path.exists():
+                    write_pkmap(map_data, pkmap_path)
+            return firstgid_updated, remapped
         except Exception as e:
-            # Only print first few errors to avoid spam
-            if not hasattr(remap_map_tiles, '_error_count'):
-                remap_map_tiles._error_count = 0
-            remap_map_tiles._error_count += 1
-            if remap_map_tiles._error_count <= 3:
-                logger.error(f"Error remapping {map_path.name}: {e}", exc_info=True)
-            return False
+            logger.error(f"Error post-processing {map_path.name}: {e}", exc_info=True)
+            return False, False
     
     def _get_tileset_name(self, tileset_id: str) -> str:
         """Extract tileset name from ID like 'gTileset_General' -> 'General'."""
@@ -255,36 +307,13 @@ class MapConverter:
     
     def _get_max_tile_id(self, tileset_name: str) -> Optional[int]:
         """
-        Get the maximum valid tile ID for a tileset based on its image dimensions.
+        Get the maximum valid tile ID for a tileset from the tileset manifest.
         
         Returns:
             Maximum tile ID (0-based, so max_tile_id = total_tiles - 1), or None if image not found
         """
-        from PIL import Image
-        
-        # Try to load the tileset graphics to get dimensions
-        category, tileset_dir = self._get_tileset_path(tileset_name)
-        tiles_path = tileset_dir / "tiles.png"
-        
-        if tiles_path.exists():
-            try:
-                img = Image.open(tiles_path)
-                # Convert if needed
-                if img.mode in ('P', '1', 'L'):
-                    img = img.convert('RGBA')
-                
-                # Calculate total tiles (8x8 pixel tiles)
-                tile_size = 8
-                tiles_per_row = img.width // tile_size
-                tiles_per_col = img.height // tile_size
-                total_tiles = tiles_per_row * tiles_per_col
-                
-                # Return max tile ID (0-based, so max = total - 1)
-                return total_tiles - 1 if total_tiles > 0 else None
-            except Exception:
-                pass
-        
-        return None
+        total_tiles = get_tileset_manifest(self.input_dir).tile_count(tileset_name)
+        return total_tiles - 1 if total_tiles > 0 else None
     
     def _get_tileset_path(self, tileset_name: str) -> Tuple[str, Path]:
         """
@@ -308,7 +337,12 @@ class MapConverter:
         return ("primary", self.input_dir / "data" / "tilesets" / "primary" / name_variants[0])
     
     def save_map(self, map_id: str, tiled_map: Dict[str, Any], region: str, map_data: Optional[Dict[str, Any]] = None):
-        """Save converted map to output directory and generate map definition DTO."""
+        """
+        Save converted map to output directory and generate map definition DTO.
+        
+        Files are serialized here and written by the write-behind queue
+        (see output_writer.flush_writes).
+        """
         from .utils import create_map_definition_dto, save_map_definition_dto
 
         map_name = sanitize_filename(map_id.replace("MAP_", "").lower())
@@ -316,13 +350,43 @@ class MapConverter:
         # Save Tiled map to Tiled/Regions directory
         region_capitalized = region.capitalize()
         tiled_output_path = self.output_dir / "Tiled" / "Regions" / region_capitalized / f"{map_name}.json"
-        tiled_output_path.parent.mkdir(parents=True, exist_ok=True)
-        save_json(tiled_map, str(tiled_output_path))
+        save_json(tiled_map, str(tiled_output_path), background=True)
+        if self.write_pkmap:
+            write_pkmap(tiled_map, pkmap_path_for(tiled_output_path), background=True)
 
         # Generate and save map definition DTO
         if map_data is not None:
             dto = create_map_definition_dto(map_id, map_name, region, map_data)
-            save_map_definition_dto(dto, self.output_dir, region, map_name)
+            save_map_definition_dto(dto, self.output_dir, region, map_name, background=True)
+    
+    def get_map_output_paths(self, map_id: str, region: str, layout: Optional[Dict[str, Any]] = None) -> List[Path]:
+        """
+        Return the paths of every file written for a converted map.
+        
+        Args:
+            layout: The map's layout; in "pair" tileset mode it selects the shared atlas
+        """
+        map_name = sanitize_filename(map_id.replace("MAP_", "").lower())
+        region_capitalized = region.capitalize()
+        if self.tileset_mode == "pair" and layout is not None:
+            tileset_name = self._shared_tileset_name(
+                self._get_tileset_name(layout["primary_tileset"]),
+                self._get_tileset_name(layout["secondary_tileset"])
+            )
+            tileset_dir = self._shared_tileset_dir(region, tileset_name)
+        else:
+            tileset_name = map_name
+            tileset_dir = self.output_dir / "Tilesets" / region.lower() / map_name
+        tiled_output_path = self.output_dir / "Tiled" / "Regions" / region_capitalized / f"{map_name}.json"
+        paths = [
+            tiled_output_path,
+            self.output_dir / "Definitions" / "Maps" / "Regions" / region_capitalized / f"{map_name}.json",
+            tileset_dir / f"{tileset_name}.json",
+            tileset_dir / f"{tileset_name}.png",
+        ]
+        if self.write_pkmap:
+            paths.append(pkmap_path_for(tiled_output_path))
+        return paths
     
     def _validate_layout(self, map_data: Dict[str, Any], layout_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Validate and retrieve layout data from map_data."""
@@ -344,7 +408,7 @@ class MapConverter:
         
         return layout
     
-    def _read_and_validate_map_data(self, layout: Dict[str, Any]) -> Optional[Tuple[List[List[int]], int, int]]:
+    def _read_and_validate_map_data(self, layout: Dict[str, Any]) -> Optional[Tuple[Sequence[Sequence[int]], int, int]]:
         """Read map.bin and validate dimensions match file size."""
         map_bin = layout.get("map_bin")
         map_bin_path = Path(map_bin)
@@ -394,22 +458,70 @@ class MapConverter:
         primary_attributes = self.load_metatile_attributes(primary_tileset)
         secondary_attributes = self.load_metatile_attributes(secondary_tileset)
         
-        if not primary_metatiles_with_attrs:
+        if len(primary_metatiles_with_attrs) == 0:
             logger.error(f"Could not load metatiles for {primary_tileset}")
             return None
         
+        # Render every metatile of the pair once (cached across maps; None without NumPy)
+        rendered_metatiles = self.metatile_renderer.render_tileset_pair(
+            primary_tileset,
+            secondary_tileset,
+            primary_metatiles_with_attrs,
+            secondary_metatiles_with_attrs
+        )
+        
         return {
             "primary_tileset": primary_tileset,
             "secondary_tileset": secondary_tileset,
             "primary_metatiles_with_attrs": primary_metatiles_with_attrs,
             "secondary_metatiles_with_attrs": secondary_metatiles_with_attrs,
             "primary_attributes": primary_attributes,
-            "secondary_attributes": secondary_attributes
+            "secondary_attributes": secondary_attributes,
+            "rendered_metatiles": rendered_metatiles
         }
     
+    def _flatten_metatile_ids(self, map_entries: Sequence[Sequence[int]]) -> Tuple[Any, List[int]]:
+        """
+        Extract the metatile ID of every cell and the distinct IDs in the map.
+        
+        Returns:
+            (metatile_ids, unique_metatile_ids) where metatile_ids is row-major
+            (a NumPy array when available, else a list) and unique_metatile_ids
+            lists each distinct ID once, in order of first appearance
+        """
+        if np is not None:
+            metatile_ids = np.asarray(map_entries, dtype=np.uint16).reshape(-1) & METATILE_ID_MASK
+            unique_ids, first_index = np.unique(metatile_ids, return_index=True)
+            unique_metatile_ids = unique_ids[np.argsort(first_index, kind='stable')].tolist()
+            return metatile_ids, unique_metatile_ids
+        
+        metatile_ids = [extract_metatile_id(entry) for row in map_entries for entry in row]
+        return metatile_ids, list(dict.fromkeys(metatile_ids))
+    
+    def _resolve_metatile(
+        self,
+        metatile_id: int,
+        tileset_data: Dict[str, Any]
+    ) -> Tuple[str, int, Sequence[Tuple[int, int, int]], Sequence[int]]:
+        """
+        Resolve a map metatile ID to its tileset.
+        
+        Returns:
+            (tileset_name, actual_metatile_id, metatiles_with_attrs, attributes)
+        """
+        primary_tileset = tileset_data["primary_tileset"]
+        tileset_name, actual_metatile_id = self.metatile_processor.determine_tileset_for_metatile(
+            metatile_id, primary_tileset, tileset_data["secondary_tileset"]
+        )
+        if tileset_name == primary_tileset:
+            return (tileset_name, actual_metatile_id,
+                    tileset_data["primary_metatiles_with_attrs"], tileset_data["primary_attributes"])
+        return (tileset_name, actual_metatile_id,
+                tileset_data["secondary_metatiles_with_attrs"], tileset_data["secondary_attributes"])
+    
     def _process_metatiles(
         self,
-        map_entries: List[List[int]],
+        map_entries: Sequence[Sequence[int]],
         width: int,
         height: int,
         tileset_data: Dict[str, Any]
@@ -417,83 +529,69 @@ class MapConverter:
         """
         Process all metatiles in the map and render them.
         
+        Each distinct metatile ID is processed once, in order of first
+        appearance (row-major), which keeps GID assignment stable.
+        
         Returns a dictionary containing:
         - used_metatiles: Dict mapping (metatile_id, tileset, layer_type) -> (bottom_img, top_img)
         - metatile_to_gid: Dict mapping (metatile_id, tileset, layer_type, is_top) -> GID
-        - tile_id_to_gids: Dict mapping (tile_id, tileset) -> list of (layer_gid, metatile_key, tile_position)
+        - tile_id_to_gids: TileUsageIndex mapping (tile_id, tileset) -> list of (layer_gid, metatile_key, tile_position)
         - metatile_composition: Dict mapping metatile_key -> metatile_tiles
-        - image_to_gid: Dict mapping image_bytes -> GID
-        - next_gid: int for next available GID
+        - image_index: ImageDedupIndex mapping rendered images -> GID (tracks the next free GID)
+        - metatile_ids: Metatile ID of every cell, row-major
+        - unique_metatile_ids: Distinct metatile IDs in order of first appearance
         """
         primary_tileset = tileset_data["primary_tileset"]
         secondary_tileset = tileset_data["secondary_tileset"]
-        primary_metatiles_with_attrs = tileset_data["primary_metatiles_with_attrs"]
-        secondary_metatiles_with_attrs = tileset_data["secondary_metatiles_with_attrs"]
-        primary_attributes = tileset_data["primary_attributes"]
-        secondary_attributes = tileset_data["secondary_attributes"]
         
         # Initialize data structures
         used_metatiles: Dict[Tuple[int, str, int], Tuple[Image.Image, Image.Image]] = {}
         metatile_to_gid: Dict[Tuple[int, str, int, bool], int] = {}
-        tile_id_to_gids: Dict[Tuple[int, str], List[Tuple[int, Tuple[int, str, int], int]]] = {}
+        tile_id_to_gids = TileUsageIndex()
         metatile_composition: Dict[Tuple[int, str, int], List] = {}
-        image_to_gid: Dict[bytes, int] = {}
-        next_gid = 1
-        
-        # Process each metatile in the map
-        for y in range(height):
-            for x in range(width):
-                entry = map_entries[y][x]
-                metatile_id = extract_metatile_id(entry)
-                
-                # Determine which tileset using processor
-                tileset_name, actual_metatile_id = self.metatile_processor.determine_tileset_for_metatile(
-                    metatile_id, primary_tileset, secondary_tileset
-                )
-                
-                # Get appropriate metatiles and attributes
-                if tileset_name == primary_tileset:
-                    metatiles_with_attrs = primary_metatiles_with_attrs
-                    attributes = primary_attributes
-                else:
-                    metatiles_with_attrs = secondary_metatiles_with_attrs
-                    attributes = secondary_attributes
-                
-                # Process single metatile using processor
-                result = self.metatile_processor.process_single_metatile(
-                    actual_metatile_id,
-                    tileset_name,
-                    metatiles_with_attrs,
-                    attributes,
-                    primary_tileset,
-                    secondary_tileset,
-                    used_metatiles,
-                    image_to_gid,
-                    next_gid
-                )
-                
-                metatile_images, single_metatile_to_gid, single_tile_id_to_gids, metatile_tiles, image_to_gid, next_gid = result
-                
-                # Merge results
-                metatile_to_gid.update(single_metatile_to_gid)
-                for tile_key, gid_list in single_tile_id_to_gids.items():
-                    if tile_key not in tile_id_to_gids:
-                        tile_id_to_gids[tile_key] = []
-                    tile_id_to_gids[tile_key].extend(gid_list)
-                
-                # Store metatile composition if we have tiles
-                if metatile_tiles:
-                    layer_type_val = attributes.get(actual_metatile_id, 0)
-                    key = (actual_metatile_id, tileset_name, layer_type_val)
-                    metatile_composition[key] = metatile_tiles
+        image_index = ImageDedupIndex(verify=self.verify_image_dedup)
+        
+        metatile_ids, unique_metatile_ids = self._flatten_metatile_ids(map_entries)
+        
+        # Process each distinct metatile in the map
+        for metatile_id in unique_metatile_ids:
+            tileset_name, actual_metatile_id, metatiles_with_attrs, attributes = self._resolve_metatile(
+                metatile_id, tileset_data
+            )
+            
+            # Process single metatile using processor
+            result = self.metatile_processor.process_single_metatile(
+                actual_metatile_id,
+                tileset_name,
+                metatiles_with_attrs,
+                attributes,
+                primary_tileset,
+                secondary_tileset,
+                used_metatiles,
+                image_index,
+                tile_id_to_gids,
+                tileset_data.get("rendered_metatiles")
+            )
+            
+            metatile_images, single_metatile_to_gid, metatile_tiles = result
+            
+            # Merge results
+            metatile_to_gid.update(single_metatile_to_gid)
+            
+            # Store metatile composition if we have tiles
+            if metatile_tiles:
+                layer_type_val = get_layer_type_value(attributes, actual_metatile_id)
+                key = (actual_metatile_id, tileset_name, layer_type_val)
+                metatile_composition[key] = metatile_tiles
         
         return {
             "used_metatiles": used_metatiles,
             "metatile_to_gid": metatile_to_gid,
             "tile_id_to_gids": tile_id_to_gids,
             "metatile_composition": metatile_composition,
-            "image_to_gid": image_to_gid,
-            "next_gid": next_gid
+            "image_index": image_index,
+            "metatile_ids": metatile_ids,
+            "unique_metatile_ids": unique_metatile_ids
         }
     
     def _process_border_metatiles(
@@ -502,23 +600,26 @@ class MapConverter:
         tileset_data: Dict[str, Any],
         used_metatiles: Dict[Tuple[int, str, int], Tuple[Image.Image, Image.Image]],
         metatile_to_gid: Dict[Tuple[int, str, int, bool], int],
-        image_to_gid: Dict[bytes, int],
-        next_gid: int
-    ) -> Tuple[Dict[str, int], int]:
+        image_index: Optional[ImageDedupIndex]
+    ) -> Dict[str, int]:
         """
         Process border metatiles and convert to GIDs.
         
+        New border images get GIDs from image_index. With image_index None the
+        tileset is fixed: borders are only looked up in metatile_to_gid (0 if
+        absent) and nothing is added.
+        
         Returns:
-            Tuple of (border_gids dict, updated next_gid)
+            Dict mapping corner name -> GID
         """
         border_gids = {}
         border_bin = layout.get("border_bin")
         if not border_bin:
-            return (border_gids, next_gid)
+            return border_gids
         
         border_bin_path = Path(border_bin)
         if not border_bin_path.exists():
-            return (border_gids, next_gid)
+            return border_gids
         
         primary_tileset = tileset_data["primary_tileset"]
         secondary_tileset = tileset_data["secondary_tileset"]
@@ -539,7 +640,6 @@ class MapConverter:
                     i = corner_idx * 2
                     if i + 1 < len(border_data):
                         border_entry = struct.unpack('<H', border_data[i:i+2])[0]
-                        from .constants import METATILE_ID_MASK
                         border_metatile_id = border_entry & METATILE_ID_MASK
                         
                         # Determine which tileset using processor
@@ -556,25 +656,32 @@ class MapConverter:
                             border_attributes = secondary_attributes
                         
                         # Get layer type
-                        border_layer_type_val = border_attributes.get(border_actual_id, 0)
+                        border_layer_type_val = get_layer_type_value(border_attributes, border_actual_id)
                         border_layer_type = MetatileLayerType(border_layer_type_val)
                         
                         # Check if this border metatile is already processed
                         border_key = (border_actual_id, border_tileset_name, border_layer_type_val)
-                        if border_key not in used_metatiles:
+                        if image_index is not None and border_key not in used_metatiles:
                             # Process border metatile
                             start_idx = border_actual_id * NUM_TILES_PER_METATILE
                             if start_idx < len(border_metatiles_with_attrs):
-                                border_metatile_tiles = border_metatiles_with_attrs[start_idx:start_idx + NUM_TILES_PER_METATILE]
+                                border_metatile_tiles = get_metatile_tiles(border_metatiles_with_attrs, border_actual_id)
                                 
                                 if len(border_metatile_tiles) == NUM_TILES_PER_METATILE:
-                                    # Render border metatile
-                                    border_bottom_img, border_top_img = self.metatile_renderer.render_metatile(
-                                        border_metatile_tiles,
-                                        primary_tileset,
-                                        secondary_tileset,
-                                        border_layer_type
-                                    )
+                                    # Render border metatile (looked up from the batch render when available)
+                                    rendered_metatiles = tileset_data.get("rendered_metatiles")
+                                    border_images = None
+                                    if rendered_metatiles is not None:
+                                        border_images = rendered_metatiles.get_images(border_tileset_name, border_actual_id)
+                                    if border_images is not None:
+                                        border_bottom_img, border_top_img = border_images
+                                    else:
+                                        border_bottom_img, border_top_img = self.metatile_renderer.render_metatile(
+                                            border_metatile_tiles,
+                                            primary_tileset,
+                                            secondary_tileset,
+                                            border_layer_type
+                                        )
                                     if border_bottom_img is None:
                                         border_bottom_img = Image.new('RGBA', (METATILE_SIZE, METATILE_SIZE), (0, 0, 0, 0))
                                     if border_top_img is None:
@@ -582,22 +689,9 @@ class MapConverter:
                                     used_metatiles[border_key] = (border_bottom_img, border_top_img)
                                     
                                     # Assign GIDs with deduplication
-                                    border_bottom_bytes = border_bottom_img.tobytes()
-                                    border_top_bytes = border_top_img.tobytes()
-                                    
-                                    if border_bottom_bytes in image_to_gid:
-                                        border_bottom_gid = image_to_gid[border_bottom_bytes]
-                                    else:
-                                        border_bottom_gid = next_gid
-                                        image_to_gid[border_bottom_bytes] = border_bottom_gid
-                                        next_gid += 1
-                                    
-                                    if border_top_bytes in image_to_gid:
-                                        border_top_gid = image_to_gid[border_top_bytes]
-                                    else:
-                                        border_top_gid = next_gid
-                                        image_to_gid[border_top_bytes] = border_top_gid
-                                        next_gid += 1
+                                    border_bottom_gid, border_top_gid = image_index.assign_metatile(
+                                        border_key, border_bottom_img, border_top_img
+                                    )
                                     
                                     metatile_to_gid[(border_actual_id, border_tileset_name, border_layer_type_val, False)] = border_bottom_gid
                                     metatile_to_gid[(border_actual_id, border_tileset_name, border_layer_type_val, True)] = border_top_gid
@@ -610,11 +704,12 @@ class MapConverter:
         except Exception as e:
             logger.warning(f"Error reading border.bin at {border_bin_path}: {e}")
         
-        return (border_gids, next_gid)
+        return border_gids
     
     def _build_map_layers(
         self,
-        map_entries: List[List[int]],
+        metatile_ids: Any,
+        unique_metatile_ids: List[int],
         width: int,
         height: int,
         metatile_to_gid: Dict[Tuple[int, str, int, bool], int],
@@ -624,17 +719,19 @@ class MapConverter:
         """
         Build map layer data by assigning GIDs to layers based on metatile layer types.
         
+        A per-layer lookup table (metatile ID -> GID) is built from the distinct
+        metatiles, then gathered over the whole map in one pass.
+        
+        Args:
+            metatile_ids: Metatile ID of every cell, row-major (from _process_metatiles)
+            unique_metatile_ids: Distinct metatile IDs in the map
+        
         Returns a dictionary containing:
         - layer_data_bg3: List of GIDs for BG3 layer
         - layer_data_bg2: List of GIDs for BG2 layer
         - layer_data_bg1: List of GIDs for BG1 layer
         - used_gids: Set of GIDs actually used in the map
         """
-        # Create layer data (one layer per BG layer)
-        layer_data_bg3 = [0] * (width * height)
-        layer_data_bg2 = [0] * (width * height)
-        layer_data_bg1 = [0] * (width * height)
-        
         used_gids = set()  # Track which GIDs are actually used in the map
         
         # Add border GIDs to used_gids so they're included in the tileset
@@ -643,62 +740,51 @@ class MapConverter:
                 if border_gid > 0:
                     used_gids.add(border_gid)
         
-        primary_attributes = tileset_data["primary_attributes"]
-        secondary_attributes = tileset_data["secondary_attributes"]
-        primary_tileset = tileset_data["primary_tileset"]
-        secondary_tileset = tileset_data["secondary_tileset"]
+        # One lookup table per BG layer: metatile ID -> GID
+        lut_size = METATILE_ID_MASK + 1
+        lut_bg3 = [0] * lut_size
+        lut_bg2 = [0] * lut_size
+        lut_bg1 = [0] * lut_size
         
-        for y in range(height):
-            for x in range(width):
-                entry = map_entries[y][x]
-                metatile_id = extract_metatile_id(entry)
-                
-                # Determine which tileset using processor
-                tileset_name, actual_metatile_id = self.metatile_processor.determine_tileset_for_metatile(
-                    metatile_id, primary_tileset, secondary_tileset
-                )
-                
-                # Get appropriate attributes
-                if tileset_name == primary_tileset:
-                    attributes = primary_attributes
-                else:
-                    attributes = secondary_attributes
-                
-                # Get layer type
-                layer_type_val = attributes.get(actual_metatile_id, 0)
-                layer_type = MetatileLayerType(layer_type_val)
-                
-                # Get GIDs for this metatile
-                bottom_gid = metatile_to_gid.get((actual_metatile_id, tileset_name, layer_type_val, False), 0)
-                top_gid = metatile_to_gid.get((actual_metatile_id, tileset_name, layer_type_val, True), 0)
-
-                idx = y * width + x
-                
-                # Assign to layers based on layer type and track used GIDs
-                if layer_type == MetatileLayerType.NORMAL:
-                    # Bottom -> Bg2, Top -> Bg1
-                    layer_data_bg2[idx] = bottom_gid
-                    layer_data_bg1[idx] = top_gid
-                    if bottom_gid > 0:
-                        used_gids.add(bottom_gid)
-                    if top_gid > 0:
-                        used_gids.add(top_gid)
-                elif layer_type == MetatileLayerType.COVERED:
-                    # Bottom -> Bg3, Top -> Bg2
-                    layer_data_bg3[idx] = bottom_gid
-                    layer_data_bg2[idx] = top_gid
-                    if bottom_gid > 0:
-                        used_gids.add(bottom_gid)
-                    if top_gid > 0:
-                        used_gids.add(top_gid)
-                elif layer_type == MetatileLayerType.SPLIT:
-                    # Bottom -> Bg3, Top -> Bg1
-                    layer_data_bg3[idx] = bottom_gid
-                    layer_data_bg1[idx] = top_gid
-                    if bottom_gid > 0:
-                        used_gids.add(bottom_gid)
-                    if top_gid > 0:
-                        used_gids.add(top_gid)
+        for metatile_id in unique_metatile_ids:
+            tileset_name, actual_metatile_id, _, attributes = self._resolve_metatile(metatile_id, tileset_data)
+            
+            # Get layer type
+            layer_type_val = get_layer_type_value(attributes, actual_metatile_id)
+            layer_type = MetatileLayerType(layer_type_val)
+            
+            # Get GIDs for this metatile
+            bottom_gid = metatile_to_gid.get((actual_metatile_id, tileset_name, layer_type_val, False), 0)
+            top_gid = metatile_to_gid.get((actual_metatile_id, tileset_name, layer_type_val, True), 0)
+            
+            # Assign to layers based on layer type and track used GIDs
+            if layer_type == MetatileLayerType.NORMAL:
+                # Bottom -> Bg2, Top -> Bg1
+                lut_bg2[metatile_id] = bottom_gid
+                lut_bg1[metatile_id] = top_gid
+            elif layer_type == MetatileLayerType.COVERED:
+                # Bottom -> Bg3, Top -> Bg2
+                lut_bg3[metatile_id] = bottom_gid
+                lut_bg2[metatile_id] = top_gid
+            elif layer_type == MetatileLayerType.SPLIT:
+                # Bottom -> Bg3, Top -> Bg1
+                lut_bg3[metatile_id] = bottom_gid
+                lut_bg1[metatile_id] = top_gid
+            else:
+                continue
+            if bottom_gid > 0:
+                used_gids.add(bottom_gid)
+            if top_gid > 0:
+                used_gids.add(top_gid)
+        
+        if np is not None:
+            layer_data_bg3 = np.asarray(lut_bg3)[metatile_ids].tolist()
+            layer_data_bg2 = np.asarray(lut_bg2)[metatile_ids].tolist()
+            layer_data_bg1 = np.asarray(lut_bg1)[metatile_ids].tolist()
+        else:
+            layer_data_bg3 = [lut_bg3[metatile_id] for metatile_id in metatile_ids]
+            layer_data_bg2 = [lut_bg2[metatile_id] for metatile_id in metatile_ids]
+            layer_data_bg1 = [lut_bg1[metatile_id] for metatile_id in metatile_ids]
         
         return {
             "layer_data_bg3": layer_data_bg3,
@@ -715,20 +801,27 @@ class MapConverter:
         metatile_to_gid: Dict[Tuple[int, str, int, bool], int],
         used_gids: Set[int],
         tileset_data: Dict[str, Any],
-        tile_id_to_gids: Dict[Tuple[int, str], List[Tuple[int, Tuple[int, str, int], int]]],
-        metatile_composition: Dict[Tuple[int, str, int], List]
+        tile_id_to_gids: TileUsageIndex,
+        metatile_composition: Dict[Tuple[int, str, int], List],
+        tileset_dir: Optional[Path] = None,
+        tileset_name: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create tileset image and JSON for the map.
         
+        Args:
+            tileset_dir: Directory to write to (default Tilesets/{region}/{map_name})
+            tileset_name: File and tileset name (default the map name)
+        
         Returns a dictionary containing:
         - tileset_json: The tileset JSON structure
         - tileset_image: The tileset image
         - tileset_dir: Path to tileset directory
-        - map_name: Sanitized map name
+        - map_name: Sanitized map name (the tileset name when one was given)
         """
-        map_name = sanitize_filename(map_id.replace("MAP_", "").lower())
-        tileset_dir = self.output_dir / "Tilesets" / region.lower() / map_name
+        map_name = tileset_name or sanitize_filename(map_id.replace("MAP_", "").lower())
+        if tileset_dir is None:
+            tileset_dir = self.output_dir / "Tilesets" / region.lower() / map_name
         tileset_dir.mkdir(parents=True, exist_ok=True)
         
         # Build unique set of images by GID (deduplication already done above)
@@ -764,10 +857,6 @@ class MapConverter:
             tileset_image.paste(img, (x, y), img)
             tile_idx += 1
         
-        # Save tileset image
-        tileset_image_path = tileset_dir / f"{map_name}.png"
-        tileset_image.save(str(tileset_image_path), "PNG")
-        
         # Create tileset JSON
         # Note: firstgid is NOT included in external tileset files - it's only in the map's tilesets array
         tileset_json = {
@@ -809,9 +898,6 @@ class MapConverter:
         # Update tileset image if we added animation frames
         if animations:  # Check animations list, not just animation_frames_gids
             tileset_image = updated_tileset_image
-            # Re-save tileset image with animation frames
-            tileset_image_path = tileset_dir / f"{map_name}.png"
-            tileset_image.save(str(tileset_image_path), "PNG")
             # Update tilecount and dimensions based on ACTUAL image size
             # (animation_frames_gids only tracks bottom layer, but top layer frames are also added)
             actual_rows = tileset_image.height // METATILE_SIZE
@@ -824,8 +910,11 @@ class MapConverter:
             tileset_json["tiles"] = animations
             logger.debug(f"Added {len(animations)} animations to {map_name} tileset")
         
+        # Save the tileset image once it is final (animation frames are pasted into it above)
+        save_png(tileset_image, tileset_dir / f"{map_name}.png")
+        
         tileset_json_path = tileset_dir / f"{map_name}.json"
-        save_json(tileset_json, str(tileset_json_path))
+        save_json(tileset_json, str(tileset_json_path), background=True)
         
         return {
             "tileset_json": tileset_json,
@@ -847,11 +936,15 @@ class MapConverter:
         layer_data_bg2: List[int],
         layer_data_bg1: List[int],
         border_gids: Dict[str, int],
-        warp_lookup: Optional[Dict[Tuple[str, int], Tuple[int, int, int]]] = None
+        warp_lookup: Optional[Dict[Tuple[str, int], Tuple[int, int, int]]] = None,
+        tileset_source: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create the final Tiled map JSON structure with all layers, objects, and properties.
         
+        tileset_source overrides the map's own tileset (e.g. a shared atlas),
+        relative to the Tiled map.
+        
         This method handles:
         - Map properties (name, border, connections)
         - Tileset references
@@ -1011,8 +1104,8 @@ class MapConverter:
             ("Objects", layer_data_bg2),
             ("Overhead", layer_data_bg1)
         ]:
-            tiled_map["layers"].append({
-                "data": layer_data,
+            layer = encode_layer_data(layer_data, self.layer_encoding)
+            layer.update({
                 "height": height,
                 "id": len(tiled_map["layers"]) + 1,
                 "name": layer_name,
@@ -1023,13 +1116,14 @@ class MapConverter:
                 "x": 0,
                 "y": 0
             })
+            tiled_map["layers"].append(layer)
         
         # Add tileset reference
         # Tiled map is at: output/Tiled/Regions/{Region}/{map_name}.json
         # Tileset is at: output/Tilesets/{region}/{map_name}/{map_name}.json (lowercase region)
         # From Tiled/Regions/{Region}/, go up 3 levels to output/, then into Tilesets/
         # (.. -> Tiled/Regions/, ../.. -> Tiled/, ../../.. -> output/)
-        tileset_path = f"../../../Tilesets/{region.lower()}/{map_name}/{map_name}.json"
+        tileset_path = tileset_source or f"../../../Tilesets/{region.lower()}/{map_name}/{map_name}.json"
         tiled_map["tilesets"] = [{
             "firstgid": 1,
             "source": tileset_path
@@ -1404,14 +1498,18 @@ class MapConverter:
         if not tileset_data:
             return None
         
+        if self.tileset_mode == "pair":
+            return self._convert_map_with_shared_tileset(
+                map_id, map_data, layout, map_entries, width, height, tileset_data, region, warp_lookup
+            )
+        
         # Process metatiles
         metatile_result = self._process_metatiles(map_entries, width, height, tileset_data)
         used_metatiles = metatile_result["used_metatiles"]
         metatile_to_gid = metatile_result["metatile_to_gid"]
         tile_id_to_gids = metatile_result["tile_id_to_gids"]
         metatile_composition = metatile_result["metatile_composition"]
-        image_to_gid = metatile_result["image_to_gid"]
-        next_gid = metatile_result["next_gid"]
+        image_index = metatile_result["image_index"]
         
         primary_tileset = tileset_data["primary_tileset"]
         secondary_tileset = tileset_data["secondary_tileset"]
@@ -1421,13 +1519,14 @@ class MapConverter:
         secondary_attributes = tileset_data["secondary_attributes"]
 
         # Process border metatiles
-        border_gids, next_gid = self._process_border_metatiles(
-            layout, tileset_data, used_metatiles, metatile_to_gid, image_to_gid, next_gid
+        border_gids = self._process_border_metatiles(
+            layout, tileset_data, used_metatiles, metatile_to_gid, image_index
         )
         
         # Build map layers
         layer_result = self._build_map_layers(
-            map_entries, width, height, metatile_to_gid, tileset_data, border_gids
+            metatile_result["metatile_ids"], metatile_result["unique_metatile_ids"],
+            width, height, metatile_to_gid, tileset_data, border_gids
         )
         layer_data_bg3 = layer_result["layer_data_bg3"]
         layer_data_bg2 = layer_result["layer_data_bg2"]
@@ -1450,6 +1549,110 @@ class MapConverter:
         
         return tiled_map
     
+    def _shared_tileset_name(self, primary_tileset: str, secondary_tileset: str) -> str:
+        """Name of a tileset pair's shared atlas (e.g. "general__petalburg")."""
+        return sanitize_filename(f"{camel_to_snake(primary_tileset)}__{camel_to_snake(secondary_tileset)}")
+    
+    def _shared_tileset_dir(self, region: str, tileset_name: str) -> Path:
+        """Directory of a shared atlas: Tilesets/{region}/shared/{tileset_name}."""
+        return self.output_dir / "Tilesets" / region.lower() / SHARED_TILESET_DIR / tileset_name
+    
+    def _get_shared_tileset(self, region: str, tileset_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build and write the shared atlas of a tileset pair.
+        
+        The atlas holds every metatile of the pair rather than the ones a
+        single map uses, so its content and GIDs do not depend on which maps
+        a process converts: pool workers handed the same pair write identical
+        files (each stages them privately and renames them into place), and
+        cached maps stay valid. The most recent atlas is kept, since maps
+        arrive batched by tileset pair.
+        
+        Returns a dictionary containing:
+        - metatile_to_gid: Dict mapping (metatile_id, tileset, layer_type, is_top) -> GID
+        - used_metatiles: Dict mapping (metatile_id, tileset, layer_type) -> (bottom_img, top_img)
+        - tileset_json: The atlas tileset JSON structure
+        - tileset_source: Atlas path relative to a Tiled map of the region
+        """
+        primary_tileset = tileset_data["primary_tileset"]
+        secondary_tileset = tileset_data["secondary_tileset"]
+        key = (region.lower(), primary_tileset, secondary_tileset)
+        if key in self._shared_tilesets:
+            return self._shared_tilesets[key]
+        
+        # Every metatile the pair defines, processed as one row of a synthetic map
+        primary_count = min(len(tileset_data["primary_metatiles_with_attrs"]) // NUM_TILES_PER_METATILE,
+                            NUM_METATILES_IN_PRIMARY)
+        secondary_count = min(len(tileset_data["secondary_metatiles_with_attrs"]) // NUM_TILES_PER_METATILE,
+                              METATILE_ID_MASK + 1 - NUM_METATILES_IN_PRIMARY)
+        all_metatile_ids = list(range(primary_count)) + [
+            NUM_METATILES_IN_PRIMARY + i for i in range(secondary_count)
+        ]
+        metatile_result = self._process_metatiles([all_metatile_ids], len(all_metatile_ids), 1, tileset_data)
+        metatile_to_gid = metatile_result["metatile_to_gid"]
+        used_gids = {gid for gid in metatile_to_gid.values() if gid > 0}
+        
+        tileset_name = self._shared_tileset_name(primary_tileset, secondary_tileset)
+        tileset_dir = self._shared_tileset_dir(region, tileset_name)
+        staging_dir = tileset_dir.parent / f".{tileset_name}.{os.getpid()}.tmp"
+        try:
+            tileset_info = self._create_tileset_for_map(
+                tileset_name, region, metatile_result["used_metatiles"], metatile_to_gid, used_gids,
+                tileset_data, metatile_result["tile_id_to_gids"], metatile_result["metatile_composition"],
+                tileset_dir=staging_dir, tileset_name=tileset_name
+            )
+            flush_writes()
+            tileset_dir.mkdir(parents=True, exist_ok=True)
+            for staged_path in staging_dir.iterdir():
+                install_file(staged_path, tileset_dir / staged_path.name)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        
+        logger.debug(f"Wrote shared tileset {tileset_name} ({len(used_gids)} tiles)")
+        atlas = {
+            "metatile_to_gid": metatile_to_gid,
+            "used_metatiles": metatile_result["used_metatiles"],
+            "tileset_json": tileset_info["tileset_json"],
+            "tileset_source": f"../../../Tilesets/{region.lower()}/{SHARED_TILESET_DIR}/{tileset_name}/{tileset_name}.json"
+        }
+        self._shared_tilesets = {key: atlas}
+        return atlas
+    
+    def _convert_map_with_shared_tileset(
+        self,
+        map_id: str,
+        map_data: Dict[str, Any],
+        layout: Dict[str, Any],
+        map_entries: Sequence[Sequence[int]],
+        width: int,
+        height: int,
+        tileset_data: Dict[str, Any],
+        region: str,
+        warp_lookup: Optional[Dict[Tuple[str, int], Tuple[int, int, int]]] = None
+    ) -> Dict[str, Any]:
+        """convert_map_with_metatiles for "pair" tileset mode: GIDs come from the pair's shared atlas."""
+        atlas = self._get_shared_tileset(region, tileset_data)
+        
+        # The atlas already holds every metatile of the pair; borders are only
+        # looked up (no image index), so the shared atlas is never modified
+        metatile_to_gid = atlas["metatile_to_gid"]
+        border_gids = self._process_border_metatiles(
+            layout, tileset_data, atlas["used_metatiles"], metatile_to_gid, None
+        )
+        
+        # Metatile IDs the pair does not define have no GID (empty cells)
+        metatile_ids, unique_metatile_ids = self._flatten_metatile_ids(map_entries)
+        layer_result = self._build_map_layers(
+            metatile_ids, unique_metatile_ids, width, height, metatile_to_gid, tileset_data, border_gids
+        )
+        
+        map_name = sanitize_filename(map_id.replace("MAP_", "").lower())
+        return self._create_tiled_map_structure(
+            map_data, map_id, width, height, map_name, region, atlas["tileset_json"],
+            layer_result["layer_data_bg3"], layer_result["layer_data_bg2"], layer_result["layer_data_bg1"],
+            border_gids, warp_lookup, tileset_source=atlas["tileset_source"]
+        )
+    
     def _build_metatile_animations(
         self,
         primary_tileset: str,
@@ -1460,7 +1663,7 @@ class MapConverter:
         primary_metatiles: List[Tuple[int, int, int]],
         secondary_metatiles: List[Tuple[int, int, int]],
         metatile_key_to_bottom_gid: Dict[Tuple[int, str, int], int],
-        tile_id_to_gids: Dict[Tuple[int, str], List[Tuple[int, Tuple[int, str, int]]]],
+        tile_id_to_gids: TileUsageIndex,
         metatile_composition: Dict[Tuple[int, str, int], List],
         tileset_image: Image.Image,
         current_tile_idx: int,
@@ -0,0 +1,84 @@
+"""
+Image deduplication - assigns one GID per distinct rendered image.
+
+Images are keyed by a 16-byte blake2b digest of their pixels instead of the
+raw pixel bytes (1 KiB per 16x16 RGBA metatile), and each metatile's GIDs are
+remembered so a metatile seen again is never re-serialized.
+"""
+
+import hashlib
+from typing import Dict, Hashable, List, Tuple
+from PIL import Image
+from .logging_config import get_logger
+
+logger = get_logger('image_dedup')
+
+DIGEST_SIZE = 16
+
+
+def image_digest(image: Image.Image) -> bytes:
+    """Return the 16-byte blake2b digest of an image's pixel data."""
+    return hashlib.blake2b(image.tobytes(), digest_size=DIGEST_SIZE).digest()
+
+
+class ImageDedupIndex:
+    """Digest-keyed image -> GID index for one map's tileset."""
+
+    def __init__(self, next_gid: int = 1, verify: bool = False):
+        """
+        Initialize dedup index.
+
+        Args:
+            next_gid: First GID to hand out
+            verify: Keep pixel data and compare it on every digest hit, so only
+                real duplicates share a GID (costs the memory digests save)
+        """
+        self.next_gid = next_gid
+        self.verify = verify
+        self._digest_to_gid: Dict[bytes, int] = {}
+        self._metatile_gids: Dict[Hashable, Tuple[int, int]] = {}
+        # digest -> [(pixels, gid), ...], only populated when verify is set
+        self._pixels: Dict[bytes, List[Tuple[bytes, int]]] = {}
+
+    def get_or_add(self, image: Image.Image) -> int:
+        """Return the GID of an image, assigning the next free GID if it is new."""
+        digest = image_digest(image)
+
+        if self.verify:
+            pixels = image.tobytes()
+            candidates = self._pixels.setdefault(digest, [])
+            for candidate_pixels, gid in candidates:
+                if candidate_pixels == pixels:
+                    return gid
+            if candidates:
+                logger.warning(f"Image digest collision on {digest.hex()}; assigning a separate GID")
+            gid = self._allocate()
+            candidates.append((pixels, gid))
+            self._digest_to_gid.setdefault(digest, gid)
+            return gid
+
+        gid = self._digest_to_gid.get(digest)
+        if gid is None:
+            gid = self._allocate()
+            self._digest_to_gid[digest] = gid
+        return gid
+
+    def assign_metatile(self, key: Hashable, bottom_img: Image.Image, top_img: Image.Image) -> Tuple[int, int]:
+        """
+        Return the (bottom_gid, top_gid) of a metatile, deduplicating its images.
+
+        Args:
+            key: Metatile key, e.g. (metatile_id, tileset, layer_type)
+            bottom_img: Rendered bottom layer
+            top_img: Rendered top layer
+        """
+        gids = self._metatile_gids.get(key)
+        if gids is None:
+            gids = (self.get_or_add(bottom_img), self.get_or_add(top_img))
+            self._metatile_gids[key] = gids
+        return gids
+
+    def _allocate(self) -> int:
+        gid = self.next_gid
+        self.next_gid += 1
+        return gid
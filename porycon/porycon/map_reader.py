@@ -5,12 +5,19 @@ This module extracts file I/O and parsing logic from MapConverter to improve
 testability and separation of concerns.
 """
 
-import struct
+import sys
+from array import array
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Sequence, Tuple
 from .utils import TilesetPathResolver
+from .metatile import decode_metatile_words
 from .logging_config import get_logger
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; files are then decoded into array('H')
+    np = None
+
 logger = get_logger('map_reader')
 
 
@@ -27,7 +34,28 @@ class MapReader:
         self.input_dir = Path(input_dir)
         self.path_resolver = TilesetPathResolver(self.input_dir)
     
-    def read_map_bin(self, map_bin_path: Path, width: int, height: int) -> List[List[int]]:
+    def _read_u16_words(self, path: Path) -> Sequence[int]:
+        """
+        Read a file of little-endian u16 words without unpacking them one by one.
+        
+        Returns:
+            Read-only NumPy view over the file contents, or array('H') without NumPy
+            (a trailing odd byte is ignored)
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        count = len(data) // 2
+        if np is not None:
+            return np.frombuffer(data, dtype='<u2', count=count)
+        
+        words = array('H')
+        words.frombytes(data[:count * 2])
+        if sys.byteorder != 'little':
+            words.byteswap()
+        return words
+    
+    def read_map_bin(self, map_bin_path: Path, width: int, height: int) -> Sequence[Sequence[int]]:
         """
         Read a map.bin file containing metatile data.
         
@@ -42,7 +70,8 @@ class MapReader:
             height: Expected map height in metatiles
         
         Returns:
-            2D list [y][x] of metatile entries (u16 values)
+            [y][x] grid of metatile entries (u16 values): a (height, width) NumPy
+            array, or a list of array('H') rows without NumPy
         
         Raises:
             ValueError: If file size doesn't match expected dimensions
@@ -50,31 +79,17 @@ class MapReader:
         if not map_bin_path.exists():
             raise FileNotFoundError(f"map.bin not found: {map_bin_path}")
         
-        with open(map_bin_path, 'rb') as f:
-            data = f.read()
-        
-        # Each entry is 2 bytes (u16)
-        entries = []
-        for i in range(0, len(data), 2):
-            if i + 1 < len(data):
-                entry = struct.unpack('<H', data[i:i+2])[0]
-                entries.append(entry)
+        entries = self._read_u16_words(map_bin_path)
         
         # Reshape to 2D [y][x]
         if len(entries) != width * height:
             raise ValueError(f"Expected {width * height} entries, got {len(entries)}")
         
-        map_data = []
-        for y in range(height):
-            row = []
-            for x in range(width):
-                idx = y * width + x
-                row.append(entries[idx])
-            map_data.append(row)
-        
-        return map_data
+        if np is not None:
+            return entries.reshape(height, width)
+        return [entries[y * width:(y + 1) * width] for y in range(height)]
     
-    def read_metatile_attributes(self, tileset_name: str) -> Dict[int, int]:
+    def read_metatile_attributes(self, tileset_name: str) -> Sequence[int]:
         """
         Load metatile attributes to get layer types.
         
@@ -86,40 +101,35 @@ class MapReader:
             tileset_name: Name of the tileset (e.g., "General")
         
         Returns:
-            Dictionary mapping metatile_id -> layer_type (0-15)
+            Layer type (0-15) per metatile ID, as a uint8 NumPy array or array('B');
+            empty if the tileset has no attributes (read with get_layer_type_value)
         """
+        empty = np.zeros(0, dtype=np.uint8) if np is not None else array('B')
+        
         # Get tileset directory
         result = self.path_resolver.find_tileset_path(tileset_name)
         if not result:
             logger.warning(f"Tileset '{tileset_name}' not found")
-            return {}
+            return empty
         
         category, tileset_dir = result
         attributes_path = tileset_dir / "metatile_attributes.bin"
         
         if not attributes_path.exists():
             logger.debug(f"metatile_attributes.bin not found for {tileset_name} at {attributes_path}")
-            return {}
+            return empty
         
         try:
-            with open(attributes_path, 'rb') as f:
-                data = f.read()
-            
-            attributes = {}
-            for i in range(0, len(data), 2):
-                if i + 1 < len(data):
-                    attr = struct.unpack('<H', data[i:i+2])[0]
-                    metatile_id = i // 2
-                    # Extract layer type (bits 12-15)
-                    layer_type = (attr >> 12) & 0x0F
-                    attributes[metatile_id] = layer_type
-            
-            return attributes
+            words = self._read_u16_words(attributes_path)
+            # Extract layer type (bits 12-15)
+            if np is not None:
+                return ((words >> 12) & 0x0F).astype(np.uint8)
+            return array('B', ((attr >> 12) & 0x0F for attr in words))
         except Exception as e:
             logger.warning(f"Error reading {attributes_path}: {e}")
-            return {}
+            return empty
     
-    def read_metatiles_with_attributes(self, tileset_name: str) -> List[Tuple[int, int, int]]:
+    def read_metatiles_with_attributes(self, tileset_name: str) -> Sequence[Tuple[int, int, int]]:
         """
         Load metatiles with full tile attributes (tile_id, flip_flags, palette_index).
         
@@ -127,7 +137,8 @@ class MapReader:
             tileset_name: Name of the tileset (e.g., "General")
         
         Returns:
-            List of tuples: (tile_id, flip_flags, palette_index)
+            One (tile_id, flip_flags, palette_index) row per tile, as decoded by
+            decode_metatile_words ((N, 3) NumPy array, or list of tuples without NumPy)
             - tile_id: bits 0-9 (0-1023)
             - flip_flags: bits 10-11 (0-3: 0=none, 1=h, 2=v, 3=hv)
             - palette_index: bits 12-15 (0-15)
@@ -146,23 +157,11 @@ class MapReader:
             return []
         
         try:
-            with open(metatiles_path, 'rb') as f:
-                data = f.read()
-            
-            metatiles = []
-            for i in range(0, len(data), 2):
-                if i + 1 < len(data):
-                    tile_attr = struct.unpack('<H', data[i:i+2])[0]
-                    # Extract components
-                    tile_id = tile_attr & 0x3FF  # Bits 0-9
-                    flip_flags = (tile_attr >> 10) & 0x3  # Bits 10-11
-                    palette_index = (tile_attr >> 12) & 0xF  # Bits 12-15
-                    metatiles.append((tile_id, flip_flags, palette_index))
+            metatiles = decode_metatile_words(self._read_u16_words(metatiles_path))
             
             if len(metatiles) > 0:
                 # Debug: show sample palette indices
-                sample_palettes = [m[2] for m in metatiles[:20]]
-                unique_palettes = set(sample_palettes)
+                unique_palettes = {int(m[2]) for m in metatiles[:20]}
                 if len(unique_palettes) > 1:
                     logger.debug(f"Loaded {len(metatiles)} metatiles with attributes for {tileset_name}, sample palettes: {sorted(unique_palettes)}")
             
@@ -170,4 +169,3 @@ class MapReader:
         except Exception as e:
             logger.warning(f"Error reading {metatiles_path}: {e}")
             return []
-
@@ -1,38 +1,220 @@
 """
 Worker function for parallel map conversion.
 This module exists separately so it can be properly pickled for multiprocessing.
+
+Each pool process builds a single ConverterContext (via init_worker) and reuses
+it for every map it converts, so tileset images, palettes and parsed animation
+data stay cached across maps instead of being reloaded per task.
 """
 
+import hashlib
+import json
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from .converter import MapConverter
+from .build_cache import BuildCache
+from .utils import configure_json_output
+from .png_output import PngEncodeStats, configure_png_output, palette_sidecar_path, take_png_stats
+from .output_writer import OutputStats, flush_writes, record_unchanged_outputs, take_output_stats
+from .tileset_index import TilesetIndex, set_tileset_index
+from .tileset_manifest import TilesetManifest, set_tileset_manifest
 
 
-def convert_single_map(args_tuple):
-    """Convert a single map - designed for parallel execution."""
-    map_id, map_info, input_dir, output_dir, layouts_dict, region_override, warp_lookup = args_tuple
+@dataclass
+class MapResult:
+    """
+    Outcome of converting one map - the only data a worker sends back.
     
-    try:
-        from .converter import MapConverter
-        from .utils import load_json
+    Converted maps are written to disk by the worker, so the record stays the
+    same small size however large the map is.
+    """
+    status: str  # "success", "cached", "skipped", "skipped_layout", "failed" or "error"
+    map_id: str
+    error: Optional[str] = None
+    # map_id, map_name, region, connections, width, height (for WorldBuilder)
+    world_data: Optional[Dict[str, Any]] = None
+    # PNGs written by the worker since its previous report (for the timing summary);
+    # set on the last result of each batch
+    png_stats: Optional[PngEncodeStats] = None
+    # Output files the worker changed or left unchanged since its previous report
+    # (for the changed/unchanged summary); set on the last result of each batch
+    output_stats: Optional[OutputStats] = None
+
+
+class ConverterContext:
+    """Long-lived conversion state shared by all maps handled by one process."""
+    
+    def __init__(
+        self,
+        input_dir: str,
+        output_dir: str,
+        layouts: Optional[Dict[str, Dict[str, Any]]] = None,
+        warp_lookup: Optional[Dict[Tuple[str, int], Tuple[int, int, int]]] = None,
+        region_override: Optional[str] = None,
+        use_build_cache: bool = True,
+        tileset_index: Optional[TilesetIndex] = None,
+        tileset_manifest: Optional[TilesetManifest] = None,
+        layer_encoding: str = "array",
+        json_style: str = "pretty",
+        write_pkmap: bool = False,
+        tileset_mode: str = "map",
+        png_mode: str = "rgba",
+        palette_sidecar: bool = False,
+        png_profile: str = "default",
+        verify_dedup: bool = False
+    ):
+        """
+        Initialize converter context.
         
-        # Create a converter instance for this worker
-        local_converter = MapConverter(str(input_dir), str(output_dir))
+        Args:
+            input_dir: Path to pokeemerald root directory
+            output_dir: Output directory
+            layouts: Layout dict from find_layout_files
+            warp_lookup: Warp lookup table from MapConverter.build_warp_lookup
+            region_override: Region from --region, or None to use each map's region
+            use_build_cache: Whether to consult and update the build cache
+                (and the on-disk metatile render cache)
+            tileset_index: Prebuilt tileset index to share (scanned here if None)
+            tileset_manifest: Prebuilt tileset manifest to share (computed on demand if None)
+            layer_encoding: Tile layer data encoding (see layer_encoding.LAYER_ENCODINGS)
+            json_style: save_json output style for this process (see utils.JSON_STYLES)
+            write_pkmap: Also write a binary .pkmap next to each Tiled map
+            tileset_mode: One tileset per map or shared per tileset pair (see converter.TILESET_MODES)
+            png_mode: save_png image mode for this process (see png_output.PNG_MODES)
+            palette_sidecar: Write a palette sidecar next to every indexed PNG
+            png_profile: PNG encode profile (see png_output.PNG_PROFILES)
+            verify_dedup: Compare pixels on image digest hits, so only real duplicates share a GID
+        """
+        configure_json_output(json_style)
+        configure_png_output(png_mode, palette_sidecar, png_profile)
+        if tileset_index is not None:
+            set_tileset_index(tileset_index)
+        if tileset_manifest is not None:
+            set_tileset_manifest(tileset_manifest)
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.layouts = layouts or {}
+        self.warp_lookup = warp_lookup or {}
+        self.region_override = region_override
+        self.layer_encoding = layer_encoding
+        self.json_style = json_style
+        self.write_pkmap = write_pkmap
+        self.tileset_mode = tileset_mode
+        self.png_mode = png_mode
+        self.palette_sidecar = palette_sidecar
+        self.png_profile = png_profile
+        self.verify_dedup = verify_dedup
+        self.converter = MapConverter(str(self.input_dir), str(self.output_dir), use_render_cache=use_build_cache,
+                                      layer_encoding=layer_encoding, write_pkmap=write_pkmap,
+                                      tileset_mode=tileset_mode, verify_image_dedup=verify_dedup)
+        self.build_cache = BuildCache(self.input_dir, self.output_dir, enabled=use_build_cache)
+        # map_id -> (cache_key, outputs, world_data) of maps whose outputs may still be queued
+        self.pending_cache_entries: Dict[str, Tuple[str, List[Path], Dict[str, Any]]] = {}
+
+
+# The context of the current process, set by init_worker
+_worker_context: Optional[ConverterContext] = None
+
+
+def init_worker(*context_args) -> None:
+    """
+    Build this process's ConverterContext.
+    
+    Intended as the ProcessPoolExecutor initializer; accepts the same
+    arguments as ConverterContext.
+    """
+    global _worker_context
+    _worker_context = ConverterContext(*context_args)
+
+
+def get_worker_context() -> ConverterContext:
+    """Return the context built by init_worker for this process."""
+    if _worker_context is None:
+        raise RuntimeError("Converter context not initialized; call init_worker() first")
+    return _worker_context
+
+
+def _warp_destinations(map_data, warp_lookup):
+    """Resolve the destination of every warp in a map (part of its cache key)."""
+    destinations = []
+    for warp in map_data.get("warp_events", []):
+        dest_map = warp.get("dest_map", "")
+        dest_warp_id = warp.get("dest_warp_id", "")
+        try:
+            resolved = warp_lookup.get((dest_map, int(dest_warp_id)))
+        except (ValueError, TypeError):
+            resolved = None
+        destinations.append([dest_map, str(dest_warp_id), resolved])
+    return destinations
+
+
+def _convert_map(args_tuple) -> MapResult:
+    """
+    Convert a single map.
+    
+    Its output files may still be on the write-behind queue when this
+    returns; its build cache entry waits in the context until
+    _commit_outputs has flushed them.
+    """
+    map_id, map_info = args_tuple
+    
+    try:
+        # Reuse the converter built once for this process
+        context = get_worker_context()
+        local_converter = context.converter
+        build_cache = context.build_cache
+        layouts_dict = context.layouts
+        warp_lookup = context.warp_lookup
         
         # Use --region argument if provided, otherwise use region from map data
-        region = region_override if region_override else map_info.get("region", "hoenn")
+        region = context.region_override if context.region_override else map_info.get("region", "hoenn")
         
-        map_data = load_json(map_info["map_file"])
+        # map.json was parsed during discovery and shipped with the task
+        map_data = map_info.get("map_data")
+        json_digest = map_info.get("json_digest")
+        if map_data is None or json_digest is None:
+            with open(map_info["map_file"], 'rb') as f:
+                map_json_bytes = f.read()
+            map_data = json.loads(map_json_bytes.decode('utf-8'))
+            json_digest = hashlib.blake2b(map_json_bytes, digest_size=16).hexdigest()
         layout_id = map_info["layout_id"]
         
         if not layout_id:
-            return ("skipped", map_id, "No layout_id", None, None, {}, {})
+            return MapResult("skipped", map_id, "No layout_id")
         
         if layout_id not in layouts_dict:
-            return ("skipped_layout", map_id, f"Layout {layout_id} not found", None, None, {}, {})
+            return MapResult("skipped_layout", map_id, f"Layout {layout_id} not found")
         
         layout = layouts_dict[layout_id]
         map_bin = layout.get("map_bin")
         if not map_bin or not Path(map_bin).exists():
-            return ("skipped", map_id, f"map.bin not found", None, None, {}, {})
+            return MapResult("skipped", map_id, f"map.bin not found")
+        
+        # Skip maps whose inputs and outputs are unchanged since the last run
+        cache_key = build_cache.compute_map_key(
+            json_digest,
+            layout,
+            region,
+            _warp_destinations(map_data, warp_lookup),
+            {
+                "layer_encoding": context.layer_encoding,
+                "json_style": context.json_style,
+                "pkmap": context.write_pkmap,
+                "tileset_mode": context.tileset_mode,
+                "png_mode": context.png_mode,
+                "palette_sidecar": context.palette_sidecar,
+                "png_profile": context.png_profile,
+                "verify_dedup": context.verify_dedup
+            }
+        )
+        cached_world_data = build_cache.lookup(map_id, cache_key)
+        if cached_world_data is not None:
+            outputs = build_cache.recorded_outputs(map_id)
+            # Palette sidecars are optional per image, so the cache entry does not list them
+            sidecars = [palette_sidecar_path(path) for path in outputs if path.suffix == ".png"]
+            record_unchanged_outputs(outputs + [path for path in sidecars if path.exists()])
+            return MapResult("cached", map_id, world_data=cached_world_data)
         
         # Use new metatile-based conversion
         try:
@@ -52,38 +234,79 @@ def convert_single_map(args_tuple):
             error_details = f"{type(e).__name__}: {str(e)}"
             if error_location:
                 error_details += f"\n  Location: {error_location}"
-            return ("error", map_id, error_details, None, None, {}, {})
+            return MapResult("error", map_id, error_details)
         
         if tiled_map:
             map_name = map_id.replace("MAP_", "").lower()
             local_converter.save_map(map_id, tiled_map, region, map_data)
             
-            # With per-map tilesets, we don't need to collect used_tiles anymore
-            # Each map has its own tileset
-            used_tiles_dict = {}
-            used_tiles_with_palettes_dict = {}
-            
-            # Return data for world builder
-            connections = map_data.get("connections", [])
-            return ("success", map_id, None, {
+            # Everything else goes to disk; only this summary goes back to the parent
+            world_data = {
                 "map_id": map_id,
                 "map_name": map_name,
                 "region": region,
-                "connections": connections,
+                "connections": map_data.get("connections", []),
                 "width": tiled_map["width"],
-                "height": tiled_map["height"],
-                "map_data": map_data
-            }, tiled_map, used_tiles_dict, used_tiles_with_palettes_dict)
+                "height": tiled_map["height"]
+            }
+            context.pending_cache_entries[map_id] = (
+                cache_key, local_converter.get_map_output_paths(map_id, region, layout), world_data
+            )
+            return MapResult("success", map_id, world_data=world_data)
         else:
             # Try to get more specific error information
             layout_id = map_info.get("layout_id", "unknown")
             layout = layouts_dict.get(layout_id, {})
             map_bin = layout.get("map_bin", "unknown")
             error_msg = f"convert_map_with_metatiles returned None (layout={layout_id}, map_bin={map_bin})"
-            return ("failed", map_id, error_msg, None, None, {}, {})
+            return MapResult("failed", map_id, error_msg)
     
     except Exception as e:
         import traceback
         error_details = f"{type(e).__name__}: {str(e)}"
-        return ("error", map_id, error_details, None, None, {}, {})
+        return MapResult("error", map_id, error_details)
 
+
+
+def _commit_outputs(results: List[MapResult]) -> List[MapResult]:
+    """
+    Wait for the queued outputs of converted maps, then record them in the build cache.
+    
+    If a queued write fails, the maps still pending are reported as errors
+    and get no cache entry, so the next run converts them again.
+    """
+    if _worker_context is None:
+        return results
+    pending = _worker_context.pending_cache_entries
+    _worker_context.pending_cache_entries = {}
+    try:
+        flush_writes()
+    except Exception as e:
+        error = f"Writing outputs failed: {type(e).__name__}: {e}"
+        results = [MapResult("error", result.map_id, error) if result.map_id in pending else result
+                   for result in results]
+    else:
+        for map_id, (cache_key, outputs, world_data) in pending.items():
+            _worker_context.build_cache.store(map_id, cache_key, outputs, world_data)
+    if results:
+        results[-1].png_stats = take_png_stats()
+        results[-1].output_stats = take_output_stats()
+    return results
+
+
+def convert_single_map(args_tuple) -> MapResult:
+    """Convert a single map - designed for parallel execution."""
+    return _commit_outputs([_convert_map(args_tuple)])[0]
+
+
+def convert_map_batch(batch):
+    """
+    Convert a batch of maps sharing one tileset pair - designed for parallel execution.
+    
+    Map outputs are written behind while the next map renders; the batch
+    returns once all of them are on disk.
+    
+    Returns:
+        List of MapResult records, in batch order
+    """
+    return _commit_outputs([_convert_map(task) for task in batch])
@@ -5,7 +5,7 @@ Converts Pokemon Emerald metatiles (2x2 groups of 8 tiles) into individual tiles
 distributed across BG layers based on layer type.
 """
 
-from typing import List, Tuple
+from typing import Any, List, Sequence, Tuple
 from enum import IntEnum
 from .constants import (
     NUM_TILES_PER_METATILE,
@@ -14,6 +14,11 @@ from .constants import (
     METATILE_ID_MASK
 )
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; tables are then decoded into plain lists/arrays
+    np = None
+
 
 class MetatileLayerType(IntEnum):
     """Metatile layer type determines how tiles are distributed across BG layers."""
@@ -128,3 +133,43 @@ def extract_metatile_id(entry: int) -> int:
     """Extract metatile ID from map entry (bits 0-9)."""
     return entry & METATILE_ID_MASK
 
+
+def decode_metatile_words(words: Sequence[int]) -> Any:
+    """
+    Split metatiles.bin u16 words into (tile_id, flip_flags, palette_index).
+    
+    - tile_id: bits 0-9 (0-1023)
+    - flip_flags: bits 10-11 (0-3: 0=none, 1=h, 2=v, 3=hv)
+    - palette_index: bits 12-15 (0-15)
+    
+    Args:
+        words: u16 words (NumPy array or array('H'))
+    
+    Returns:
+        (N, 3) uint16 NumPy array when NumPy is available, else a list of tuples
+    """
+    if np is not None:
+        words = np.asarray(words, dtype=np.uint16)
+        return np.stack([words & 0x3FF, (words >> 10) & 0x3, (words >> 12) & 0xF], axis=1)
+    return [(word & 0x3FF, (word >> 10) & 0x3, (word >> 12) & 0xF) for word in words]
+
+
+def get_metatile_tiles(metatile_data: Sequence[Tuple[int, int, int]], metatile_id: int) -> List[Tuple[int, int, int]]:
+    """
+    Return the (up to) 8 tiles of a metatile as plain (tile_id, flip, palette) tuples.
+    
+    Accepts the decoded table in either form returned by decode_metatile_words.
+    No bounds check beyond slicing; callers validate the metatile ID first.
+    """
+    start_idx = metatile_id * NUM_TILES_PER_METATILE
+    tiles = metatile_data[start_idx:start_idx + NUM_TILES_PER_METATILE]
+    if np is not None and isinstance(tiles, np.ndarray):
+        return [tuple(tile) for tile in tiles.tolist()]
+    return list(tiles)
+
+
+def get_layer_type_value(layer_types: Sequence[int], metatile_id: int) -> int:
+    """Layer type of a metatile from a decoded attributes table, 0 (NORMAL) if out of range."""
+    if 0 <= metatile_id < len(layer_types):
+        return int(layer_types[metatile_id])
+    return 0
@@ -5,10 +5,12 @@ This module extracts metatile processing logic from MapConverter to improve
 testability and separation of concerns.
 """
 
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Sequence, Tuple, Optional
 from PIL import Image
-from .metatile import MetatileLayerType, NUM_TILES_PER_METATILE
-from .metatile_renderer import MetatileRenderer
+from .metatile import MetatileLayerType, NUM_TILES_PER_METATILE, get_metatile_tiles, get_layer_type_value
+from .metatile_renderer import MetatileRenderer, RenderedMetatiles
+from .image_dedup import ImageDedupIndex
+from .tile_usage import TileUsageIndex
 from .constants import (
     NUM_METATILES_IN_PRIMARY,
     NUM_TILES_IN_PRIMARY_VRAM,
@@ -93,7 +95,7 @@ class MetatileProcessor:
     def validate_metatile_bounds(
         self,
         actual_metatile_id: int,
-        metatiles_with_attrs: List[Tuple[int, int, int]]
+        metatiles_with_attrs: Sequence[Tuple[int, int, int]]
     ) -> bool:
         """
         Validate that a metatile ID is within bounds.
@@ -118,24 +120,49 @@ class MetatileProcessor:
         
         return True
     
+    def _empty_metatile(
+        self,
+        key: Tuple[int, str, int],
+        used_metatiles: Dict[Tuple[int, str, int], Tuple[Image.Image, Image.Image]],
+        image_index: ImageDedupIndex
+    ) -> Tuple[
+        Optional[Tuple[Image.Image, Image.Image]],
+        Dict[Tuple[int, str, int, bool], int],
+        Optional[List[Tuple[int, int, int]]]
+    ]:
+        """Result for a metatile that cannot be read: both layers are transparent."""
+        actual_metatile_id, tileset_name, layer_type_val = key
+        if key not in used_metatiles:
+            empty_img = Image.new('RGBA', (METATILE_SIZE, METATILE_SIZE), (0, 0, 0, 0))
+            used_metatiles[key] = (empty_img, empty_img)
+            metatile_images = None
+        else:
+            # Already processed, return existing GIDs
+            metatile_images = used_metatiles[key]
+        
+        bottom_gid, top_gid = image_index.assign_metatile(key, *used_metatiles[key])
+        metatile_to_gid = {
+            (actual_metatile_id, tileset_name, layer_type_val, False): bottom_gid,
+            (actual_metatile_id, tileset_name, layer_type_val, True): top_gid
+        }
+        return (metatile_images, metatile_to_gid, None)
+    
     def process_single_metatile(
         self,
         actual_metatile_id: int,
         tileset_name: str,
-        metatiles_with_attrs: List[Tuple[int, int, int]],
-        attributes: Dict[int, int],
+        metatiles_with_attrs: Sequence[Tuple[int, int, int]],
+        attributes: Sequence[int],
         primary_tileset: str,
         secondary_tileset: str,
         used_metatiles: Dict[Tuple[int, str, int], Tuple[Image.Image, Image.Image]],
-        image_to_gid: Dict[bytes, int],
-        next_gid: int
+        image_index: ImageDedupIndex,
+        tile_usage: TileUsageIndex,
+        rendered_metatiles: Optional[RenderedMetatiles] = None
     ) -> Tuple[
         Optional[Tuple[Image.Image, Image.Image]],
         Dict[Tuple[int, str, int, bool], int],
-        Dict[Tuple[int, str], List[Tuple[int, Tuple[int, str, int], int]]],
-        Optional[List[Tuple[int, int, int]]],
-        Dict[bytes, int],
-        int
+        Optional[List[Tuple[int, int, int]]]
     ]:
         """
         Process a single metatile: render it and assign GIDs.
@@ -144,183 +171,75 @@ class MetatileProcessor:
             actual_metatile_id: Metatile ID within its tileset
             tileset_name: Name of the tileset this metatile belongs to
             metatiles_with_attrs: List of all metatiles with attributes
-            attributes: Dictionary of metatile attributes (for layer type)
+            attributes: Layer type per metatile ID (from MapReader.read_metatile_attributes)
             primary_tileset: Name of primary tileset
             secondary_tileset: Name of secondary tileset
             used_metatiles: Dictionary of already-processed metatiles
-            image_to_gid: Dictionary mapping image bytes to GID (for deduplication)
-            next_gid: Next available GID
+            image_index: Digest-keyed image -> GID index (assigns new GIDs)
+            tile_usage: Map-wide (tile_id, tileset) -> layer GID index; this
+                metatile's tiles are recorded in it the first time it is seen
+            rendered_metatiles: Batch render of the tileset pair; metatiles found
+                there are looked up instead of rendered one by one
         
         Returns:
             Tuple of:
             - metatile_images: (bottom_img, top_img) or None if invalid
             - metatile_to_gid: Dictionary mapping (metatile_id, tileset, layer_type, is_top) -> GID
-            - tile_id_to_gids: Dictionary mapping (tile_id, tileset) -> list of (layer_gid, metatile_key, tile_position)
             - metatile_tiles: List of (tile_id, flip_flags, palette_index) or None if invalid
-            - updated_image_to_gid: Updated image_to_gid dictionary
-            - updated_next_gid: Updated next_gid
         """
         # Get layer type
-        layer_type_val = attributes.get(actual_metatile_id, 0)
+        layer_type_val = get_layer_type_value(attributes, actual_metatile_id)
         layer_type = MetatileLayerType(layer_type_val)
+        key = (actual_metatile_id, tileset_name, layer_type_val)
         
         # Validate bounds
         if not self.validate_metatile_bounds(actual_metatile_id, metatiles_with_attrs):
-            # Create empty metatile
-            key = (actual_metatile_id, tileset_name, layer_type_val)
-            if key not in used_metatiles:
-                empty_img = Image.new('RGBA', (METATILE_SIZE, METATILE_SIZE), (0, 0, 0, 0))
-                used_metatiles[key] = (empty_img, empty_img)
-                empty_bytes = empty_img.tobytes()
-                if empty_bytes in image_to_gid:
-                    empty_gid = image_to_gid[empty_bytes]
-                else:
-                    empty_gid = next_gid
-                    image_to_gid[empty_bytes] = empty_gid
-                    next_gid += 1
-                
-                metatile_to_gid = {
-                    (actual_metatile_id, tileset_name, layer_type_val, False): empty_gid,
-                    (actual_metatile_id, tileset_name, layer_type_val, True): empty_gid
-                }
-                return (None, metatile_to_gid, {}, None, image_to_gid, next_gid)
-            else:
-                # Already processed, return existing GIDs
-                bottom_img, top_img = used_metatiles[key]
-                bottom_bytes = bottom_img.tobytes()
-                top_bytes = top_img.tobytes()
-                bottom_gid = image_to_gid.get(bottom_bytes, next_gid)
-                top_gid = image_to_gid.get(top_bytes, next_gid + 1)
-                if bottom_bytes not in image_to_gid:
-                    image_to_gid[bottom_bytes] = bottom_gid
-                    next_gid += 1
-                if top_bytes not in image_to_gid:
-                    image_to_gid[top_bytes] = top_gid
-                    next_gid += 1
-                metatile_to_gid = {
-                    (actual_metatile_id, tileset_name, layer_type_val, False): bottom_gid,
-                    (actual_metatile_id, tileset_name, layer_type_val, True): top_gid
-                }
-                return ((bottom_img, top_img), metatile_to_gid, {}, None, image_to_gid, next_gid)
+            return self._empty_metatile(key, used_metatiles, image_index)
         
         # Safe to access: bounds validated
-        start_idx = actual_metatile_id * NUM_TILES_PER_METATILE
-        metatile_tiles = metatiles_with_attrs[start_idx:start_idx + NUM_TILES_PER_METATILE]
+        metatile_tiles = get_metatile_tiles(metatiles_with_attrs, actual_metatile_id)
         
         # Validate we got expected number of tiles
-        if len(metatile_tiles) != NUM_TILES_PER_METATILE:
-            # Create empty metatile
-            key = (actual_metatile_id, tileset_name, layer_type_val)
-            if key not in used_metatiles:
-                empty_img = Image.new('RGBA', (METATILE_SIZE, METATILE_SIZE), (0, 0, 0, 0))
-                used_metatiles[key] = (empty_img, empty_img)
-                empty_bytes = empty_img.tobytes()
-                if empty_bytes in image_to_gid:
-                    empty_gid = image_to_gid[empty_bytes]
-                else:
-                    empty_gid = next_gid
-                    image_to_gid[empty_bytes] = empty_gid
-                    next_gid += 1
-                
-                metatile_to_gid = {
-                    (actual_metatile_id, tileset_name, layer_type_val, False): empty_gid,
-                    (actual_metatile_id, tileset_name, layer_type_val, True): empty_gid
-                }
-                return (None, metatile_to_gid, {}, None, image_to_gid, next_gid)
+        if len(metatile_tiles) != NUM_TILES_PER_METATILE and key not in used_metatiles:
+            return self._empty_metatile(key, used_metatiles, image_index)
         
         # Render metatile
-        key = (actual_metatile_id, tileset_name, layer_type_val)
         if key not in used_metatiles:
-            bottom_img, top_img = self.renderer.render_metatile(
-                metatile_tiles,
-                primary_tileset,
-                secondary_tileset,
-                layer_type
-            )
+            images = None
+            if rendered_metatiles is not None:
+                images = rendered_metatiles.get_images(tileset_name, actual_metatile_id)
+            if images is not None:
+                bottom_img, top_img = images
+            else:
+                bottom_img, top_img = self.renderer.render_metatile(
+                    metatile_tiles,
+                    primary_tileset,
+                    secondary_tileset,
+                    layer_type
+                )
             if bottom_img is None:
                 bottom_img = Image.new('RGBA', (METATILE_SIZE, METATILE_SIZE), (0, 0, 0, 0))
             if top_img is None:
                 top_img = Image.new('RGBA', (METATILE_SIZE, METATILE_SIZE), (0, 0, 0, 0))
             used_metatiles[key] = (bottom_img, top_img)
-            
-            # Assign GIDs with deduplication
-            bottom_bytes = bottom_img.tobytes()
-            top_bytes = top_img.tobytes()
-            
-            if bottom_bytes in image_to_gid:
-                bottom_gid = image_to_gid[bottom_bytes]
-            else:
-                bottom_gid = next_gid
-                image_to_gid[bottom_bytes] = bottom_gid
-                next_gid += 1
-            
-            if top_bytes in image_to_gid:
-                top_gid = image_to_gid[top_bytes]
-            else:
-                top_gid = next_gid
-                image_to_gid[top_bytes] = top_gid
-                next_gid += 1
-            
-            metatile_to_gid = {
-                (actual_metatile_id, tileset_name, layer_type_val, False): bottom_gid,
-                (actual_metatile_id, tileset_name, layer_type_val, True): top_gid
-            }
-            
-            # Build (tile_id, tileset) -> GID mapping for animations
-            tile_id_to_gids: Dict[Tuple[int, str], List[Tuple[int, Tuple[int, str, int], int]]] = {}
-            for tile_position, (tile_id, _, _) in enumerate(metatile_tiles):
-                tile_source_tileset, _ = self.determine_tileset_for_tile(
-                    tile_id, tileset_name, primary_tileset, secondary_tileset
-                )
-                tile_key = (tile_id, tile_source_tileset)
-                if tile_key not in tile_id_to_gids:
-                    tile_id_to_gids[tile_key] = []
-                metatile_key = (actual_metatile_id, tileset_name, layer_type_val)
-                layer_gid = bottom_gid if tile_position < 4 else top_gid
-                tile_id_to_gids[tile_key].append((layer_gid, metatile_key, tile_position))
-            
-            return ((bottom_img, top_img), metatile_to_gid, tile_id_to_gids, metatile_tiles, image_to_gid, next_gid)
         else:
-            # Already processed, return existing GIDs
+            # Already processed, reuse existing images and GIDs
             bottom_img, top_img = used_metatiles[key]
-            bottom_bytes = bottom_img.tobytes()
-            top_bytes = top_img.tobytes()
-            bottom_gid = image_to_gid.get(bottom_bytes)
-            top_gid = image_to_gid.get(top_bytes)
-            
-            if bottom_gid is None or top_gid is None:
-                # Shouldn't happen, but handle gracefully
-                if bottom_bytes in image_to_gid:
-                    bottom_gid = image_to_gid[bottom_bytes]
-                else:
-                    bottom_gid = next_gid
-                    image_to_gid[bottom_bytes] = bottom_gid
-                    next_gid += 1
-                
-                if top_bytes in image_to_gid:
-                    top_gid = image_to_gid[top_bytes]
-                else:
-                    top_gid = next_gid
-                    image_to_gid[top_bytes] = top_gid
-                    next_gid += 1
-            
-            metatile_to_gid = {
-                (actual_metatile_id, tileset_name, layer_type_val, False): bottom_gid,
-                (actual_metatile_id, tileset_name, layer_type_val, True): top_gid
-            }
-            
-            # Build tile_id_to_gids for this metatile
-            tile_id_to_gids: Dict[Tuple[int, str], List[Tuple[int, Tuple[int, str, int], int]]] = {}
+        
+        # Assign GIDs with deduplication (memoized per metatile key)
+        bottom_gid, top_gid = image_index.assign_metatile(key, bottom_img, top_img)
+        metatile_to_gid = {
+            (actual_metatile_id, tileset_name, layer_type_val, False): bottom_gid,
+            (actual_metatile_id, tileset_name, layer_type_val, True): top_gid
+        }
+        
+        # Record (tile_id, tileset) -> GID relations for animations (once per metatile)
+        if not tile_usage.has_metatile(key):
             for tile_position, (tile_id, _, _) in enumerate(metatile_tiles):
                 tile_source_tileset, _ = self.determine_tileset_for_tile(
                     tile_id, tileset_name, primary_tileset, secondary_tileset
                 )
-                tile_key = (tile_id, tile_source_tileset)
-                if tile_key not in tile_id_to_gids:
-                    tile_id_to_gids[tile_key] = []
-                metatile_key = (actual_metatile_id, tileset_name, layer_type_val)
                 layer_gid = bottom_gid if tile_position < 4 else top_gid
-                tile_id_to_gids[tile_key].append((layer_gid, metatile_key, tile_position))
-            
-            return ((bottom_img, top_img), metatile_to_gid, tile_id_to_gids, metatile_tiles, image_to_gid, next_gid)
-
+                tile_usage.add((tile_id, tile_source_tileset), layer_gid, key, tile_position)
+        
+        return ((bottom_img, top_img), metatile_to_gid, metatile_tiles)
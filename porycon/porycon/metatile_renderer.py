@@ -5,40 +5,174 @@ Metatile rendering - renders metatiles as 16x16 images.
 from typing import List, Tuple, Optional, Dict
 from pathlib import Path
 from collections import OrderedDict
+from dataclasses import dataclass
 from PIL import Image
-from .palette_loader import load_tileset_palettes, apply_palette_to_tile
+from .palette_loader import load_tileset_palettes, apply_palette_to_tile, palette_to_lut
 from .metatile import MetatileLayerType, NUM_TILES_PER_METATILE
 from .utils import camel_to_snake, TilesetPathResolver
+from .build_cache import MetatileRenderCache
+from .tileset_manifest import get_tileset_manifest
 from .constants import (
+    NUM_METATILES_IN_PRIMARY,
     NUM_TILES_IN_PRIMARY_VRAM,
     TILE_SIZE,
     METATILE_SIZE,
     FLIP_HORIZONTAL,
-    FLIP_VERTICAL
+    FLIP_VERTICAL,
+    METATILE_ID_MASK
 )
 from .logging_config import get_logger
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; tiles are then rendered with Pillow crops/pastes
+    np = None
+
 logger = get_logger('metatile_renderer')
 
 
+def tile_atlas_from_image(tileset_image: Image.Image, tile_size: int = TILE_SIZE):
+    """
+    Decode a tileset image into a (num_tiles, tile_size, tile_size) array (requires NumPy).
+    
+    Tiles are numbered row-major like extract_tile; partial tiles at the right
+    or bottom edge are dropped, matching the renderer's bounds checks.
+    
+    Args:
+        tileset_image: Tileset image ('P' mode gives palette indices, 'RGBA' gives colors)
+        tile_size: Tile width/height in pixels
+    
+    Returns:
+        Contiguous array of shape (num_tiles, tile_size, tile_size[, channels])
+    """
+    pixels = np.asarray(tileset_image)
+    tiles_per_row = tileset_image.width // tile_size
+    tiles_per_col = tileset_image.height // tile_size
+    pixels = pixels[:tiles_per_col * tile_size, :tiles_per_row * tile_size]
+    channels = pixels.shape[2:]
+    tiles = pixels.reshape((tiles_per_col, tile_size, tiles_per_row, tile_size) + channels)
+    tiles = tiles.swapaxes(1, 2).reshape((tiles_per_col * tiles_per_row, tile_size, tile_size) + channels)
+    return np.ascontiguousarray(tiles)
+
+
+def alpha_paste_onto_transparent(rgba):
+    """
+    Composite RGBA pixels onto a transparent background (requires NumPy).
+    
+    Reproduces Image.paste(tile, box, tile) onto a (0, 0, 0, 0) canvas exactly,
+    including Pillow's rounding: every channel becomes channel * alpha / 255.
+    """
+    blended = rgba.astype(np.uint16) * rgba[..., 3:4] + 128
+    return (((blended >> 8) + blended) >> 8).astype(np.uint8)
+
+
+def render_metatile_arrays(
+    metatiles,
+    tile_atlas,
+    tile_rows,
+    palette_luts,
+    palette_valid,
+    rgba_atlas=None
+):
+    """
+    Render many metatiles at once (requires NumPy).
+    
+    Produces exactly what render_metatile returns for each metatile, as arrays.
+    
+    Args:
+        metatiles: int array (M, 8, 3) of (tile_id, flip_flags, palette_index)
+        tile_atlas: uint8 array (N, 8, 8) of palette indices
+        tile_rows: int array (1024,) mapping VRAM tile ID -> atlas row, -1 if not drawn
+        palette_luts: uint8 array (16, 256, 4), one lookup table per palette slot
+        palette_valid: bool array (16,), False for slots without a usable palette
+        rgba_atlas: uint8 array (N, 8, 8, 4) of tiles in embedded colors, used for
+            slots without a palette (required if any referenced slot is invalid)
+    
+    Returns:
+        uint8 array (M, 2, 16, 16, 4) - [:, 0] is the bottom layer, [:, 1] the top
+    """
+    count = metatiles.shape[0]
+    tile_size = TILE_SIZE
+    if count == 0 or tile_atlas.shape[0] == 0:
+        return np.zeros((count, 2, METATILE_SIZE, METATILE_SIZE, 4), dtype=np.uint8)
+    
+    tile_ids = metatiles[..., 0]
+    flip_flags = metatiles[..., 1]
+    palette_indices = metatiles[..., 2]
+    
+    rows = tile_rows[tile_ids]
+    drawn = rows >= 0
+    rows = np.where(drawn, rows, 0)
+    flip_h = ((flip_flags & FLIP_HORIZONTAL) != 0)[..., None, None]
+    flip_v = ((flip_flags & FLIP_VERTICAL) != 0)[..., None, None]
+    
+    def gather(atlas):
+        tiles = atlas[rows]
+        extra = (None,) * (tiles.ndim - 4)
+        tiles = np.where(flip_h[(Ellipsis,) + extra], tiles[:, :, :, ::-1], tiles)
+        return np.where(flip_v[(Ellipsis,) + extra], tiles[:, :, ::-1], tiles)
+    
+    colors = palette_luts[palette_indices[..., None, None], gather(tile_atlas)]
+    missing_palette = ~palette_valid[palette_indices]
+    if rgba_atlas is not None and missing_palette.any():
+        colors = np.where(missing_palette[..., None, None, None], gather(rgba_atlas), colors)
+    colors[~drawn] = 0
+    colors = alpha_paste_onto_transparent(colors)
+    
+    # (M, layer, qy, qx, y, x, c) -> (M, layer, qy*8 + y, qx*8 + x, c)
+    grid = colors.reshape(count, 2, 2, 2, tile_size, tile_size, 4).transpose(0, 1, 2, 4, 3, 5, 6)
+    return np.ascontiguousarray(grid.reshape(count, 2, METATILE_SIZE, METATILE_SIZE, 4))
+
+
+@dataclass
+class RenderedMetatiles:
+    """All metatiles of a (primary, secondary) tileset pair, rendered in one pass."""
+    primary_tileset: str
+    secondary_tileset: str
+    # (M, 2, 16, 16, 4) RGBA, indexed by VRAM metatile ID; [:, 0] bottom, [:, 1] top
+    images: "np.ndarray"
+    
+    def get_row(self, tileset_name: str, actual_metatile_id: int) -> Optional[int]:
+        """Row of a metatile in images, or None if it was not rendered."""
+        row = actual_metatile_id
+        if tileset_name != self.primary_tileset:
+            row += NUM_METATILES_IN_PRIMARY
+        if 0 <= row < self.images.shape[0]:
+            return row
+        return None
+    
+    def get_images(self, tileset_name: str, actual_metatile_id: int) -> Optional[Tuple[Image.Image, Image.Image]]:
+        """(bottom_img, top_img) of a metatile as PIL images, or None if it was not rendered."""
+        row = self.get_row(tileset_name, actual_metatile_id)
+        if row is None:
+            return None
+        return (Image.fromarray(self.images[row, 0], 'RGBA'),
+                Image.fromarray(self.images[row, 1], 'RGBA'))
+
+
 class MetatileRenderer:
     """Renders metatiles as 16x16 images."""
     
-    def __init__(self, input_dir: str, max_cache_size: int = 50):
+    def __init__(self, input_dir: str, max_cache_size: int = 50, render_cache: Optional[MetatileRenderCache] = None):
         """
         Initialize metatile renderer.
         
         Args:
             input_dir: Path to pokeemerald root directory
             max_cache_size: Maximum number of tilesets/palettes to cache (default: 50)
+            render_cache: Optional on-disk cache of batch renders, shared across runs
         """
         self.input_dir = Path(input_dir)
+        self.render_cache = render_cache
         self.tile_size = TILE_SIZE  # Each tile in a metatile is 8x8
         self.metatile_size = METATILE_SIZE  # Metatiles are 16x16 (2x2 tiles)
         self.max_cache_size = max_cache_size
         # Use OrderedDict for LRU cache behavior
         self._tileset_cache: OrderedDict[str, Image.Image] = OrderedDict()  # Cache loaded tileset images
         self._palette_cache: OrderedDict[str, List] = OrderedDict()  # Cache loaded palettes
+        self._atlas_cache: OrderedDict[str, "np.ndarray"] = OrderedDict()  # Cache decoded tile index arrays
+        self._rgba_atlas_cache: OrderedDict[str, "np.ndarray"] = OrderedDict()  # Cache tiles in embedded colors
+        self._pair_cache: OrderedDict[Tuple[str, str], RenderedMetatiles] = OrderedDict()  # Cache batch renders
     
     def load_tileset_image(self, tileset_name: str) -> Optional[Image.Image]:
         """Load tileset graphics, caching the result with LRU eviction."""
@@ -138,10 +272,55 @@ class MetatileRenderer:
         # Add to end (most recently used)
         self._palette_cache[tileset_name] = palettes
     
+    def _cache_lru(self, cache: OrderedDict, key: str, value):
+        """Insert into an LRU cache, evicting the least recently used entry when full."""
+        if key in cache:
+            del cache[key]
+        if len(cache) >= self.max_cache_size:
+            cache.popitem(last=False)
+        cache[key] = value
+    
+    def load_tile_atlas(self, tileset_name: str):
+        """
+        Load a tileset as a (num_tiles, 8, 8) uint8 array of palette indices (requires NumPy).
+        
+        Decoded once per tileset and cached with LRU eviction.
+        
+        Returns:
+            Index atlas, or None if the tileset image is missing
+        """
+        if tileset_name in self._atlas_cache:
+            self._atlas_cache.move_to_end(tileset_name)
+            return self._atlas_cache[tileset_name]
+        
+        tileset_image = self.load_tileset_image(tileset_name)
+        atlas = tile_atlas_from_image(tileset_image, self.tile_size) if tileset_image else None
+        self._cache_lru(self._atlas_cache, tileset_name, atlas)
+        return atlas
+    
+    def load_rgba_tile_atlas(self, tileset_name: str):
+        """
+        Load a tileset as (num_tiles, 8, 8, 4) RGBA tiles in its embedded colors (requires NumPy).
+        
+        Only used for tiles without a usable palette, which render with the
+        image's own palette just like tile.convert('RGBA').
+        """
+        if tileset_name in self._rgba_atlas_cache:
+            self._rgba_atlas_cache.move_to_end(tileset_name)
+            return self._rgba_atlas_cache[tileset_name]
+        
+        tileset_image = self.load_tileset_image(tileset_name)
+        atlas = tile_atlas_from_image(tileset_image.convert('RGBA'), self.tile_size) if tileset_image else None
+        self._cache_lru(self._rgba_atlas_cache, tileset_name, atlas)
+        return atlas
+    
     def clear_cache(self):
         """Clear all caches. Useful for freeing memory after large batch operations."""
         self._tileset_cache.clear()
         self._palette_cache.clear()
+        self._atlas_cache.clear()
+        self._rgba_atlas_cache.clear()
+        self._pair_cache.clear()
     
     def extract_tile(self, tileset_image: Image.Image, tile_id: int) -> Image.Image:
         """
@@ -232,6 +411,194 @@ class MetatileRenderer:
             # Default to NORMAL behavior
             return bottom_image, top_image
     
+    def _resolve_tile_source(
+        self,
+        tile_id: int,
+        primary_tileset_name: str,
+        secondary_tileset_name: str
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Resolve a VRAM tile ID to the tileset and tile index it is drawn from.
+        
+        Args:
+            tile_id: VRAM tile ID from metatiles.bin (0-1023)
+            primary_tileset_name: Name of primary tileset
+            secondary_tileset_name: Name of secondary tileset
+        
+        Returns:
+            (tileset_name, tile_index), or None if the tile cannot be drawn
+        """
+        # Determine which tileset this tile belongs to
+        # CRITICAL: In Pokemon Emerald's VRAM system:
+        # - VRAM slots 0-511 are ALWAYS filled from the primary tileset
+        # - VRAM slots 512-1023 are filled from the secondary tileset (if it has enough tiles)
+        # - Tile IDs in metatiles.bin reference VRAM positions directly (0-1023)
+        # - If secondary tileset has fewer than 512 tiles, higher VRAM slots (672-1023) remain empty/black
+        # - When a metatile references an empty VRAM slot, we fall back to primary tileset
+        if tile_id < NUM_TILES_IN_PRIMARY_VRAM:
+            # Tile IDs 0-511 always reference primary tileset (VRAM 0-511)
+            tileset_name = primary_tileset_name
+            actual_tile_id = tile_id
+            use_fallback = False
+        else:
+            # Tile IDs 512+ reference secondary tileset (VRAM 512-1023)
+            # But if secondary doesn't have enough tiles, we fall back to General
+            tileset_name = secondary_tileset_name
+            actual_tile_id = tile_id - NUM_TILES_IN_PRIMARY_VRAM  # Convert VRAM slot to secondary tileset index
+            use_fallback = True  # May need to fall back if secondary tileset is too small
+        
+        # Tile counts come from the tileset manifest, so no image is loaded here
+        manifest = get_tileset_manifest(self.input_dir)
+        tile_count = manifest.tile_count(tileset_name)
+        if tile_count == 0:
+            # Tileset not found - if this was a secondary tileset, fall back to primary tileset
+            if use_fallback and tileset_name != primary_tileset_name:
+                tileset_name = primary_tileset_name
+                actual_tile_id = tile_id - NUM_TILES_IN_PRIMARY_VRAM  # Keep the same offset
+                tile_count = manifest.tile_count(tileset_name)
+                use_fallback = False  # Don't fall back again
+            
+            if tile_count == 0:
+                # Still not found - skip this tile
+                return None
+        
+        # Validate tile ID is within bounds
+        if not 0 <= actual_tile_id < tile_count:
+            # Tile ID out of bounds - if this was a secondary tileset, try primary tileset as fallback
+            if use_fallback and tileset_name != primary_tileset_name:
+                if not 0 <= actual_tile_id < manifest.tile_count(primary_tileset_name):
+                    # Primary tileset not found, or still out of bounds in it - skip
+                    return None
+                # Primary tileset has this tile - use it
+                tileset_name = primary_tileset_name
+            else:
+                # No fallback possible - skip this tile
+                return None
+        
+        return tileset_name, actual_tile_id
+    
+    def _get_tile_palette(
+        self,
+        palette_index: int,
+        primary_tileset_name: str,
+        secondary_tileset_name: str
+    ) -> Optional[List[Tuple[int, int, int, int]]]:
+        """Return the palette a tile is drawn with, or None if no usable palette exists."""
+        # CRITICAL: In Pokemon Emerald, palettes are combined in VRAM:
+        # - Palette slots 0-5 come from primary tileset palettes 0-5
+        # - Palette slots 6-12 come from secondary tileset palettes 6-12
+        # The palette_index directly references the palette slot (0-12), so:
+        # - If palette_index < 6: use primary tileset's palette[palette_index]
+        # - If palette_index >= 6: use secondary tileset's palette[palette_index]
+        # This is true regardless of which tileset the tile graphic comes from!
+        if palette_index >= 6 and secondary_tileset_name:
+            # Use secondary tileset's palette for slots 6-12
+            palette_source_tileset = secondary_tileset_name
+        else:
+            # Use primary tileset's palette for slots 0-5
+            palette_source_tileset = primary_tileset_name
+        
+        palettes = self.load_tileset_palettes_cached(palette_source_tileset)
+        if palettes and 0 <= palette_index < len(palettes) and palettes[palette_index]:
+            return palettes[palette_index]
+        return None
+    
+    def render_tileset_pair(
+        self,
+        primary_tileset_name: str,
+        secondary_tileset_name: str,
+        primary_metatiles: List[Tuple[int, int, int]],
+        secondary_metatiles: List[Tuple[int, int, int]]
+    ) -> Optional[RenderedMetatiles]:
+        """
+        Render every metatile of a tileset pair in one vectorized pass.
+        
+        The result is cached per pair, so all maps sharing the pair reuse it,
+        and in the on-disk render cache (if configured) for later runs.
+        
+        Args:
+            primary_tileset_name: Name of primary tileset
+            secondary_tileset_name: Name of secondary tileset
+            primary_metatiles: Decoded metatiles.bin of the primary tileset
+            secondary_metatiles: Decoded metatiles.bin of the secondary tileset
+        
+        Returns:
+            RenderedMetatiles, or None if NumPy is not available
+        """
+        if np is None:
+            return None
+        
+        pair = (primary_tileset_name, secondary_tileset_name)
+        if pair in self._pair_cache:
+            self._pair_cache.move_to_end(pair)
+            return self._pair_cache[pair]
+        
+        if self.render_cache is not None:
+            images = self.render_cache.load(primary_tileset_name, secondary_tileset_name)
+            if images is not None:
+                rendered = RenderedMetatiles(primary_tileset_name, secondary_tileset_name, images)
+                self._cache_lru(self._pair_cache, pair, rendered)
+                return rendered
+        
+        # Metatile rows are VRAM metatile IDs: primary 0-511, secondary from 512
+        primary_count = min(len(primary_metatiles) // NUM_TILES_PER_METATILE, NUM_METATILES_IN_PRIMARY)
+        secondary_count = len(secondary_metatiles) // NUM_TILES_PER_METATILE
+        secondary_count = min(secondary_count, METATILE_ID_MASK + 1 - NUM_METATILES_IN_PRIMARY)
+        metatiles = np.zeros((NUM_METATILES_IN_PRIMARY + secondary_count, NUM_TILES_PER_METATILE, 3), dtype=np.int32)
+        if primary_count:
+            metatiles[:primary_count] = np.asarray(
+                primary_metatiles[:primary_count * NUM_TILES_PER_METATILE], dtype=np.int32
+            ).reshape(primary_count, NUM_TILES_PER_METATILE, 3)
+        if secondary_count:
+            metatiles[NUM_METATILES_IN_PRIMARY:] = np.asarray(
+                secondary_metatiles[:secondary_count * NUM_TILES_PER_METATILE], dtype=np.int32
+            ).reshape(secondary_count, NUM_TILES_PER_METATILE, 3)
+        
+        # Combined atlas of both tilesets, plus where each VRAM tile ID lands in it
+        atlas_names = [primary_tileset_name]
+        if secondary_tileset_name and secondary_tileset_name != primary_tileset_name:
+            atlas_names.append(secondary_tileset_name)
+        atlases = []
+        atlas_offsets = {}
+        offset = 0
+        for name in atlas_names:
+            atlas = self.load_tile_atlas(name)
+            if atlas is not None:
+                atlas_offsets[name] = offset
+                atlases.append(atlas)
+                offset += atlas.shape[0]
+        if not atlases:
+            tile_atlas = np.zeros((0, self.tile_size, self.tile_size), dtype=np.uint8)
+        else:
+            tile_atlas = np.concatenate(atlases)
+        
+        tile_rows = np.full(METATILE_ID_MASK + 1, -1, dtype=np.int32)
+        for tile_id in range(1, METATILE_ID_MASK + 1):  # Tile 0 is never drawn
+            source = self._resolve_tile_source(tile_id, primary_tileset_name, secondary_tileset_name)
+            if source is not None and source[0] in atlas_offsets:
+                tile_rows[tile_id] = atlas_offsets[source[0]] + source[1]
+        
+        palette_luts = np.zeros((16, 256, 4), dtype=np.uint8)
+        palette_valid = np.zeros(16, dtype=bool)
+        for palette_index in range(16):
+            palette = self._get_tile_palette(palette_index, primary_tileset_name, secondary_tileset_name)
+            if palette:
+                palette_luts[palette_index] = palette_to_lut(palette)
+                palette_valid[palette_index] = True
+        
+        rgba_atlas = None
+        if not palette_valid.all() and atlases:
+            rgba_atlas = np.concatenate([self.load_rgba_tile_atlas(name) for name in atlas_names
+                                         if name in atlas_offsets])
+        
+        images = render_metatile_arrays(metatiles, tile_atlas, tile_rows, palette_luts, palette_valid, rgba_atlas)
+        images.setflags(write=False)
+        if self.render_cache is not None:
+            self.render_cache.store(primary_tileset_name, secondary_tileset_name, images)
+        rendered = RenderedMetatiles(primary_tileset_name, secondary_tileset_name, images)
+        self._cache_lru(self._pair_cache, pair, rendered)
+        return rendered
+    
     def _render_tile_grid(
         self,
         tiles: List[Tuple[int, int, int]],  # 4 tiles: [tl, tr, bl, br]
@@ -252,6 +619,9 @@ class MetatileRenderer:
         if len(tiles) != 4:
             return None
         
+        if np is not None:
+            return self._render_tile_grid_array(tiles, primary_tileset_name, secondary_tileset_name)
+        
         grid_image = Image.new('RGBA', (self.metatile_size, self.metatile_size), (0, 0, 0, 0))
         
         positions = [
@@ -265,95 +635,23 @@ class MetatileRenderer:
             if tile_id == 0:
                 continue  # Skip empty tiles
             
-            # Determine which tileset this tile belongs to
-            # CRITICAL: In Pokemon Emerald's VRAM system:
-            # - VRAM slots 0-511 are ALWAYS filled from the primary tileset
-            # - VRAM slots 512-1023 are filled from the secondary tileset (if it has enough tiles)
-            # - Tile IDs in metatiles.bin reference VRAM positions directly (0-1023)
-            # - If secondary tileset has fewer than 512 tiles, higher VRAM slots (672-1023) remain empty/black
-            # - When a metatile references an empty VRAM slot, we fall back to primary tileset
-            if tile_id < NUM_TILES_IN_PRIMARY_VRAM:
-                # Tile IDs 0-511 always reference primary tileset (VRAM 0-511)
-                tileset_name = primary_tileset_name
-                actual_tile_id = tile_id
-                use_fallback = False
-            else:
-                # Tile IDs 512+ reference secondary tileset (VRAM 512-1023)
-                # But if secondary doesn't have enough tiles, we fall back to General
-                tileset_name = secondary_tileset_name
-                actual_tile_id = tile_id - NUM_TILES_IN_PRIMARY_VRAM  # Convert VRAM slot to secondary tileset index
-                use_fallback = True  # May need to fall back if secondary tileset is too small
-            
-            # Load tileset image
-            tileset_image = self.load_tileset_image(tileset_name)
-            if not tileset_image:
-                # Tileset not found - if this was a secondary tileset, fall back to primary tileset
-                if use_fallback and tileset_name != primary_tileset_name:
-                    tileset_name = primary_tileset_name
-                    actual_tile_id = tile_id - NUM_TILES_IN_PRIMARY_VRAM  # Keep the same offset
-                    tileset_image = self.load_tileset_image(tileset_name)
-                    use_fallback = False  # Don't fall back again
-                
-                if not tileset_image:
-                    # Still not found - skip this tile
-                    continue
-            
-            # Validate tile ID is within bounds
-            tiles_per_row = tileset_image.width // self.tile_size
-            tiles_per_col = tileset_image.height // self.tile_size
-            max_tile_id = (tiles_per_row * tiles_per_col) - 1
-            
-            if actual_tile_id < 0 or actual_tile_id > max_tile_id:
-                # Tile ID out of bounds - if this was a secondary tileset, try primary tileset as fallback
-                if use_fallback and tileset_name != primary_tileset_name:
-                    # Fall back to primary tileset
-                    fallback_tileset_image = self.load_tileset_image(primary_tileset_name)
-                    if fallback_tileset_image:
-                        fallback_tiles_per_row = fallback_tileset_image.width // self.tile_size
-                        fallback_tiles_per_col = fallback_tileset_image.height // self.tile_size
-                        fallback_max_tile_id = (fallback_tiles_per_row * fallback_tiles_per_col) - 1
-                        if 0 <= actual_tile_id <= fallback_max_tile_id:
-                            # Primary tileset has this tile - use it
-                            tileset_name = primary_tileset_name
-                            tileset_image = fallback_tileset_image
-                            max_tile_id = fallback_max_tile_id
-                            use_fallback = False
-                        else:
-                            # Still out of bounds even in primary tileset - skip
-                            continue
-                    else:
-                        # Primary tileset not found - skip
-                        continue
-                else:
-                    # No fallback possible - skip this tile
-                    continue
+            source = self._resolve_tile_source(tile_id, primary_tileset_name, secondary_tileset_name)
+            if source is None:
+                continue
+            tileset_name, actual_tile_id = source
             
             # Extract tile (should never fail now that we've validated bounds)
             try:
-                tile = self.extract_tile(tileset_image, actual_tile_id)
+                tile = self.extract_tile(self.load_tileset_image(tileset_name), actual_tile_id)
                 if tile is None:
                     continue  # Skip if extraction failed
             except Exception:
                 continue  # Skip if extraction failed
             
             # Apply palette
-            # CRITICAL: In Pokemon Emerald, palettes are combined in VRAM:
-            # - Palette slots 0-5 come from primary tileset palettes 0-5
-            # - Palette slots 6-12 come from secondary tileset palettes 6-12
-            # The palette_index directly references the palette slot (0-12), so:
-            # - If palette_index < 6: use primary tileset's palette[palette_index]
-            # - If palette_index >= 6: use secondary tileset's palette[palette_index]
-            # This is true regardless of which tileset the tile graphic comes from!
-            if palette_index >= 6 and secondary_tileset_name:
-                # Use secondary tileset's palette for slots 6-12
-                palette_source_tileset = secondary_tileset_name
-            else:
-                # Use primary tileset's palette for slots 0-5
-                palette_source_tileset = primary_tileset_name
-            
-            palettes = self.load_tileset_palettes_cached(palette_source_tileset)
-            if palettes and 0 <= palette_index < len(palettes) and palettes[palette_index]:
-                tile = apply_palette_to_tile(tile, palettes[palette_index])
+            palette = self._get_tile_palette(palette_index, primary_tileset_name, secondary_tileset_name)
+            if palette:
+                tile = apply_palette_to_tile(tile, palette)
             else:
                 # No palette available or invalid palette index - convert to RGBA
                 # This is expected for some tilesets, not an error
@@ -370,4 +668,44 @@ class MetatileRenderer:
             grid_image.paste(tile, (x, y), tile)
         
         return grid_image
-
+    
+    def _render_tile_grid_array(
+        self,
+        tiles: List[Tuple[int, int, int]],
+        primary_tileset_name: str,
+        secondary_tileset_name: str
+    ) -> Image.Image:
+        """
+        NumPy version of _render_tile_grid, byte-identical to the Pillow path.
+        
+        Tiles are gathered from the cached index atlases, flipped by slicing,
+        colored through the palette lookup table and composed as one array.
+        """
+        quadrants = np.zeros((4, self.tile_size, self.tile_size, 4), dtype=np.uint8)
+        
+        for idx, (tile_id, flip_flags, palette_index) in enumerate(tiles):
+            if tile_id == 0:
+                continue  # Skip empty tiles
+            
+            source = self._resolve_tile_source(tile_id, primary_tileset_name, secondary_tileset_name)
+            if source is None:
+                continue
+            tileset_name, actual_tile_id = source
+            
+            palette = self._get_tile_palette(palette_index, primary_tileset_name, secondary_tileset_name)
+            if palette:
+                tile = palette_to_lut(palette)[self.load_tile_atlas(tileset_name)[actual_tile_id]]
+            else:
+                # No usable palette - use the image's embedded colors
+                tile = self.load_rgba_tile_atlas(tileset_name)[actual_tile_id]
+            
+            if flip_flags & FLIP_HORIZONTAL:
+                tile = tile[:, ::-1]
+            if flip_flags & FLIP_VERTICAL:
+                tile = tile[::-1]
+            quadrants[idx] = tile
+        
+        # [tl, tr, bl, br] -> 16x16 grid
+        grid = quadrants.reshape(2, 2, self.tile_size, self.tile_size, 4).swapaxes(1, 2)
+        grid = grid.reshape(self.metatile_size, self.metatile_size, 4)
+        return Image.fromarray(alpha_paste_onto_transparent(grid), 'RGBA')
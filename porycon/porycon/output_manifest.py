@@ -0,0 +1,116 @@
+"""
+Output manifest - the files a conversion run produced.
+
+Writers leave files whose bytes did not change untouched (see output_writer),
+so content pipelines watching the output directory only rebuild real changes.
+The manifest completes that: it lists every output of the last run in
+<output>/.porycon/outputs.json, so outputs a later run no longer produces
+(e.g. per-map tilesets after switching to shared atlases, or maps removed
+from the input) are deleted instead of lingering as stale assets.
+
+Hidden files and directories (build state, staging directories and
+temporary files) are never outputs.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, Set, Union
+from .build_cache import CACHE_DIR_NAME
+from .utils import save_json
+from .logging_config import get_logger
+
+logger = get_logger('output_manifest')
+
+MANIFEST_FILE_NAME = "outputs.json"
+
+# Bump when the layout of the manifest changes
+MANIFEST_VERSION = 1
+
+
+class OutputManifest:
+    """Outputs of the last run in an output directory, persisted between runs."""
+
+    def __init__(self, output_dir: Path):
+        """
+        Initialize manifest, loading the stored one if present.
+
+        Args:
+            output_dir: Output directory (manifest lives in output_dir/.porycon)
+        """
+        self.output_dir = Path(output_dir).resolve()
+        self.path = self.output_dir / CACHE_DIR_NAME / MANIFEST_FILE_NAME
+        self.outputs: Set[str] = set()  # Paths relative to output_dir, '/'-separated
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.outputs = set(data.get("outputs", []))
+
+    def relative_outputs(self, paths: Iterable[Union[str, Path]]) -> Set[str]:
+        """
+        Convert absolute output paths to manifest entries.
+
+        Paths outside the output directory and hidden paths are dropped.
+        """
+        outputs = set()
+        for path in paths:
+            try:
+                relative = Path(os.path.abspath(path)).relative_to(self.output_dir)
+            except ValueError:
+                continue
+            if any(part.startswith(".") for part in relative.parts):
+                continue
+            outputs.add(relative.as_posix())
+        return outputs
+
+    def _remove_empty_parents(self, path: Path):
+        """Remove directories left empty by deleting path (e.g. a per-map tileset directory)."""
+        parent = path.parent
+        while parent != self.output_dir:
+            try:
+                parent.rmdir()
+            except OSError:  # Not empty (or already gone)
+                return
+            parent = parent.parent
+
+    def update(self, outputs: Set[str], remove_stale: bool = True) -> List[str]:
+        """
+        Record the outputs of this run and delete the ones it no longer produced.
+
+        Args:
+            outputs: Manifest entries produced by this run (see relative_outputs)
+            remove_stale: Delete outputs of the last run missing from outputs;
+                if False (e.g. after failed maps) they are kept and stay listed
+
+        Returns:
+            The entries that were deleted
+        """
+        stale = sorted(self.outputs - outputs)
+        removed = []
+        if remove_stale:
+            for relative in stale:
+                try:
+                    (self.output_dir / relative).unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not remove stale output {relative}: {e}")
+                    continue
+                removed.append(relative)
+                self._remove_empty_parents(self.output_dir / relative)
+            self.outputs = (self.outputs - set(removed)) | outputs
+        else:
+            self.outputs |= outputs
+
+        try:
+            save_json({"version": MANIFEST_VERSION, "outputs": sorted(self.outputs)}, str(self.path), indent=None)
+        except OSError as e:
+            logger.warning(f"Could not write output manifest: {e}")
+        return removed
@@ -0,0 +1,225 @@
+"""
+Output writer - atomic file writes and a write-behind queue.
+
+Every output file is written to a temporary file in its directory and
+renamed over the target, so an interrupted run never leaves a truncated
+file behind. A file that already holds the exact bytes is left untouched
+(keeping its mtime), so downstream content pipelines only rebuild what
+really changed; each process records which files it changed and which it
+found unchanged (see take_output_stats).
+
+Map workers hand finished payloads (and PNG encode jobs) to a per-process
+write-behind queue instead of writing inline: a few I/O threads drain it
+while the worker renders the next map. The queue is bounded by the bytes
+it holds; submitting blocks while it is full, which caps the memory of
+queued payloads. Call flush_writes before relying on queued files being
+on disk.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+from .logging_config import get_logger
+
+logger = get_logger('output_writer')
+
+WRITER_THREADS = 2  # I/O threads per process
+MAX_PENDING_BYTES = 64 * 1024 * 1024  # Payload bytes queued or being written before submitting blocks
+
+
+@dataclass
+class OutputStats:
+    """Files one process wrote (changed) or found already up to date (unchanged)."""
+    changed: List[str] = field(default_factory=list)  # Absolute paths
+    unchanged: List[str] = field(default_factory=list)
+
+    def add(self, other: "OutputStats") -> None:
+        self.changed.extend(other.changed)
+        self.unchanged.extend(other.unchanged)
+
+    def summary(self) -> str:
+        """E.g. '12 changed, 340 unchanged' (distinct files; a file written more than once counts as changed)."""
+        changed = set(self.changed)
+        return f"{len(changed)} changed, {len(set(self.unchanged) - changed)} unchanged"
+
+
+_stats = OutputStats()
+_stats_lock = threading.Lock()
+
+
+def _record_output(path: Union[str, Path], changed: bool) -> None:
+    with _stats_lock:
+        (_stats.changed if changed else _stats.unchanged).append(os.path.abspath(path))
+
+
+def record_unchanged_outputs(paths: Iterable[Union[str, Path]]) -> None:
+    """Record files that are still current without being rewritten (e.g. outputs of cached maps)."""
+    for path in paths:
+        _record_output(path, False)
+
+
+def take_output_stats() -> OutputStats:
+    """Return the files this process recorded since the last call, and reset them."""
+    global _stats
+    with _stats_lock:
+        stats, _stats = _stats, OutputStats()
+    return stats
+
+
+@contextmanager
+def atomic_output(path: Union[str, Path]) -> Iterator[Path]:
+    """
+    Yield a temporary path to write instead of path; it replaces path on success.
+
+    The temporary file is removed if the block raises.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def _file_holds(path: Union[str, Path], payload: bytes) -> bool:
+    """Whether a file exists and contains exactly payload."""
+    try:
+        if os.path.getsize(path) != len(payload):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == payload
+    except OSError:
+        return False
+
+
+def write_file_atomic(path: Union[str, Path], payload: bytes) -> bool:
+    """
+    Write bytes to a file atomically (temporary file + rename), unless it already holds them.
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    changed = not _file_holds(path, payload)
+    if changed:
+        with atomic_output(path) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+    _record_output(path, changed)
+    return changed
+
+
+def install_file(staged_path: Union[str, Path], path: Union[str, Path]) -> bool:
+    """
+    Move a staged file over path, unless path already holds the same bytes (the staged file is then deleted).
+
+    Returns:
+        True if path was replaced
+    """
+    with open(staged_path, 'rb') as f:
+        changed = not _file_holds(path, f.read())
+    if changed:
+        os.replace(staged_path, path)
+    else:
+        os.unlink(staged_path)
+    _record_output(path, changed)
+    return changed
+
+
+class WriteBehindQueue:
+    """Bounded queue of output jobs drained by I/O threads."""
+
+    def __init__(self, threads: int = WRITER_THREADS, max_pending_bytes: int = MAX_PENDING_BYTES):
+        """
+        Initialize queue.
+
+        Args:
+            threads: Number of I/O threads
+            max_pending_bytes: Total job cost allowed in flight before submit blocks
+        """
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="output-writer")
+        self._max_pending_bytes = max_pending_bytes
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._futures: List[Future] = []
+
+    def submit(self, cost: int, fn: Callable, *args) -> None:
+        """
+        Queue fn(*args), blocking while the queue is full.
+
+        Args:
+            cost: Bytes the job holds until it finishes (a job larger than
+                the whole budget waits for the queue to drain)
+        """
+        with self._condition:
+            while self._pending_bytes and self._pending_bytes + cost > self._max_pending_bytes:
+                self._condition.wait()
+            self._pending_bytes += cost
+            future = self._executor.submit(fn, *args)
+            self._futures.append(future)
+        future.add_done_callback(lambda _: self._release(cost))
+
+    def _release(self, cost: int) -> None:
+        with self._condition:
+            self._pending_bytes -= cost
+            self._condition.notify_all()
+
+    def flush(self) -> None:
+        """
+        Wait for every queued job.
+
+        Raises:
+            The first exception raised by a queued job
+        """
+        with self._condition:
+            futures, self._futures = self._futures, []
+        first_error = None
+        for future in futures:
+            error = future.exception()
+            if error is not None and first_error is None:
+                first_error = error
+        if first_error is not None:
+            raise first_error
+
+
+# The queue of this process, created on first use
+_queue: Optional[WriteBehindQueue] = None
+_queue_lock = threading.Lock()
+
+
+def _get_queue() -> WriteBehindQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue()
+        return _queue
+
+
+def queue_job(cost: int, fn: Callable, *args) -> None:
+    """Run fn(*args) on this process's write-behind queue (see WriteBehindQueue.submit)."""
+    _get_queue().submit(cost, fn, *args)
+
+
+def queue_write(path: Union[str, Path], payload: bytes) -> None:
+    """Write bytes to a file atomically on this process's write-behind queue."""
+    queue_job(len(payload), write_file_atomic, path, payload)
+
+
+def flush_writes() -> None:
+    """
+    Wait until everything this process queued is on disk.
+
+    Raises:
+        The first exception raised while writing a queued file
+    """
+    if _queue is not None:
+        _queue.flush()
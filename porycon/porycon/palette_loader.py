@@ -2,11 +2,17 @@
 Palette loading utilities for pokeemerald tilesets.
 """
 
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple, Optional
 from PIL import Image
 from .logging_config import get_logger
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Pillow path below is used instead
+    np = None
+
 logger = get_logger('palette_loader')
 
 
@@ -121,6 +127,11 @@ def apply_palette_to_tile(tile_image: Image.Image, palette: List[Tuple[int, int,
         _make_color_0_transparent(rgba_image, tile_image)
         return rgba_image
     
+    if np is not None:
+        # One lookup-table gather instead of a per-pixel loop
+        lut = palette_to_lut(palette)
+        return Image.fromarray(lut[np.asarray(tile_image)], 'RGBA')
+    
     # In GBA/pokeemerald, color index 0 is typically transparent
     # Make sure palette[0] has alpha=0
     if len(palette) > 0:
@@ -179,6 +190,11 @@ def _make_color_0_transparent(rgba_image: Image.Image, original_p_image: Image.I
     if original_p_image.mode != 'P':
         return
     
+    if np is not None:
+        mask = (np.asarray(original_p_image) == 0).astype(np.uint8) * 255
+        rgba_image.paste((0, 0, 0, 0), mask=Image.fromarray(mask, 'L'))
+        return
+    
     original_pixels = original_p_image.load()
     rgba_pixels = rgba_image.load()
     
@@ -187,3 +203,32 @@ def _make_color_0_transparent(rgba_image: Image.Image, original_p_image: Image.I
             if original_pixels[x, y] == 0:
                 rgba_pixels[x, y] = (0, 0, 0, 0)
 
+
+def palette_to_lut(palette: List[Tuple[int, int, int, int]]):
+    """
+    Build a 256-entry RGBA lookup table for a 16-color palette (requires NumPy).
+    
+    Matches apply_palette_to_tile: index 0 and any magenta (#FF00FF) entry map
+    to (0, 0, 0, 0), palette alpha is ignored (opaque), and indices past the
+    end of the palette map to opaque black.
+    
+    Args:
+        palette: List of RGBA (or RGB) color tuples
+    
+    Returns:
+        Read-only uint8 array of shape (256, 4)
+    """
+    return _palette_lut(tuple(tuple(color[:3]) for color in palette[:256]))
+
+
+@lru_cache(maxsize=1024)
+def _palette_lut(colors: Tuple[Tuple[int, int, int], ...]):
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    lut[:, 3] = 255
+    if colors:
+        lut[:len(colors), :3] = np.array(colors, dtype=np.uint8)
+    magenta = (lut[:, 0] == 255) & (lut[:, 1] == 0) & (lut[:, 2] == 255)
+    lut[magenta] = 0
+    lut[0] = 0
+    lut.setflags(write=False)
+    return lut
@@ -0,0 +1,339 @@
+"""
+PKMAP - binary map container for the PokeSharp runtime loader.
+
+Written next to each Tiled map (same name, .pkmap extension) from the same
+map dict, so the game can memory-map the file and use the layer arrays in
+place instead of parsing JSON on every map transition.
+
+Layout (all integers little-endian, every section 16-byte aligned):
+
+    Header (64 bytes)
+        0   magic            8s   b"PKMAP\\0\\0\\0"
+        8   version          u16
+        10  flags            u16  bit 0: layer cells are u32 (otherwise u16)
+        12  width            u16  map size in tiles
+        14  height           u16
+        16  tile_width       u16  tile size in pixels
+        18  tile_height      u16
+        20  layer_count      u32
+        24  layer_table      u32  offset
+        28  tileset_count    u32
+        32  tileset_table    u32  offset
+        36  object_count     u32
+        40  object_table     u32  offset
+        44  string_pool      u32  offset
+        48  string_pool_size u32
+        52  properties       u32  string: map properties as compact JSON
+        56  reserved         8 bytes
+
+    Layer table - layer_count x 16 bytes
+        name u32 (string), data_offset u32, cell_count u32, flags u32 (bit 0: visible)
+    Tileset table - tileset_count x 8 bytes
+        firstgid u32, source u32 (string)
+    Object table - object_count x 40 bytes
+        id u32, group u32 (string), name u32 (string), type u32 (string),
+        x f32, y f32, width f32, height f32,
+        properties u32 (string: compact JSON), flags u32 (bit 0: visible)
+    Layer data - width * height cells per layer, u16 or u32 GIDs, row-major
+    String pool - u32 byte length + UTF-8 bytes per string; a string
+        reference is the offset of its length prefix within the pool
+"""
+
+import json
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+from .layer_encoding import decode_layer_data
+from .logging_config import get_logger
+from .output_writer import queue_write, write_file_atomic
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; layer arrays are then packed with struct
+    np = None
+
+logger = get_logger('pkmap')
+
+PKMAP_MAGIC = b"PKMAP\0\0\0"
+PKMAP_VERSION = 1
+PKMAP_EXTENSION = ".pkmap"
+
+FLAG_U32_CELLS = 0x1
+FLAG_VISIBLE = 0x1
+
+ALIGNMENT = 16
+
+_HEADER = struct.Struct("<8sHHHHHHIIIIIIIII8x")
+_LAYER = struct.Struct("<IIII")
+_TILESET = struct.Struct("<II")
+_OBJECT = struct.Struct("<IIIIffffII")
+
+
+def pkmap_path_for(tiled_map_path: Path) -> Path:
+    """Path of the .pkmap written next to a Tiled map JSON file."""
+    return Path(tiled_map_path).with_suffix(PKMAP_EXTENSION)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+
+class _StringPool:
+    """Deduplicating pool of length-prefixed UTF-8 strings."""
+
+    def __init__(self):
+        self._offsets: Dict[str, int] = {}
+        self._data = bytearray()
+
+    def add(self, value: str) -> int:
+        offset = self._offsets.get(value)
+        if offset is None:
+            encoded = value.encode('utf-8')
+            offset = len(self._data)
+            self._data += struct.pack("<I", len(encoded)) + encoded
+            self._offsets[value] = offset
+        return offset
+
+    def tobytes(self) -> bytes:
+        return bytes(self._data)
+
+
+def _pack_cells(data: Sequence[int], wide: bool) -> bytes:
+    if np is not None:
+        return np.asarray(data, dtype='<u4' if wide else '<u2').tobytes()
+    return struct.pack(f"<{len(data)}{'I' if wide else 'H'}", *data)
+
+
+def build_pkmap(tiled_map: Dict[str, Any]) -> bytes:
+    """
+    Serialize a Tiled map dict (as built by convert_map_with_metatiles).
+
+    Raises:
+        ValueError: If a tile layer's size does not match the map
+    """
+    width = tiled_map["width"]
+    height = tiled_map["height"]
+    pool = _StringPool()
+
+    tile_layers: List[Tuple[Dict[str, Any], List[int]]] = []
+    objects: List[Tuple[str, Dict[str, Any]]] = []
+    for layer in tiled_map.get("layers", []):
+        if layer.get("type") == "tilelayer":
+            data = decode_layer_data(layer)
+            if len(data) != width * height:
+                raise ValueError(f"Layer {layer.get('name')} has {len(data)} cells, expected {width * height}")
+            tile_layers.append((layer, data))
+        elif layer.get("type") == "objectgroup":
+            objects.extend((layer.get("name", ""), obj) for obj in layer.get("objects", []))
+
+    wide = any(max(data, default=0) > 0xFFFF for _, data in tile_layers)
+
+    # Section offsets
+    layer_table = _align(_HEADER.size)
+    tileset_table = _align(layer_table + _LAYER.size * len(tile_layers))
+    tilesets = tiled_map.get("tilesets", [])
+    object_table = _align(tileset_table + _TILESET.size * len(tilesets))
+    data_offset = _align(object_table + _OBJECT.size * len(objects))
+
+    layer_entries = bytearray()
+    layer_data = bytearray()
+    for layer, data in tile_layers:
+        offset = data_offset + len(layer_data)
+        layer_entries += _LAYER.pack(pool.add(layer.get("name", "")), offset, len(data),
+                                     FLAG_VISIBLE if layer.get("visible", True) else 0)
+        layer_data += _pack_cells(data, wide)
+        layer_data += bytes(_align(len(layer_data)) - len(layer_data))
+
+    tileset_entries = bytearray()
+    for tileset in tilesets:
+        tileset_entries += _TILESET.pack(tileset.get("firstgid", 1), pool.add(tileset.get("source", "")))
+
+    object_entries = bytearray()
+    for group_name, obj in objects:
+        object_entries += _OBJECT.pack(
+            obj.get("id", 0),
+            pool.add(group_name),
+            pool.add(obj.get("name", "")),
+            pool.add(obj.get("type", "")),
+            obj.get("x", 0), obj.get("y", 0), obj.get("width", 0), obj.get("height", 0),
+            pool.add(_compact_json(obj.get("properties", []))),
+            FLAG_VISIBLE if obj.get("visible", True) else 0
+        )
+
+    properties = pool.add(_compact_json(tiled_map.get("properties", [])))
+    string_pool = data_offset + len(layer_data)
+    pool_bytes = pool.tobytes()
+
+    header = _HEADER.pack(
+        PKMAP_MAGIC, PKMAP_VERSION, FLAG_U32_CELLS if wide else 0,
+        width, height, tiled_map.get("tilewidth", 16), tiled_map.get("tileheight", 16),
+        len(tile_layers), layer_table,
+        len(tilesets), tileset_table,
+        len(objects), object_table,
+        string_pool, len(pool_bytes),
+        properties
+    )
+
+    out = bytearray(data_offset)
+    out[:len(header)] = header
+    out[layer_table:layer_table + len(layer_entries)] = layer_entries
+    out[tileset_table:tileset_table + len(tileset_entries)] = tileset_entries
+    out[object_table:object_table + len(object_entries)] = object_entries
+    return bytes(out + layer_data + pool_bytes)
+
+
+def write_pkmap(tiled_map: Dict[str, Any], path: Path, background: bool = False) -> None:
+    """
+    Write a Tiled map dict as a .pkmap file, atomically.
+    
+    Args:
+        background: Build the file now but leave the write to the write-behind queue
+    """
+    payload = build_pkmap(tiled_map)
+    if background:
+        queue_write(path, payload)
+    else:
+        write_file_atomic(path, payload)
+
+
+def read_pkmap(path: Path) -> Dict[str, Any]:
+    """
+    Read a .pkmap file back into plain Python data.
+
+    Returns:
+        Dict with width, height, tilewidth, tileheight, properties, tilesets,
+        layers ([{name, visible, data}]) and objects ([{group, id, name, type,
+        x, y, width, height, properties, visible}])
+
+    Raises:
+        ValueError: If the file is not a supported .pkmap
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"{path} is too small to be a .pkmap file")
+
+    (magic, version, flags, width, height, tile_width, tile_height,
+     layer_count, layer_table, tileset_count, tileset_table,
+     object_count, object_table, string_pool, string_pool_size, properties) = _HEADER.unpack_from(raw, 0)
+    if magic != PKMAP_MAGIC:
+        raise ValueError(f"{path} is not a .pkmap file")
+    if version != PKMAP_VERSION:
+        raise ValueError(f"{path} has unsupported .pkmap version {version}")
+
+    def string(offset: int) -> str:
+        start = string_pool + offset
+        (length,) = struct.unpack_from("<I", raw, start)
+        return raw[start + 4:start + 4 + length].decode('utf-8')
+
+    cell_format = "I" if flags & FLAG_U32_CELLS else "H"
+    layers = []
+    for i in range(layer_count):
+        name, data_offset, cell_count, layer_flags = _LAYER.unpack_from(raw, layer_table + i * _LAYER.size)
+        data = list(struct.unpack_from(f"<{cell_count}{cell_format}", raw, data_offset))
+        layers.append({"name": string(name), "visible": bool(layer_flags & FLAG_VISIBLE), "data": data})
+
+    tilesets = []
+    for i in range(tileset_count):
+        firstgid, source = _TILESET.unpack_from(raw, tileset_table + i * _TILESET.size)
+        tilesets.append({"firstgid": firstgid, "source": string(source)})
+
+    objects = []
+    for i in range(object_count):
+        (obj_id, group, name, obj_type, x, y, obj_width, obj_height,
+         obj_properties, obj_flags) = _OBJECT.unpack_from(raw, object_table + i * _OBJECT.size)
+        objects.append({
+            "group": string(group), "id": obj_id, "name": string(name), "type": string(obj_type),
+            "x": x, "y": y, "width": obj_width, "height": obj_height,
+            "properties": json.loads(string(obj_properties)),
+            "visible": bool(obj_flags & FLAG_VISIBLE),
+        })
+
+    return {
+        "width": width, "height": height, "tilewidth": tile_width, "tileheight": tile_height,
+        "properties": json.loads(string(properties)),
+        "tilesets": tilesets,
+        "layers": layers,
+        "objects": objects,
+    }
+
+
+def verify_pkmap(pkmap_path: Path, tiled_map: Dict[str, Any]) -> List[str]:
+    """
+    Round-trip check of a .pkmap file against the Tiled map it was written from.
+
+    Args:
+        pkmap_path: Path to the .pkmap file
+        tiled_map: Tiled map JSON (as loaded from the .json output)
+
+    Returns:
+        Human-readable mismatches (empty if the files agree)
+    """
+    try:
+        binary = read_pkmap(pkmap_path)
+    except (OSError, ValueError, struct.error) as e:
+        return [f"unreadable: {e}"]
+
+    errors = []
+    for key in ("width", "height", "tilewidth", "tileheight"):
+        if binary[key] != tiled_map.get(key):
+            errors.append(f"{key}: {binary[key]} != {tiled_map.get(key)}")
+    if binary["properties"] != tiled_map.get("properties", []):
+        errors.append("map properties differ")
+    expected_tilesets = [{"firstgid": t.get("firstgid", 1), "source": t.get("source", "")}
+                         for t in tiled_map.get("tilesets", [])]
+    if binary["tilesets"] != expected_tilesets:
+        errors.append("tilesets differ")
+
+    tile_layers = [layer for layer in tiled_map.get("layers", []) if layer.get("type") == "tilelayer"]
+    if len(binary["layers"]) != len(tile_layers):
+        errors.append(f"{len(binary['layers'])} tile layers != {len(tile_layers)}")
+    for stored, layer in zip(binary["layers"], tile_layers):
+        if stored["name"] != layer.get("name", ""):
+            errors.append(f"layer name {stored['name']!r} != {layer.get('name')!r}")
+        elif stored["data"] != decode_layer_data(layer):
+            errors.append(f"layer {stored['name']} data differs")
+
+    expected_objects = [
+        (layer.get("name", ""), obj)
+        for layer in tiled_map.get("layers", []) if layer.get("type") == "objectgroup"
+        for obj in layer.get("objects", [])
+    ]
+    if len(binary["objects"]) != len(expected_objects):
+        errors.append(f"{len(binary['objects'])} objects != {len(expected_objects)}")
+    for stored, (group_name, obj) in zip(binary["objects"], expected_objects):
+        expected = {
+            "group": group_name, "id": obj.get("id", 0), "name": obj.get("name", ""),
+            "type": obj.get("type", ""), "x": obj.get("x", 0), "y": obj.get("y", 0),
+            "width": obj.get("width", 0), "height": obj.get("height", 0),
+            "properties": obj.get("properties", []), "visible": obj.get("visible", True),
+        }
+        if stored != expected:
+            errors.append(f"object {expected['id']} ({expected['name']}) differs")
+    return errors
+
+
+def verify_pkmap_tree(root: Path) -> Dict[Path, List[str]]:
+    """
+    Verify every .pkmap under a directory against its sibling Tiled map.
+
+    Returns:
+        Dict mapping .pkmap path -> mismatches, for files that failed only
+    """
+    failures: Dict[Path, List[str]] = {}
+    for pkmap_path in sorted(Path(root).rglob(f"*{PKMAP_EXTENSION}")):
+        json_path = pkmap_path.with_suffix(".json")
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                tiled_map = json.load(f)
+        except (OSError, ValueError) as e:
+            failures[pkmap_path] = [f"cannot load {json_path.name}: {e}"]
+            continue
+        errors = verify_pkmap(pkmap_path, tiled_map)
+        if errors:
+            failures[pkmap_path] = errors
+    return failures
@@ -0,0 +1,234 @@
+"""
+PNG output - optional palette-indexed (mode P) tileset and sprite images.
+
+GBA art uses at most 16 colors per palette and a handful of palettes per
+image, so a rendered tileset or sprite sheet rarely holds more than 256
+distinct colors. In "indexed" mode such images are written as 8-bit palette
+PNGs with per-entry alpha (tRNS), which decode to exactly the same RGBA
+pixels and are several times smaller; images with more colors stay RGBA.
+
+Images are encoded with a named profile ("dev": fast, "release": smallest,
+post-processed with oxipng when it is on PATH) on the write-behind queue
+(see output_writer), so rendering continues while PNGs are compressed.
+Call output_writer.flush_writes before relying on the files being on disk.
+"""
+
+import io
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Union
+from PIL import Image
+from .output_writer import queue_job, write_file_atomic
+from .utils import save_json
+from .logging_config import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; pixels are then indexed through a dict
+    np = None
+
+logger = get_logger('png_output')
+
+# "rgba" writes images as they are built; "indexed" writes mode P where lossless
+PNG_MODES = ("rgba", "indexed")
+MAX_PALETTE_COLORS = 256
+PALETTE_SIDECAR_SUFFIX = ".palette.json"
+
+# Encode profiles: Image.save options, and whether oxipng post-processes the file
+PNG_PROFILES = ("default", "dev", "release")
+_PROFILE_SAVE_OPTIONS = {
+    "default": {},  # Pillow defaults (zlib level 6)
+    "dev": {"compress_level": 1},  # Fast iteration
+    "release": {"optimize": True},  # Level 9 with filter selection
+}
+OXIPNG_ARGS = ("-o", "4", "--strip", "safe", "--quiet")
+
+_png_mode = "rgba"
+_palette_sidecar = False
+_png_profile = "default"
+_oxipng: Optional[str] = None  # Path of the oxipng executable (release profile only)
+
+
+@dataclass
+class PngEncodeStats:
+    """Totals of the PNGs written by one process (for the timing summary)."""
+    images: int = 0
+    seconds: float = 0.0  # Encode and write time, summed over writer threads
+    bytes: int = 0
+
+    def add(self, other: "PngEncodeStats") -> None:
+        self.images += other.images
+        self.seconds += other.seconds
+        self.bytes += other.bytes
+
+
+_stats = PngEncodeStats()
+_stats_lock = threading.Lock()
+
+
+def configure_png_output(mode: str, palette_sidecar: bool = False, profile: str = "default") -> None:
+    """
+    Select how save_png writes images for the rest of this process.
+
+    Args:
+        mode: One of PNG_MODES
+        palette_sidecar: Write <image>.palette.json next to every indexed PNG
+        profile: One of PNG_PROFILES
+    """
+    global _png_mode, _palette_sidecar, _png_profile, _oxipng
+    if mode not in PNG_MODES:
+        raise ValueError(f"Unknown PNG mode: {mode}")
+    if profile not in PNG_PROFILES:
+        raise ValueError(f"Unknown PNG profile: {profile}")
+    _png_mode = mode
+    _palette_sidecar = palette_sidecar
+    _png_profile = profile
+    _oxipng = shutil.which("oxipng") if profile == "release" else None
+
+
+def get_png_output_mode() -> str:
+    """Return the mode selected with configure_png_output."""
+    return _png_mode
+
+
+def describe_png_profile() -> str:
+    """Human-readable encode profile, e.g. 'release (optimize, oxipng)'."""
+    options = [f"{key}={value}" if value is not True else key
+               for key, value in _PROFILE_SAVE_OPTIONS[_png_profile].items()]
+    if _oxipng:
+        options.append("oxipng")
+    return f"{_png_profile} ({', '.join(options)})" if options else _png_profile
+
+
+def take_png_stats() -> PngEncodeStats:
+    """Return the totals of this process since the last call, and reset them."""
+    global _stats
+    with _stats_lock:
+        stats, _stats = _stats, PngEncodeStats()
+    return stats
+
+
+def palette_sidecar_path(png_path: Union[str, Path]) -> Path:
+    """Path of the palette sidecar of a PNG (tiles.png -> tiles.palette.json)."""
+    png_path = Path(png_path)
+    return png_path.with_name(png_path.stem + PALETTE_SIDECAR_SUFFIX)
+
+
+def to_indexed_image(image: Image.Image) -> Optional[Image.Image]:
+    """
+    Convert an image to mode P without changing any visible pixel.
+
+    Fully transparent pixels share palette index 0; every other distinct
+    RGBA value gets its own entry, in ascending RGBA order.
+
+    Returns:
+        The indexed image, or None if it needs more than 256 colors
+    """
+    rgba = image if image.mode == "RGBA" else image.convert("RGBA")
+
+    if np is not None:
+        pixels = np.asarray(rgba, dtype=np.uint8).reshape(-1, 4).copy()
+        pixels[pixels[:, 3] == 0] = 0
+        # Big-endian packing so values sort in RGBA order
+        packed = pixels.view('>u4').reshape(-1)
+        has_transparent = bool((packed == 0).any())
+        colors, indices = np.unique(packed, return_inverse=True)
+        if len(colors) + (0 if has_transparent else 1) > MAX_PALETTE_COLORS:
+            return None
+        if not has_transparent:
+            # Reserve index 0 for transparency anyway, so palettes stay uniform
+            colors = np.concatenate([np.zeros(1, dtype=colors.dtype), colors])
+            indices = indices + 1
+        palette = colors.astype('>u4').tobytes()
+        data = indices.reshape(-1).astype(np.uint8).tobytes()
+    else:
+        raw = iter(rgba.tobytes())
+        pixels = [pixel if pixel[3] else (0, 0, 0, 0) for pixel in zip(raw, raw, raw, raw)]
+        colors = sorted(set(pixels) | {(0, 0, 0, 0)})
+        if len(colors) > MAX_PALETTE_COLORS:
+            return None
+        lookup = {color: i for i, color in enumerate(colors)}
+        palette = bytes(channel for color in colors for channel in color)
+        data = bytes(lookup[pixel] for pixel in pixels)
+
+    indexed = Image.frombytes("P", rgba.size, data)
+    indexed.putpalette(palette, rawmode="RGBA")
+    return indexed
+
+
+def _palette_colors(indexed: Image.Image) -> List[str]:
+    """Palette entries of an indexed image as "#RRGGBBAA" strings."""
+    mode, raw = indexed.palette.getdata()
+    channels = len(mode)
+    colors = []
+    for i in range(0, len(raw), channels):
+        entry = tuple(raw[i:i + channels]) + ((255,) if channels == 3 else ())
+        colors.append("#" + "".join(f"{value:02X}" for value in entry))
+    return colors
+
+
+def _encode_png(image: Image.Image, path: Union[str, Path]) -> None:
+    """Encode and write one image (runs on a writer thread)."""
+    start = time.perf_counter()
+    if _png_mode == "indexed":
+        indexed = to_indexed_image(image)
+        if indexed is not None:
+            image = indexed
+            if _palette_sidecar:
+                save_json({"colors": _palette_colors(indexed)}, str(palette_sidecar_path(path)))
+        else:
+            logger.debug(f"{Path(path).name} has more than {MAX_PALETTE_COLORS} colors; writing RGBA")
+            palette_sidecar_path(path).unlink(missing_ok=True)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", **_PROFILE_SAVE_OPTIONS[_png_profile])
+    payload = buffer.getvalue()
+    if _oxipng:
+        result = subprocess.run([_oxipng, *OXIPNG_ARGS, "--stdout", "-"], input=payload,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode == 0 and result.stdout:
+            payload = result.stdout
+        else:
+            logger.debug(f"oxipng failed on {path}: {result.stderr.decode(errors='replace').strip()}")
+
+    # Encoded in memory first, so an unchanged image leaves the file untouched
+    write_file_atomic(path, payload)
+    with _stats_lock:
+        _stats.images += 1
+        _stats.seconds += time.perf_counter() - start
+        _stats.bytes += len(payload)
+
+
+def write_png(image: Image.Image, path: Union[str, Path]) -> bool:
+    """
+    Write an image as a plain PNG right away, leaving the file alone if its bytes are unchanged.
+
+    For copied graphics that bypass the configured mode and profile.
+
+    Returns:
+        True if the file was written
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return write_file_atomic(path, buffer.getvalue())
+
+
+def save_png(image: Image.Image, path: Union[str, Path]) -> None:
+    """
+    Queue an image to be saved as PNG in the configured mode and profile.
+
+    In "indexed" mode an image with more than 256 colors is saved as RGBA
+    (and any stale palette sidecar is removed). The image is encoded on the
+    write-behind queue, so it must not be modified after this call; use
+    output_writer.flush_writes to wait for the file.
+
+    Args:
+        image: Image to save
+        path: Output path
+    """
+    # Queue cost: the RGBA pixels the job keeps alive until it is written
+    queue_job(image.width * image.height * 4, _encode_png, image, path)
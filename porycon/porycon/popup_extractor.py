@@ -3,10 +3,11 @@ Extract and process map popup graphics from pokeemerald.
 Copies backgrounds and outline tile sheets with proper transparency.
 """
 
-import json
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from PIL import Image
+from .utils import save_json
+from .png_output import write_png
 from .logging_config import get_logger
 from .id_transformer import IdTransformer
 
@@ -172,7 +173,7 @@ class PopupExtractor:
             # Convert to RGBA if needed
             if img.mode != 'RGBA':
                 img = img.convert('RGBA')
-            img.save(dest_png, 'PNG')
+            write_png(img, dest_png)
             logger.debug(f"  Copied background: {dest_png.name}")
         except Exception as e:
             logger.error(f"Failed to copy background {style_name}: {e}")
@@ -192,8 +193,7 @@ class PopupExtractor:
         
         dest_json = self.output_data_bg / f"{style_name}.json"
         try:
-            with open(dest_json, 'w') as f:
-                json.dump(json_def, f, indent=2)
+            save_json(json_def, str(dest_json))
             logger.debug(f"  Created definition: {dest_json.name}")
         except Exception as e:
             logger.error(f"Failed to create background definition {style_name}: {e}")
@@ -248,7 +248,7 @@ class PopupExtractor:
                 img = img.convert('RGBA')
             
             # Save as RGBA PNG
-            img.save(dest_png, 'PNG')
+            write_png(img, dest_png)
             logger.debug(f"  Copied outline: {dest_png.name}")
         except Exception as e:
             logger.error(f"Failed to copy outline {style_name}: {e}")
@@ -290,8 +290,7 @@ class PopupExtractor:
         
         dest_json = self.output_data_outline / f"{style_name}_outline.json"
         try:
-            with open(dest_json, 'w') as f:
-                json.dump(json_def, f, indent=2)
+            save_json(json_def, str(dest_json))
             logger.debug(f"  Created definition: {dest_json.name}")
         except Exception as e:
             logger.error(f"Failed to create outline definition {style_name}: {e}")
@@ -0,0 +1,97 @@
+"""
+Tileset-affinity scheduling for the map conversion pool.
+
+Maps sharing a (primary_tileset, secondary_tileset) pair are handed to the
+same worker as one batch, so that worker's tileset, palette and animation
+caches stay warm across the whole group. Batches are ordered largest first
+(longest-processing-time scheduling) to keep the pool balanced.
+"""
+
+from typing import Dict, Any, List, Tuple
+from .logging_config import get_logger
+
+logger = get_logger('scheduler')
+
+TilesetPair = Tuple[str, str]
+
+
+def get_tileset_pair(map_info: Dict[str, Any], layouts: Dict[str, Dict[str, Any]]) -> TilesetPair:
+    """Return the (primary, secondary) tileset pair of a map, or ("", "") if its layout is unknown."""
+    layout = layouts.get(map_info.get("layout_id", ""))
+    if not layout:
+        return ("", "")
+    return (layout.get("primary_tileset", ""), layout.get("secondary_tileset", ""))
+
+
+def _map_weight(map_info: Dict[str, Any], layouts: Dict[str, Dict[str, Any]]) -> int:
+    """Estimated conversion cost of a map (its area in metatiles)."""
+    layout = layouts.get(map_info.get("layout_id", ""))
+    if not layout:
+        return 1
+    return max(1, layout.get("width", 0) * layout.get("height", 0))
+
+
+def group_maps_by_tileset_pair(
+    maps: Dict[str, Dict[str, Any]],
+    layouts: Dict[str, Dict[str, Any]]
+) -> Dict[TilesetPair, List[str]]:
+    """
+    Group map IDs by the tileset pair of their layout.
+
+    Args:
+        maps: Dict mapping map_id -> map_info (from find_map_files)
+        layouts: Dict mapping layout_id -> layout (from find_layout_files)
+
+    Returns:
+        Dict mapping (primary_tileset, secondary_tileset) -> list of map IDs
+    """
+    groups: Dict[TilesetPair, List[str]] = {}
+    for map_id, map_info in maps.items():
+        groups.setdefault(get_tileset_pair(map_info, layouts), []).append(map_id)
+    return groups
+
+
+def build_conversion_batches(
+    maps: Dict[str, Dict[str, Any]],
+    layouts: Dict[str, Dict[str, Any]],
+    max_workers: int
+) -> List[List[Tuple[str, Dict[str, Any]]]]:
+    """
+    Split maps into per-tileset-pair batches, largest first.
+
+    A group heavier than an even share of the total work is split into
+    chunks of about that share, so one popular tileset pair cannot leave
+    the other workers idle at the end of the run.
+
+    Args:
+        maps: Dict mapping map_id -> map_info (from find_map_files)
+        layouts: Dict mapping layout_id -> layout (from find_layout_files)
+        max_workers: Number of pool processes
+
+    Returns:
+        List of batches; each batch is a list of (map_id, map_info) tasks
+    """
+    groups = group_maps_by_tileset_pair(maps, layouts)
+    total_weight = sum(_map_weight(info, layouts) for info in maps.values())
+    max_batch_weight = max(1, -(-total_weight // max(1, max_workers)))  # ceil division
+
+    weighted_batches: List[Tuple[int, List[Tuple[str, Dict[str, Any]]]]] = []
+    for pair, map_ids in groups.items():
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        batch_weight = 0
+        for map_id in map_ids:
+            weight = _map_weight(maps[map_id], layouts)
+            if batch and batch_weight + weight > max_batch_weight:
+                weighted_batches.append((batch_weight, batch))
+                batch, batch_weight = [], 0
+            batch.append((map_id, maps[map_id]))
+            batch_weight += weight
+        if batch:
+            weighted_batches.append((batch_weight, batch))
+
+    # Largest first: small batches fill the gaps at the end of the run
+    weighted_batches.sort(key=lambda item: item[0], reverse=True)
+
+    logger.debug(f"Scheduled {len(maps)} maps as {len(weighted_batches)} batches "
+                 f"across {len(groups)} tileset pairs")
+    return [batch for _, batch in weighted_batches]
@@ -11,6 +11,7 @@ import json
 import re
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
+from .utils import save_json
 from .logging_config import get_logger
 from .id_transformer import IdTransformer
 
@@ -181,8 +182,7 @@ class MapSectionExtractor:
             filepath = output_path / filename
             
             try:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(section_data, f, indent=2, ensure_ascii=False)
+                save_json(section_data, str(filepath))
                 count += 1
             except Exception as e:
                 logger.error(f"Failed to save {section_id}: {e}")
@@ -235,8 +235,7 @@ class MapSectionExtractor:
 
             theme_file = output_path / f"{theme_name}.json"
             try:
-                with open(theme_file, 'w', encoding='utf-8') as f:
-                    json.dump(theme_data, f, indent=2, ensure_ascii=False)
+                save_json(theme_data, str(theme_file))
                 count += 1
             except Exception as e:
                 logger.error(f"Failed to save theme {theme_name}: {e}")
@@ -4,9 +4,13 @@ Main entry point for sprite extraction.
 
 import argparse
 import sys
+import time
 from pathlib import Path
 from .animation_parser import PokeemeraldAnimationParser
 from .sprite_extractor import SpriteExtractor
+from .utils import JSON_STYLES, configure_json_output
+from .png_output import PNG_MODES, PNG_PROFILES, configure_png_output, describe_png_profile, take_png_stats
+from .output_writer import take_output_stats
 from .logging_config import setup_logging, get_logger
 
 
@@ -35,8 +39,36 @@ def main():
         action="store_true",
         help="Show debug information (implies verbose)"
     )
+    parser.add_argument(
+        "--json-style",
+        choices=JSON_STYLES,
+        default="pretty",
+        help="JSON output style: indented (default) or compact with sorted keys for release builds "
+             "(uses orjson when installed)"
+    )
+    parser.add_argument(
+        "--png-mode",
+        choices=PNG_MODES,
+        default="rgba",
+        help="Sprite sheet format: 32-bit RGBA (default), or palette-indexed where every "
+             "color fits in one 256-entry palette (exact, much smaller files)"
+    )
+    parser.add_argument(
+        "--png-profile",
+        choices=PNG_PROFILES,
+        default="default",
+        help="PNG encode profile: Pillow defaults, dev (fast, larger files) or release "
+             "(maximum compression, plus oxipng when it is on PATH)"
+    )
+    parser.add_argument(
+        "--palette-sidecar",
+        action="store_true",
+        help="With --png-mode indexed, write <image>.palette.json next to every indexed PNG"
+    )
     
     args = parser.parse_args()
+    configure_json_output(args.json_style)
+    configure_png_output(args.png_mode, args.palette_sidecar, args.png_profile)
     
     # Setup logging
     logger = setup_logging(args.verbose, args.debug)
@@ -70,9 +102,14 @@ def main():
         filename_mapping,
         pic_table_sources
     )
+    start = time.perf_counter()
     extractor.extract_all_sprites()
     
-    logger.info("\nExtraction complete!")
+    png_stats = take_png_stats()
+    logger.info(f"\nExtraction complete in {time.perf_counter() - start:.1f}s")
+    logger.info(f"PNG encoding [{describe_png_profile()}]: {png_stats.images} images, "
+                f"{png_stats.seconds:.1f}s, {png_stats.bytes / 1024 / 1024:.1f} MiB")
+    logger.info(f"Outputs: {take_output_stats().summary()}")
 
 
 if __name__ == "__main__":
@@ -13,6 +13,8 @@ from .animation_parser import (
 )
 from .logging_config import get_logger
 from .utils import save_json
+from .png_output import save_png
+from .output_writer import flush_writes
 
 logger = get_logger('sprite_extractor')
 
@@ -136,6 +138,7 @@ class SpriteExtractor:
                     except Exception as ex:
                         logger.error(f"Error processing {png_file.name}: {ex}")
         
+        flush_writes()
         logger.info(f"\nExtracted {success_count} sprites")
         logger.info("Sprite data in Assets/Definitions/Sprites/, graphics in Assets/Graphics/Sprites/")
     
@@ -288,7 +291,7 @@ class SpriteExtractor:
 
         # Save combined spritesheet to Graphics directory
         graphics_path = graphics_dir / f"{sprite_name}.png"
-        combined.save(graphics_path, "PNG")
+        save_png(combined, graphics_path)
         
         # Get physical frame mapping from pokeemerald (maps logical -> physical frame indices)
         physical_frame_mapping = self._get_physical_frame_mapping(pic_table_name)
@@ -370,8 +373,7 @@ class SpriteExtractor:
             f"{len(animations)} animations"
         )
         
-        # Cleanup
-        combined.close()
+        # Cleanup (combined is still queued for the PNG writer and is released by it)
         for img in source_images:
             img.close()
         
@@ -451,8 +453,8 @@ class SpriteExtractor:
         # Also check for magenta (#FF00FF) as a common transparency mask
         self._apply_magenta_transparency(rgba_image)
 
-        # Save as RGBA PNG
-        rgba_image.save(graphics_path, "PNG")
+        # Save as RGBA PNG (or indexed, see png_output)
+        save_png(rgba_image, graphics_path)
 
         # Get animation data
         animations = self._generate_animations(sprite_name, directory, frame_info)
@@ -487,8 +489,7 @@ class SpriteExtractor:
         manifest_dict = asdict(manifest)
         save_json(manifest_dict, str(manifest_path))
 
-        image.close()
-        rgba_image.close()
+        image.close()  # rgba_image is a copy, still queued for the PNG writer
 
         return manifest
     
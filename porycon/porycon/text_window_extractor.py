@@ -3,10 +3,11 @@ Extract and process text window graphics from pokeemerald.
 Copies text window sprites with proper transparency.
 """
 
-import json
 from pathlib import Path
 from typing import Tuple, Optional
 from PIL import Image
+from .utils import save_json
+from .png_output import write_png
 from .logging_config import get_logger
 from .id_transformer import IdTransformer
 
@@ -103,7 +104,7 @@ class TextWindowExtractor:
             
             # Save processed PNG
             dest_png = self.output_graphics / f"{filename}.png"
-            img.save(dest_png, 'PNG')
+            write_png(img, dest_png)
             logger.debug(f"  Saved sprite: {dest_png.name}")
             
             # Get image dimensions
@@ -148,8 +149,7 @@ class TextWindowExtractor:
             
             # Save definition JSON
             dest_json = self.output_definitions / f"{filename}.json"
-            with open(dest_json, 'w') as f:
-                json.dump(json_def, f, indent=2)
+            save_json(json_def, str(dest_json))
             logger.debug(f"  Created definition: {dest_json.name}")
             
             return True
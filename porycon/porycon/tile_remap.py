@@ -0,0 +1,180 @@
+"""
+Tile remapping - (tile_id, palette) -> consolidated tile ID lookups.
+
+Each consolidated tileset's mapping is compiled once into a dense table
+indexed by tile_id * 16 + palette, so a tile layer is remapped with one
+vectorized gather per tileset instead of a dict lookup per cell.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .logging_config import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; tables are then plain lists read per cell
+    np = None
+
+logger = get_logger('tile_remap')
+
+NUM_PALETTES = 16
+NO_TILE = -1  # Table entry of an unmapped key
+
+
+class TileRemapTable:
+    """Dense lookup table compiled from one tileset's tile mapping."""
+
+    def __init__(self, mapping: Dict[Any, int]):
+        """
+        Compile a mapping.
+
+        Args:
+            mapping: {(old_tile_id, palette_index): new_tile_id}; plain
+                old_tile_id keys (old mapping format) are used as a fallback
+                when the (tile_id, palette) key is missing
+        """
+        pairs = [(key, value) for key, value in mapping.items()
+                 if isinstance(key, tuple) and key[0] >= 0 and 0 <= key[1] < NUM_PALETTES]
+        singles = [(key, value) for key, value in mapping.items() if isinstance(key, int) and key >= 0]
+
+        pair_size = (max(key[0] for key, _ in pairs) + 1) * NUM_PALETTES if pairs else 0
+        tile_size = max(key for key, _ in singles) + 1 if singles else 0
+        if np is not None:
+            self.pair_lut = np.full(pair_size, NO_TILE, dtype=np.int64)
+            self.tile_lut = np.full(tile_size, NO_TILE, dtype=np.int64)
+        else:
+            self.pair_lut = [NO_TILE] * pair_size
+            self.tile_lut = [NO_TILE] * tile_size
+        for (tile_id, palette_index), value in pairs:
+            self.pair_lut[tile_id * NUM_PALETTES + palette_index] = value
+        for tile_id, value in singles:
+            self.tile_lut[tile_id] = value
+
+    def lookup_one(self, tile_id: int, palette_index: int) -> int:
+        """New tile ID of a single tile, or NO_TILE if it is unmapped."""
+        if tile_id >= 0 and 0 <= palette_index < NUM_PALETTES:
+            index = tile_id * NUM_PALETTES + palette_index
+            if index < len(self.pair_lut) and self.pair_lut[index] != NO_TILE:
+                return int(self.pair_lut[index])
+        if 0 <= tile_id < len(self.tile_lut):
+            return int(self.tile_lut[tile_id])
+        return NO_TILE
+
+    def lookup(self, tile_ids: "np.ndarray", palettes: "np.ndarray") -> "np.ndarray":
+        """Vectorized lookup_one over int64 arrays."""
+        result = np.full(len(tile_ids), NO_TILE, dtype=np.int64)
+        index = tile_ids * NUM_PALETTES + palettes
+        valid = (tile_ids >= 0) & (palettes >= 0) & (palettes < NUM_PALETTES) & (index < len(self.pair_lut))
+        result[valid] = self.pair_lut[index[valid]]
+
+        fallback = (result == NO_TILE) & (tile_ids >= 0) & (tile_ids < len(self.tile_lut))
+        result[fallback] = self.tile_lut[tile_ids[fallback]]
+        return result
+
+
+def compile_tile_mappings(tile_mappings: Dict[str, Dict[Any, int]]) -> Dict[str, TileRemapTable]:
+    """Compile every tileset's mapping once (tables already compiled are kept)."""
+    return {name: mapping if isinstance(mapping, TileRemapTable) else TileRemapTable(mapping)
+            for name, mapping in tile_mappings.items()}
+
+
+# (table, firstgid) per tileset, keyed by lowercase tileset name in map order
+RemapTables = Dict[str, Tuple[TileRemapTable, int]]
+
+
+def remap_layer_data(
+    data: Sequence[int],
+    layer_tilesets: Sequence[Optional[str]],
+    layer_palettes: Sequence[int],
+    tables: RemapTables
+) -> List[int]:
+    """
+    Remap the GIDs of one tile layer.
+
+    A cell whose tileset is known uses that tileset's table; a cell without
+    one takes the first tileset (in map order) that maps it. Empty cells and
+    unmapped tiles are left unchanged.
+
+    Args:
+        data: Layer GIDs
+        layer_tilesets: Tileset name per cell (None if unknown)
+        layer_palettes: Palette index per cell
+        tables: Compiled tables of the map's consolidated tilesets
+
+    Returns:
+        Remapped layer GIDs
+    """
+    if np is None:
+        return _remap_layer_data_python(data, layer_tilesets, layer_palettes, tables)
+
+    count = len(data)
+    if count == 0:
+        return []
+    tile_ids = np.asarray(data, dtype=np.int64)
+    palettes = np.zeros(count, dtype=np.int64)
+    known = min(count, len(layer_palettes))
+    palettes[:known] = np.asarray(layer_palettes[:known], dtype=np.int64)
+
+    # Tileset of every cell as an index into `tables` (-1: no tileset, -2: unmatched tileset)
+    names = np.full(count, "", dtype=object)
+    known = min(count, len(layer_tilesets))
+    names[:known] = layer_tilesets[:known]
+    names[names == None] = ""  # noqa: E711 - elementwise comparison
+    table_order = {name: i for i, name in enumerate(tables)}
+    unique_names, inverse = np.unique(names.astype(str), return_inverse=True)
+    unique_codes = np.array([table_order.get(name.lower(), -2) if name else -1 for name in unique_names],
+                            dtype=np.int64)
+    codes = unique_codes[inverse.reshape(-1)]
+
+    result = tile_ids.copy()
+    nonempty = tile_ids != 0
+    for code, (table, firstgid) in enumerate(tables.values()):
+        cells = np.flatnonzero(nonempty & (codes == code))
+        if len(cells):
+            new_ids = table.lookup(tile_ids[cells], palettes[cells])
+            hit = new_ids != NO_TILE
+            result[cells[hit]] = firstgid + new_ids[hit] - 1
+
+    # Cells without a tileset: try each tileset in map order
+    cells = np.flatnonzero(nonempty & (codes == -1))
+    for table, firstgid in tables.values():
+        if not len(cells):
+            break
+        new_ids = table.lookup(tile_ids[cells], palettes[cells])
+        hit = new_ids != NO_TILE
+        result[cells[hit]] = firstgid + new_ids[hit] - 1
+        cells = cells[~hit]
+
+    return result.tolist()
+
+
+def _remap_layer_data_python(
+    data: Sequence[int],
+    layer_tilesets: Sequence[Optional[str]],
+    layer_palettes: Sequence[int],
+    tables: RemapTables
+) -> List[int]:
+    """remap_layer_data without NumPy."""
+    result = list(data)
+    lowered: Dict[str, Optional[Tuple[TileRemapTable, int]]] = {}
+    for i, old_tile_id in enumerate(data):
+        if old_tile_id == 0:
+            # Empty tile, keep as 0
+            continue
+        tileset_name = layer_tilesets[i] if i < len(layer_tilesets) else None
+        palette_index = layer_palettes[i] if i < len(layer_palettes) else 0
+
+        if tileset_name:
+            if tileset_name not in lowered:
+                lowered[tileset_name] = tables.get(tileset_name.lower())
+            entry = lowered[tileset_name]
+            candidates = [entry] if entry else []
+        else:
+            candidates = tables.values()
+
+        for table, firstgid in candidates:
+            new_tile_id = table.lookup_one(old_tile_id, palette_index)
+            if new_tile_id != NO_TILE:
+                # Tiled uses 1-based tile IDs, so GID = firstgid + new_tile_id - 1
+                result[i] = firstgid + new_tile_id - 1
+                break
+    return result
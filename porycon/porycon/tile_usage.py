@@ -0,0 +1,58 @@
+"""
+Tile usage index - which metatile layers of a map use which 8x8 tiles.
+
+Animations are attached per 8x8 tile, so the converter needs to know, for a
+(tile_id, tileset) pair, every (layer_gid, metatile_key, tile_position) that
+draws it. Each relation is recorded once per metatile, so the index grows
+with the map's distinct metatiles rather than with its area.
+"""
+
+from typing import Dict, Iterator, List, Set, Tuple
+
+TileKey = Tuple[int, str]                 # (tile_id, tileset)
+MetatileKey = Tuple[int, str, int]        # (metatile_id, tileset, layer_type)
+TileUsage = Tuple[int, MetatileKey, int]  # (layer_gid, metatile_key, tile_position)
+
+
+class TileUsageIndex:
+    """
+    (tile_id, tileset) -> [(layer_gid, metatile_key, tile_position), ...]
+
+    Supports read-only dict access (in, [], get, items) in insertion order.
+    """
+
+    def __init__(self):
+        self._by_tile: Dict[TileKey, List[TileUsage]] = {}
+        self._metatiles: Set[MetatileKey] = set()  # Metatiles whose tiles are recorded
+
+    def has_metatile(self, metatile_key: MetatileKey) -> bool:
+        """Whether the tiles of a metatile have already been recorded."""
+        return metatile_key in self._metatiles
+
+    def add(self, tile_key: TileKey, layer_gid: int, metatile_key: MetatileKey, tile_position: int):
+        """
+        Record that a metatile layer draws a tile.
+
+        Callers record each metatile once (see has_metatile), so relations are
+        never duplicated.
+        """
+        self._by_tile.setdefault(tile_key, []).append((layer_gid, metatile_key, tile_position))
+        self._metatiles.add(metatile_key)
+
+    def __contains__(self, tile_key: TileKey) -> bool:
+        return tile_key in self._by_tile
+
+    def __getitem__(self, tile_key: TileKey) -> List[TileUsage]:
+        return self._by_tile[tile_key]
+
+    def __len__(self) -> int:
+        return len(self._by_tile)
+
+    def __iter__(self) -> Iterator[TileKey]:
+        return iter(self._by_tile)
+
+    def get(self, tile_key: TileKey, default=None):
+        return self._by_tile.get(tile_key, default)
+
+    def items(self):
+        return self._by_tile.items()
@@ -7,11 +7,12 @@ so maps can be edited in Tiled without metatile constraints.
 
 from typing import Set, Dict, List, Tuple, Optional, Any
 from pathlib import Path
-import json
 from PIL import Image
 from .palette_loader import load_tileset_palettes, apply_palette_to_tile
 from .animation_scanner import AnimationScanner
-from .utils import camel_to_snake, TilesetPathResolver
+from .utils import camel_to_snake, save_json, TilesetPathResolver
+from .png_output import save_png
+from .tileset_manifest import get_tileset_manifest
 from .logging_config import get_logger
 
 logger = get_logger('tileset_builder')
@@ -20,12 +21,13 @@ logger = get_logger('tileset_builder')
 class TilesetBuilder:
     """Builds complete tilesets by collecting all used tiles from maps."""
     
-    def __init__(self, input_dir: str):
+    def __init__(self, input_dir: str, animation_scanner: Optional[AnimationScanner] = None):
         self.input_dir = Path(input_dir)
         self.used_tiles: Dict[str, Set[int]] = {}  # tileset_name -> set of tile IDs
         self.used_tiles_with_palettes: Dict[str, Set[Tuple[int, int]]] = {}  # tileset_name -> set of (tile_id, palette) tuples
         self.tileset_info: Dict[str, Dict] = {}  # tileset_name -> tileset metadata
-        self.animation_scanner = AnimationScanner(input_dir)
+        # Reuse the caller's scanner when given (parsing tileset_anims.c is not free)
+        self.animation_scanner = animation_scanner or AnimationScanner(input_dir)
         # Track primary/secondary tileset relationships: tileset_name -> (primary_tileset, secondary_tileset) pairs
         # A tileset can be primary in some maps and secondary in others, so we track all pairs
         self.tileset_relationships: Dict[str, Set[Tuple[str, str]]] = {}  # tileset_name -> set of (primary, secondary) pairs
@@ -198,7 +200,7 @@ class TilesetBuilder:
         source_height = source_image.height
         source_cols = source_width // tile_size
         source_rows = source_height // tile_size
-        source_total_tiles = source_cols * source_rows
+        source_total_tiles = get_tileset_manifest(self.input_dir).tile_count(tileset_name)
         
         # Debug: log tileset info
         logger.debug(f"Source image: {source_width}x{source_height}, {source_cols}x{source_rows} tiles, total: {source_total_tiles}")
@@ -436,7 +438,7 @@ class TilesetBuilder:
         image_filename = f"{tileset_name.lower()}.png"
         image_path = Path(output_dir) / "Tilesets" / region / image_filename
         image_path.parent.mkdir(parents=True, exist_ok=True)
-        image.save(str(image_path))
+        save_png(image, image_path)
         
         # Get tilecount from the built image (includes animation tiles)
         # Calculate from image dimensions
@@ -446,14 +448,7 @@ class TilesetBuilder:
         
         # Also get total tiles from source image
         # This is stored for firstgid calculations (we need the full source tileset size)
-        source_image = self.load_tileset_graphics(tileset_name)
-        source_total_tiles = None
-        if source_image:
-            source_width = source_image.width
-            source_height = source_image.height
-            source_cols = source_width // tile_size
-            source_rows = source_height // tile_size
-            source_total_tiles = source_cols * source_rows
+        source_total_tiles = get_tileset_manifest(self.input_dir).tile_count(tileset_name) or None
         
         # Store source_total_tiles in tileset JSON for firstgid calculations
         # The tilecount field is the number of unique tiles in the built image
@@ -516,8 +511,7 @@ class TilesetBuilder:
         # Save tileset JSON
         tileset_path = Path(output_dir) / "Tilesets" / region / f"{tileset_name.lower()}.json"
         tileset_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(tileset_path, 'w', encoding='utf-8') as f:
-            json.dump(tileset, f, indent=2)
+        save_json(tileset, str(tileset_path))
         
         return tileset, tile_mapping
     
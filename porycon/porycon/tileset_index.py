@@ -0,0 +1,166 @@
+"""
+Tileset index - one scan of data/tilesets shared by every component.
+
+Resolving a tileset name used to probe up to nine candidate directories with
+Path.exists() on every lookup, from many places. The index lists
+data/tilesets/{primary,secondary} once, records each tileset's files, anim
+folders, and memoizes name lookups. It is picklable, so the
+main process can build it once and hand it to every pool worker.
+"""
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from .logging_config import get_logger
+
+logger = get_logger('tileset_index')
+
+TILESET_CATEGORIES = ("primary", "secondary")
+
+
+def tileset_name_variants(tileset_name: str) -> List[str]:
+    """Directory names a tileset may be stored under, in lookup order."""
+    from .utils import camel_to_snake
+    return [
+        camel_to_snake(tileset_name),  # InsideShip -> inside_ship
+        tileset_name.lower(),  # insideship
+        tileset_name.replace("_", "").lower(),  # Remove existing underscores
+    ]
+
+
+@dataclass
+class TilesetEntry:
+    """Files and metadata of one tileset directory."""
+    name: str
+    category: str  # "primary", "secondary" or "" (old flat structure)
+    path: Path
+    tiles_png: Optional[Path] = None
+    metatiles_bin: Optional[Path] = None
+    metatile_attributes_bin: Optional[Path] = None
+    palettes: List[Optional[Path]] = field(default_factory=list)  # 00.pal-15.pal, None if missing
+    anim_dir: Optional[Path] = None
+    anim_folders: Dict[str, Path] = field(default_factory=dict)  # anim subfolder name -> path
+
+
+def _scan_tileset_dir(name: str, category: str, path: Path) -> TilesetEntry:
+    """Record the files of a single tileset directory."""
+    files = set(os.listdir(path))
+    entry = TilesetEntry(name=name, category=category, path=path)
+
+    if "tiles.png" in files:
+        entry.tiles_png = path / "tiles.png"
+    if "metatiles.bin" in files:
+        entry.metatiles_bin = path / "metatiles.bin"
+    if "metatile_attributes.bin" in files:
+        entry.metatile_attributes_bin = path / "metatile_attributes.bin"
+
+    palettes_dir = path / "palettes"
+    palette_files = set(os.listdir(palettes_dir)) if "palettes" in files and palettes_dir.is_dir() else set()
+    entry.palettes = [palettes_dir / f"{i:02d}.pal" if f"{i:02d}.pal" in palette_files else None
+                      for i in range(16)]
+
+    anim_dir = path / "anim"
+    if "anim" in files and anim_dir.is_dir():
+        entry.anim_dir = anim_dir
+        for child in sorted(os.listdir(anim_dir)):
+            if (anim_dir / child).is_dir():
+                entry.anim_folders[child] = anim_dir / child
+
+    return entry
+
+
+class TilesetIndex:
+    """Index of all tileset directories under data/tilesets."""
+
+    def __init__(self, input_dir: Path):
+        """
+        Scan data/tilesets once.
+
+        Args:
+            input_dir: Path to pokeemerald root directory
+        """
+        self.input_dir = Path(input_dir)
+        # category -> directory name -> entry ("" holds the old flat structure)
+        self._entries: Dict[str, Dict[str, TilesetEntry]] = {"primary": {}, "secondary": {}, "": {}}
+        self._lookups: Dict[Tuple[str, Optional[str]], Optional[TilesetEntry]] = {}
+
+        tilesets_dir = self.input_dir / "data" / "tilesets"
+        if not tilesets_dir.is_dir():
+            return
+
+        for child in sorted(os.listdir(tilesets_dir)):
+            child_path = tilesets_dir / child
+            if not child_path.is_dir():
+                continue
+            if child in TILESET_CATEGORIES:
+                for name in sorted(os.listdir(child_path)):
+                    if (child_path / name).is_dir():
+                        self._entries[child][name] = _scan_tileset_dir(name, child, child_path / name)
+            else:
+                self._entries[""][child] = _scan_tileset_dir(child, "", child_path)
+
+        logger.debug(f"Indexed {len(self._entries['primary'])} primary and "
+                     f"{len(self._entries['secondary'])} secondary tilesets")
+
+    def entries(self) -> Iterator[TilesetEntry]:
+        """Iterate over every indexed tileset directory."""
+        for entries in self._entries.values():
+            yield from entries.values()
+
+    def find(self, tileset_name: str, category: Optional[str] = None) -> Optional[TilesetEntry]:
+        """
+        Find a tileset by name (e.g. "General", "InsideShip").
+
+        Name variants are tried in the same order TilesetPathResolver always used:
+        primary then secondary for each variant, then the old flat structure.
+
+        Args:
+            tileset_name: Name of the tileset
+            category: Restrict the lookup to "primary" or "secondary"
+
+        Returns:
+            TilesetEntry, or None if the tileset does not exist
+        """
+        lookup_key = (tileset_name, category)
+        if lookup_key in self._lookups:
+            return self._lookups[lookup_key]
+
+        variants = tileset_name_variants(tileset_name)
+        categories = (category,) if category else TILESET_CATEGORIES
+        entry = None
+        for variant in variants:
+            for cat in categories:
+                entry = self._entries[cat].get(variant)
+                if entry:
+                    break
+            if entry:
+                break
+        if entry is None and not category:
+            # Try without category (old structure)
+            for variant in variants:
+                entry = self._entries[""].get(variant)
+                if entry:
+                    break
+
+        self._lookups[lookup_key] = entry
+        return entry
+
+
+# Process-wide indexes, keyed by absolute input directory
+_indexes: Dict[str, TilesetIndex] = {}
+
+
+def get_tileset_index(input_dir: Path) -> TilesetIndex:
+    """Return the shared index for an input directory, building it on first use."""
+    key = os.path.abspath(input_dir)
+    index = _indexes.get(key)
+    if index is None:
+        index = TilesetIndex(Path(input_dir))
+        _indexes[key] = index
+    return index
+
+
+def set_tileset_index(index: TilesetIndex) -> None:
+    """Install a prebuilt index (e.g. one unpickled in a pool worker) for its input directory."""
+    _indexes[os.path.abspath(index.input_dir)] = index
@@ -0,0 +1,203 @@
+"""
+Tileset manifest - persisted metadata of every tileset.
+
+Tile counts used to be derived by opening (and converting) tiles.png wherever
+a bounds check or a firstgid needed them. The manifest records per tileset
+the image size and tile count, the number of palettes and metatiles and a
+content hash of its source files. It is stored in <output>/.porycon/tilesets.json
+next to the build cache; entries whose files still have the recorded size and
+modification time are reused on later runs without opening the files.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from PIL import Image
+from .build_cache import CACHE_DIR_NAME, hash_file
+from .tileset_index import TilesetEntry, TilesetIndex, get_tileset_index
+from .utils import save_json
+from .logging_config import get_logger
+
+logger = get_logger('tileset_manifest')
+
+MANIFEST_FILE_NAME = "tilesets.json"
+
+# Bump when the fields of TilesetMetadata change
+MANIFEST_VERSION = 1
+
+TILE_SIZE = 8
+METATILE_SIZE_BYTES = 16  # 8 tiles of one u16 each
+
+
+@dataclass
+class TilesetMetadata:
+    """Sizes and content hash of one tileset."""
+    key: str  # "primary/general"; "general" for the old flat structure
+    width: int = 0  # tiles.png size in pixels, 0 if missing
+    height: int = 0
+    tile_count: int = 0  # Number of 8x8 tiles in tiles.png
+    palette_count: int = 0  # Number of palettes/NN.pal files present
+    metatile_count: int = 0  # Number of metatiles in metatiles.bin
+    content_hash: str = "missing"
+    # File name (relative to the tileset) -> [size, mtime_ns], None if missing
+    file_stats: Dict[str, Optional[List[int]]] = field(default_factory=dict)
+
+
+def _entry_key(entry: TilesetEntry) -> str:
+    return f"{entry.category}/{entry.name}" if entry.category else entry.name
+
+
+def _entry_files(entry: TilesetEntry) -> Dict[str, Optional[Path]]:
+    """Source files of a tileset that the manifest describes."""
+    files = {
+        "tiles.png": entry.tiles_png,
+        "metatiles.bin": entry.metatiles_bin,
+        "metatile_attributes.bin": entry.metatile_attributes_bin,
+    }
+    for i, palette in enumerate(entry.palettes):
+        files[f"palettes/{i:02d}.pal"] = palette
+    return files
+
+
+def _file_stats(entry: TilesetEntry) -> Dict[str, Optional[List[int]]]:
+    stats = {}
+    for name, path in _entry_files(entry).items():
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        stats[name] = [st.st_size, st.st_mtime_ns] if st else None
+    return stats
+
+
+def _compute_metadata(entry: TilesetEntry, stats: Dict[str, Optional[List[int]]]) -> TilesetMetadata:
+    """Read a tileset's files and describe them."""
+    meta = TilesetMetadata(key=_entry_key(entry), file_stats=stats)
+
+    if entry.tiles_png:
+        try:
+            with Image.open(entry.tiles_png) as img:
+                meta.width, meta.height = img.size
+        except Exception as e:
+            logger.debug(f"Could not read size of {entry.tiles_png}: {e}")
+    meta.tile_count = (meta.width // TILE_SIZE) * (meta.height // TILE_SIZE)
+
+    meta.palette_count = sum(1 for p in entry.palettes if p is not None)
+    metatiles_stat = stats.get("metatiles.bin")
+    meta.metatile_count = metatiles_stat[0] // METATILE_SIZE_BYTES if metatiles_stat else 0
+
+    hasher = hashlib.blake2b(digest_size=16)
+    for name, path in _entry_files(entry).items():
+        hasher.update(name.encode('utf-8'))
+        hasher.update(hash_file(path).encode('ascii') if path else b"missing")
+    meta.content_hash = hasher.hexdigest()
+    return meta
+
+
+class TilesetManifest:
+    """Metadata of every indexed tileset, persisted between runs."""
+
+    def __init__(self, index: TilesetIndex, output_dir: Optional[Path] = None):
+        """
+        Initialize manifest, loading the stored one if present.
+
+        Args:
+            index: Tileset index to describe
+            output_dir: Output directory (manifest lives in output_dir/.porycon);
+                None keeps the manifest in memory only
+        """
+        self.index = index
+        self.path = Path(output_dir) / CACHE_DIR_NAME / MANIFEST_FILE_NAME if output_dir else None
+        self._entries: Dict[str, TilesetMetadata] = {}
+        self._checked = set()  # Keys whose file stats were compared in this process
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        for key, values in data.get("tilesets", {}).items():
+            try:
+                self._entries[key] = TilesetMetadata(**values)
+            except TypeError:
+                continue
+
+    def save(self):
+        """Write the manifest if anything was (re)computed since it was loaded."""
+        if self.path is None or not self._dirty:
+            return
+        data = {
+            "version": MANIFEST_VERSION,
+            "tilesets": {key: asdict(meta) for key, meta in sorted(self._entries.items())},
+        }
+        # save_json writes atomically, like build cache entries
+        try:
+            save_json(data, str(self.path))
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not write tileset manifest: {e}")
+
+    def _metadata_for_entry(self, entry: TilesetEntry) -> TilesetMetadata:
+        key = _entry_key(entry)
+        meta = self._entries.get(key)
+        if key in self._checked and meta is not None:
+            return meta
+
+        stats = _file_stats(entry)
+        if meta is None or meta.file_stats != stats:
+            meta = _compute_metadata(entry, stats)
+            self._entries[key] = meta
+            self._dirty = True
+        self._checked.add(key)
+        return meta
+
+    def refresh(self):
+        """Validate (and if needed recompute) every indexed tileset."""
+        for entry in self.index.entries():
+            self._metadata_for_entry(entry)
+
+    def get(self, tileset_name: str) -> Optional[TilesetMetadata]:
+        """
+        Get the metadata of a tileset by name (e.g. "General").
+
+        Returns:
+            TilesetMetadata, or None if the tileset does not exist
+        """
+        entry = self.index.find(tileset_name) if tileset_name else None
+        if entry is None:
+            return None
+        return self._metadata_for_entry(entry)
+
+    def tile_count(self, tileset_name: str) -> int:
+        """Number of 8x8 tiles in a tileset's tiles.png (0 if it has none)."""
+        meta = self.get(tileset_name)
+        return meta.tile_count if meta else 0
+
+
+# Process-wide manifests, keyed by absolute input directory
+_manifests: Dict[str, TilesetManifest] = {}
+
+
+def get_tileset_manifest(input_dir: Path) -> TilesetManifest:
+    """Return the shared manifest for an input directory (in-memory only unless one was installed)."""
+    key = os.path.abspath(input_dir)
+    manifest = _manifests.get(key)
+    if manifest is None:
+        manifest = TilesetManifest(get_tileset_index(input_dir))
+        _manifests[key] = manifest
+    return manifest
+
+
+def set_tileset_manifest(manifest: TilesetManifest) -> None:
+    """Install a prebuilt manifest (e.g. one unpickled in a pool worker) for its input directory."""
+    _manifests[os.path.abspath(manifest.index.input_dir)] = manifest
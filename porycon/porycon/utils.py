@@ -2,12 +2,18 @@
 Utility functions for porycon.
 """
 
+import hashlib
 import json
-import os
 import re
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple
 from .logging_config import get_logger
+from .output_writer import queue_write, write_file_atomic
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; compact JSON then uses the stdlib encoder
+    orjson = None
 
 logger = get_logger('utils')
 
@@ -18,22 +24,80 @@ def load_json(filepath: str) -> Dict[str, Any]:
         return json.load(f)
 
 
-def save_json(data: Dict[str, Any], filepath: str, indent: int = 2) -> None:
-    """Save data to a JSON file."""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=indent, ensure_ascii=False)
+# Output style of save_json: "pretty" (indented, the default) or "compact"
+# (no whitespace, sorted keys, for release builds)
+JSON_STYLES = ("pretty", "compact")
+_json_style = "pretty"
+
+
+def configure_json_output(style: str) -> None:
+    """
+    Select how save_json writes files for the rest of this process.
+    
+    Args:
+        style: One of JSON_STYLES
+    """
+    global _json_style
+    if style not in JSON_STYLES:
+        raise ValueError(f"Unknown JSON style: {style}")
+    _json_style = style
+
+
+def get_json_output_style() -> str:
+    """Return the style selected with configure_json_output."""
+    return _json_style
+
+
+def dumps_json(data: Any, indent: Optional[int] = 2) -> bytes:
+    """
+    Serialize data as UTF-8 JSON in the configured style.
+    
+    Compact output (sorted keys, no whitespace) uses orjson when it is
+    installed and the stdlib encoder otherwise.
+    
+    Args:
+        data: Object to serialize
+        indent: Indentation of pretty output (None for compact output in any style)
+    """
+    if _json_style == "compact" or indent is None:
+        if orjson is not None:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                                | orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(data, separators=(',', ':'), sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, indent=indent, ensure_ascii=False).encode('utf-8')
+
+
+def save_json(data: Dict[str, Any], filepath: str, indent: Optional[int] = 2, background: bool = False) -> None:
+    """
+    Save data to a JSON file (see dumps_json), atomically.
+    
+    Args:
+        background: Serialize now but leave the write to the write-behind
+            queue (see output_writer.flush_writes)
+    """
+    payload = dumps_json(data, indent)
+    if background:
+        queue_write(filepath, payload)
+    else:
+        write_file_atomic(filepath, payload)
 
 
-def find_map_files(input_dir: str) -> Dict[str, Dict[str, str]]:
+def find_map_files(input_dir: str) -> Dict[str, Dict[str, Any]]:
     """
     Find all map.json files in pokeemerald data/maps structure.
     
+    Each map.json is read and parsed exactly once here; the warp lookup, the
+    build cache and the conversion workers all use the parsed data from the
+    result instead of reading the file again.
+    
     Returns:
         Dict mapping map_id -> {
             'map_file': path to map.json,
             'layout_id': layout ID from map.json,
-            'region': inferred from directory structure
+            'region': inferred from directory structure,
+            'name': map name,
+            'json_digest': digest of the raw map.json bytes (build cache key),
+            'map_data': parsed map.json (warps, connections, events, ...)
         }
     """
     maps = {}
@@ -51,7 +115,9 @@ def find_map_files(input_dir: str) -> Dict[str, Dict[str, str]]:
             continue
         
         try:
-            map_data = load_json(str(map_file))
+            with open(map_file, 'rb') as f:
+                map_json_bytes = f.read()
+            map_data = json.loads(map_json_bytes.decode('utf-8'))
             map_id = map_data.get("id", "")
             layout_id = map_data.get("layout", "")
             
@@ -74,7 +140,9 @@ def find_map_files(input_dir: str) -> Dict[str, Dict[str, str]]:
                 'map_file': str(map_file),
                 'layout_id': layout_id,
                 'region': region,
-                'name': map_data.get("name", "")
+                'name': map_data.get("name", ""),
+                'json_digest': hashlib.blake2b(map_json_bytes, digest_size=16).hexdigest(),
+                'map_data': map_data
             }
         except Exception as e:
             logger.warning(f"Failed to load {map_file}: {e}")
@@ -246,17 +314,17 @@ def save_map_definition_dto(
     dto: Dict[str, Any],
     output_dir: Path,
     region: str,
-    map_name: str
+    map_name: str,
+    background: bool = False
 ) -> None:
-    """Save map definition DTO to Definitions/Maps/Regions directory."""
+    """Save map definition DTO to Definitions/Maps/Regions directory (background: see save_json)."""
     region_capitalized = region.capitalize()
     dto_path = output_dir / "Definitions" / "Maps" / "Regions" / region_capitalized / f"{map_name}.json"
-    dto_path.parent.mkdir(parents=True, exist_ok=True)
-    save_json(dto, str(dto_path))
+    save_json(dto, str(dto_path), background=background)
 
 
 class TilesetPathResolver:
-    """Centralized tileset path resolution."""
+    """Centralized tileset path resolution, backed by the shared TilesetIndex."""
 
     def __init__(self, input_dir: Path):
         """
@@ -265,7 +333,9 @@ class TilesetPathResolver:
         Args:
             input_dir: Path to pokeemerald root directory
         """
+        from .tileset_index import get_tileset_index
         self.input_dir = Path(input_dir)
+        self.index = get_tileset_index(self.input_dir)
     
     def find_tileset_path(self, tileset_name: str) -> Optional[Tuple[str, Path]]:
         """
@@ -278,31 +348,10 @@ class TilesetPathResolver:
             Tuple of (category, path) where category is "primary" or "secondary",
             or None if tileset not found
         """
-        # Try different name formats
-        name_variants = [
-            camel_to_snake(tileset_name),  # InsideShip -> inside_ship
-            tileset_name.lower(),  # insideship
-            tileset_name.replace("_", "").lower(),  # Remove existing underscores
-        ]
-        
-        for tileset_lower in name_variants:
-            # Try primary first
-            primary_path = self.input_dir / "data" / "tilesets" / "primary" / tileset_lower
-            if primary_path.exists():
-                return ("primary", primary_path)
-            
-            # Try secondary
-            secondary_path = self.input_dir / "data" / "tilesets" / "secondary" / tileset_lower
-            if secondary_path.exists():
-                return ("secondary", secondary_path)
-        
-        # Try without category (old structure)
-        for tileset_lower in name_variants:
-            direct_path = self.input_dir / "data" / "tilesets" / tileset_lower
-            if direct_path.exists():
-                return ("", direct_path)
-        
-        return None
+        entry = self.index.find(tileset_name)
+        if entry is None:
+            return None
+        return (entry.category, entry.path)
     
     def find_tileset_image_path(self, tileset_name: str) -> Optional[Path]:
         """
@@ -314,11 +363,6 @@ class TilesetPathResolver:
         Returns:
             Path to tiles.png, or None if not found
         """
-        result = self.find_tileset_path(tileset_name)
-        if result:
-            _, tileset_dir = result
-            tiles_path = tileset_dir / "tiles.png"
-            if tiles_path.exists():
-                return tiles_path
-        return None
+        entry = self.index.find(tileset_name)
+        return entry.tiles_png if entry else None
 
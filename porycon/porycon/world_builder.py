@@ -29,7 +29,7 @@ class WorldBuilder:
         connections: List[Dict[str, Any]],
         map_width: int,
         map_height: int,
-        map_data: Dict[str, Any]
+        map_data: Optional[Dict[str, Any]] = None
     ):
         """
         Register a map for world building.
@@ -41,7 +41,7 @@ class WorldBuilder:
             connections: List of connection objects from map.json
             map_width: Map width in tiles
             map_height: Map height in tiles
-            map_data: Full map data (for accessing warp_events, etc.)
+            map_data: Full map data, if the caller has it (not needed for world building)
         """
         self.map_data[map_id] = {
             "map_id": map_id,
@@ -140,8 +140,7 @@ class WorldBuilder:
                     
                     # Find reverse connection to get offset on connected map's side
                     reverse_offset = 0
-                    connected_map_data = connected_map_info.get("map_data", {})
-                    reverse_connections = connected_map_data.get("connections", [])
+                    reverse_connections = connected_map_info.get("connections") or []
                     for rev_conn in reverse_connections:
                         if rev_conn.get("map") == current_map_id:
                             reverse_offset = rev_conn.get("offset", 0) * 8  # Convert to pixels
@@ -167,14 +166,11 @@ class WorldBuilder:
                     map_positions[connected_map_id] = (new_x, new_y)
                     queue.append((connected_map_id, new_x, new_y))
         
-        # Build world maps list
+        # Build world maps list in placement (BFS) order, so unchanged worlds
+        # serialize identically (iterating the visited set would depend on hash seeds)
         world_maps = []
-        for map_id in visited:
-            if map_id not in map_positions:
-                # Skip maps that were referenced but not properly positioned
-                continue
+        for map_id, (x, y) in map_positions.items():
             map_info = self.map_data[map_id]
-            x, y = map_positions[map_id]
             
             world_maps.append({
                 "fileName": f"../Maps/{region}/{map_info['map_name']}.json",
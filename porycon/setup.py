@@ -19,6 +19,13 @@ setup(
     install_requires=[
         "Pillow>=10.0.0",
     ],
+    extras_require={
+        # Vectorized image paths and faster compact JSON; everything falls back
+        # to pure Pillow and the stdlib json module without them
+        "fast": ["numpy>=1.21", "orjson>=3.6"],
+        # --layer-encoding zstd
+        "zstd": ["zstandard>=0.18"],
+    },
     entry_points={
         "console_scripts": [
             "porycon=porycon.__main__:main",